@@ -0,0 +1,104 @@
+"""
+消息类型判断：if/elif链 vs 预构建的 MessageClassifier
+
+先从控件树中记录每条消息的 (内容, 子控件数量, 高度)，再只对分类逻辑本身计时，
+不包含COM调用
+
+    python benchmarks/bench_classify.py --repeat 2000
+"""
+import re
+from common import build_main_window, make_parser, new_client, report, timeit
+from wxauto.uia import uiautomation as uia
+from wxauto.msgs import msg as msgmod
+from wxauto.msgs.msg import MESSAGE_ATTRS, SEPICIAL_MSGS, _lang, get_classifier
+
+# 模拟控件树中没有的特殊消息: (内容, 子控件数量, 高度)
+EXTRA_SAMPLES = [
+    ('[图片]', 10, 120),
+    ('[视频]', 14, 120),
+    ('[文件]', 20, 115),
+    ('[位置]', 14, 130),
+    ('[链接]', 12, 100),
+    ('[动画表情]', 9, 80),
+    ('[聊天记录]', 16, 110),
+    ('[名片]', 16, 121),
+    ('[笔记]', 16, 100),
+    ('[语音]3秒,未播放', 12, 55),
+    ('回复内容\n引用 张三 的消息 : 原消息', 18, 90),
+    ('[名片]', 16, 100),
+]
+
+
+def legacy_resolve(attr, content, length, height):
+    """旧实现：每条消息重新编译正则并逐条比较"""
+    msgtype = msgmod.friendmsg if attr == 'Friend' else msgmod.selfmsg
+    if content in SEPICIAL_MSGS:
+        if content == _lang('[图片]') and length in MESSAGE_ATTRS.IMG_MSG_CONTROL_NUM:
+            return getattr(msgtype, f'{attr}ImageMessage')
+        elif content == _lang('[视频]') and length in MESSAGE_ATTRS.VIDEO_MSG_CONTROL_NUM:
+            return getattr(msgtype, f'{attr}VideoMessage')
+        elif content == _lang('[文件]') and length in MESSAGE_ATTRS.FILE_MSG_CONTROL_NUM:
+            return getattr(msgtype, f'{attr}FileMessage')
+        elif content == _lang('[位置]') and length in MESSAGE_ATTRS.LOCATION_MSG_CONTROL_NUM and height > MESSAGE_ATTRS.LOCATION_MSG_HEIGHT:
+            return getattr(msgtype, f'{attr}LocationMessage')
+        elif content == _lang('[链接]') and length in MESSAGE_ATTRS.LINK_CARD_MSG_CONTROL_NUM:
+            return getattr(msgtype, f'{attr}LinkMessage')
+        elif content == _lang('[动画表情]') and length in MESSAGE_ATTRS.EMOTION_MSG_CONTROL_NUM:
+            return getattr(msgtype, f'{attr}EmotionMessage')
+        elif content == _lang('[聊天记录]') and length in MESSAGE_ATTRS.MERGE_MSG_CONTROL_NUM and height >= MESSAGE_ATTRS.MERGE_MSG_HEIGHT:
+            return getattr(msgtype, f'{attr}MergeMessage')
+        elif content == _lang('[名片]') and length in MESSAGE_ATTRS.PERSONAL_CARD_MSG_CONTROL_NUM and height >= MESSAGE_ATTRS.PERSONAL_CARD_MSG_HEIGHT:
+            return getattr(msgtype, f'{attr}PersonalCardMessage')
+        elif content == _lang('[笔记]') and length in MESSAGE_ATTRS.NOTE_MSG_CONTROL_NUM:
+            return getattr(msgtype, f'{attr}NoteMessage')
+    if length in MESSAGE_ATTRS.TEXT_MSG_CONTROL_NUM:
+        return getattr(msgtype, f'{attr}TextMessage')
+    elif re.compile(_lang('re_引用消息'), re.DOTALL).match(content) and length in MESSAGE_ATTRS.QUOTE_MSG_CONTROL_NUM:
+        return getattr(msgtype, f'{attr}QuoteMessage')
+    elif re.compile(_lang('re_语音')).match(content) and length in MESSAGE_ATTRS.VOICE_MSG_CONTROL_NUM:
+        return getattr(msgtype, f'{attr}VoiceMessage')
+    return getattr(msgtype, f'{attr}OtherMessage')
+
+
+def record_samples(msgbox):
+    """记录消息树中每条消息的分类输入"""
+    samples = []
+    for control in msgbox.GetChildren():
+        length = control.FindAll(return_pointer=True).Length - 1
+        if length in MESSAGE_ATTRS.TIME_MSG_CONTROL_NUM:
+            continue
+        rect = control.BoundingRectangle
+        head = control.ButtonControl(searchDepth=2)
+        attr = 'Friend' if head.BoundingRectangle.left < (rect.left + rect.right) / 2 else 'Self'
+        samples.append((attr, control.Name, length, rect.height()))
+    for attr in ('Friend', 'Self'):
+        samples.extend((attr, *sample) for sample in EXTRA_SAMPLES)
+    return samples
+
+
+def main():
+    args = make_parser(__doc__).parse_args()
+    client = new_client(0)
+    uia.SetAutomationClient(client)
+    if args.tree:
+        root = client.load_file(args.tree)
+        msgbox = uia.Control.CreateControlFromElement(root).ListControl(Name=_lang('消息'))
+    else:
+        msgbox = uia.Control.CreateControlFromElement(build_main_window(client)['msgbox'])
+    samples = record_samples(msgbox)
+    uia.SetAutomationClient(None)
+
+    classifier = get_classifier()
+    for sample in samples:
+        assert legacy_resolve(*sample) is classifier.resolve(*sample), f'分类结果不一致: {sample}'
+
+    rows = []
+    for name, resolve in (('if/elif', legacy_resolve), ('classifier', lambda *a: get_classifier().resolve(*a))):
+        seconds = timeit(lambda: [resolve(*sample) for sample in samples], args.repeat)
+        rows.append((f'{len(samples)} messages [{name}]', seconds, 0))
+        print(f'{name}: {len(samples) / seconds:,.0f} messages/s')
+    report(f'repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
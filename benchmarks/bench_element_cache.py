@@ -0,0 +1,76 @@
+"""
+Control.Exists的元素缓存：关闭 vs 开启
+
+只有从 AddElementCacheRoot 添加的长期存在的控件（窗口、ChatBox）出发的查找会被缓存，
+下面分别统计两类查找的耗时和COM调用次数：
+- 聊天窗口控件：每次重新创建控件并从ChatBox查找消息列表、输入框和按钮，缓存命中时不再遍历控件树，
+  只用1~2次轻量调用校验缓存的控件，调用次数略多但不再有遍历子树的FindFirst（--find-latency）
+- 逐条消息：解析每条消息并读取sender，从消息控件出发的临时查找不缓存，开启缓存不应增加COM调用
+
+    python benchmarks/bench_element_cache.py --latency 0.0001 --find-latency 0.002 --repeat 20
+"""
+from types import SimpleNamespace
+from common import build_main_window, make_parser, new_client, report, timeit
+from wxauto.uia import uiautomation as uia
+from wxauto.msgs.msg import parse_msg
+
+CHATBOX_SEARCHES = [
+    dict(control_type='ListControl', Name='消息'),
+    dict(control_type='EditControl'),
+    dict(control_type='ButtonControl', Name='发送(S)'),
+    dict(control_type='ButtonControl', Name='聊天信息'),
+    dict(control_type='ToolBarControl'),
+]
+
+
+def find_chatbox_controls(chatbox):
+    found = []
+    for kwargs in CHATBOX_SEARCHES:
+        kwargs = dict(kwargs)
+        control = getattr(chatbox, kwargs.pop('control_type'))(**kwargs)
+        found.append(control._element if control.Exists(0) else None)
+    return found
+
+
+def parse_senders(msgbox, parent):
+    for control in msgbox.GetChildren():
+        parse_msg(control, parent).sender
+
+
+def main():
+    parser = make_parser(__doc__)
+    parser.add_argument('--find-latency', type=float, default=0.002, help='每次模拟FindFirst/FindAll遍历子树的延迟（秒）')
+    args = parser.parse_args()
+    client = new_client(args.latency)
+    client.latencies.update(FindFirst=args.find_latency, FindAll=args.find_latency)
+    tree = build_main_window(client, msg_count=50)
+    uia.SetAutomationClient(client)
+    chatbox = uia.Control.CreateControlFromElement(tree['chatbox'])
+    uia.AddElementCacheRoot(chatbox)
+    msgbox = uia.Control.CreateControlFromElement(tree['msgbox'])
+    parent = SimpleNamespace(root=None)
+    count = len(tree['msgbox'].children)
+
+    element_cache = uia.ELEMENT_CACHE
+    rows = []
+    results = []
+    for name, func, per in (
+            ('chatbox controls', lambda: find_chatbox_controls(chatbox), 1),
+            ('parse_msg+sender (per msg)', lambda: parse_senders(msgbox, parent), count)):
+        for enabled in (False, True):
+            uia.ELEMENT_CACHE = enabled
+            uia.InvalidateElementCache()
+            result = func()
+            if result is not None:
+                results.append(result)
+            client.reset_stats()
+            seconds = timeit(func, args.repeat)
+            rows.append((f"{name} [{'cache' if enabled else 'no cache'}]", seconds / per, client.total_calls() / args.repeat / per))
+    assert results[0] == results[1], '开启缓存后查找结果不一致'
+    uia.ELEMENT_CACHE = element_cache
+    uia.SetAutomationClient(None)
+    report(f'latency={args.latency}s find latency={args.find_latency}s repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
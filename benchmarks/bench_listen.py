@@ -0,0 +1,168 @@
+"""
+监听新消息：按间隔轮询所有聊天窗口 vs 按聊天窗口自适应调度 vs 订阅结构变化事件只检查收到事件的聊天窗口
+
+模拟多个独立的聊天窗口，另一个线程随机向其中的窗口添加消息，大部分消息发往第一个窗口（--busy），
+统计从添加消息到检测到新消息的延迟中位数，以及没有新消息时每秒的COM调用次数
+
+    python benchmarks/bench_listen.py --chats 50 --messages 50
+"""
+import random
+import statistics
+import threading
+import time
+from common import add_text_message, make_parser, new_client, report
+from wxauto.uia import uiautomation as uia
+from wxauto.utils.msgids import MessageIdWindow
+from wxauto.utils.scheduler import PollScheduler
+
+
+def build_chats(client, count):
+    """每个聊天窗口只包含一个已有20条消息的消息列表"""
+    chats = []
+    for i in range(count):
+        window = client.new_element('WindowControl', class_name='ChatWnd', name=f'会话{i}', rect=(0, 0, 700, 800))
+        msgbox = window.new_child('ListControl', name='消息', rect=(0, 60, 700, 600))
+        for k in range(20):
+            add_text_message(msgbox, f'消息{k}')
+        client.add_window(window, 0x40000 + i * 0x10)
+        control = uia.Control.CreateControlFromElement(msgbox)
+        chats.append({
+            'handle': window.handle,
+            'msgbox': msgbox,
+            'control': control,
+            'ids': MessageIdWindow(100, control.GetChildrenRuntimeIds()),
+            'sent': [],
+        })
+    return chats
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+
+    def send(self, chat, text):
+        with self.lock:
+            chat['sent'].append(time.perf_counter())
+        add_text_message(chat['msgbox'], text)
+
+    def check(self, chat):
+        new = chat['ids'].update(chat['control'].GetChildrenRuntimeIds())
+        now = time.perf_counter()
+        with self.lock:
+            for _ in new:
+                if chat['sent']:
+                    self.latencies.append(now - chat['sent'].pop(0))
+        return len(new)
+
+
+def listen_poll(chats, recorder, stop, interval):
+    while not stop.is_set():
+        for chat in chats:
+            recorder.check(chat)
+        stop.wait(interval)
+
+
+def listen_adaptive(chats, recorder, stop, interval, max_interval, budget):
+    scheduler = PollScheduler(interval, max_interval, budget)
+    for i in range(len(chats)):
+        scheduler.add(i)
+    while not stop.is_set():
+        i, wait = scheduler.next()
+        if i is None:
+            stop.wait(wait)
+            continue
+        start = time.perf_counter()
+        count = recorder.check(chats[i])
+        scheduler.done(i, count, time.perf_counter() - start)
+
+
+def listen_event(chats, recorder, stop, delay, poll_interval):
+    dirty = set()
+    lock = threading.Lock()
+    wakeup = threading.Event()
+
+    def mark(handle):
+        with lock:
+            dirty.add(handle)
+        wakeup.set()
+
+    for chat in chats:
+        uia.UIEvents.Subscribe(chat['handle'], lambda change_type, handle=chat['handle']: mark(handle))
+    last_poll = time.time()
+    while not stop.is_set():
+        timeout = last_poll + poll_interval - time.time()
+        if timeout > 0 and wakeup.wait(timeout):
+            time.sleep(delay)
+        wakeup.clear()
+        with lock:
+            handles = set(dirty)
+            dirty.clear()
+        if time.time() - last_poll >= poll_interval:
+            last_poll = time.time()
+            handles = None
+        for chat in chats:
+            if handles is None or chat['handle'] in handles:
+                recorder.check(chat)
+    for chat in chats:
+        uia.UIEvents.Unsubscribe(chat['handle'])
+
+
+def run(mode, client, args):
+    chats = build_chats(client, args.chats)
+    recorder = Recorder()
+    stop = threading.Event()
+    if mode == 'poll':
+        target, params = listen_poll, (args.interval,)
+    elif mode == 'adaptive':
+        target, params = listen_adaptive, (args.interval, args.max_interval, args.budget)
+    else:
+        target, params = listen_event, (args.delay, args.poll_interval)
+    thread = threading.Thread(target=target, args=(chats, recorder, stop, *params), daemon=True)
+    thread.start()
+
+    time.sleep(0.2)
+    client.reset_stats()
+    time.sleep(args.idle)
+    idle_calls = client.total_calls() / args.idle
+
+    rng = random.Random(0)
+    for i in range(args.messages):
+        chat = chats[0] if rng.random() < args.busy else rng.choice(chats)
+        recorder.send(chat, f'新消息{i}')
+        time.sleep(rng.uniform(0.02, 0.2))
+    time.sleep(max(args.interval, args.max_interval) + args.delay + 0.5)
+    stop.set()
+    thread.join()
+    for chat in chats:
+        client.root.remove_child(chat['msgbox'].parent)
+    assert len(recorder.latencies) == args.messages, f'{mode}: 检测到{len(recorder.latencies)}条新消息'
+    return statistics.median(recorder.latencies), idle_calls
+
+
+def main():
+    parser = make_parser(__doc__)
+    parser.add_argument('--chats', type=int, default=50, help='聊天窗口数量')
+    parser.add_argument('--messages', type=int, default=50, help='新消息数量')
+    parser.add_argument('--interval', type=float, default=1.0, help='轮询间隔，对应WxParam.LISTEN_INTERVAL')
+    parser.add_argument('--max-interval', type=float, default=5, help='对应WxParam.LISTEN_MAX_INTERVAL')
+    parser.add_argument('--budget', type=float, default=20, help='对应WxParam.LISTEN_POLL_BUDGET')
+    parser.add_argument('--busy', type=float, default=0.8, help='发往第一个聊天窗口的消息比例')
+    parser.add_argument('--delay', type=float, default=0.03, help='对应WxParam.LISTEN_EVENT_DELAY')
+    parser.add_argument('--poll-interval', type=float, default=10, help='对应WxParam.LISTEN_EVENT_POLL_INTERVAL')
+    parser.add_argument('--idle', type=float, default=3, help='统计空闲COM调用的时长，单位秒')
+    args = parser.parse_args()
+
+    client = new_client(args.latency)
+    uia.SetAutomationClient(client)
+    rows = []
+    for mode in ('poll', 'adaptive', 'event'):
+        latency, idle_calls = run(mode, client, args)
+        rows.append((f'{mode} ({args.chats} chats)', latency, idle_calls))
+    uia.UIEvents.Stop()
+    uia.SetAutomationClient(None)
+    report('time = 新消息延迟中位数, com calls = 空闲时每秒COM调用次数', rows)
+
+
+if __name__ == '__main__':
+    main()
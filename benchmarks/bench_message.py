@@ -0,0 +1,60 @@
+"""
+消息对象构造：按需读取的消息属性
+
+旧实现在构造消息时就读取 sender、sender_remark（以及开启 MESSAGE_HASH 时的 hash），
+现在这些属性在首次访问时才读取，下面分别统计只访问部分属性时每条消息的COM调用次数。
+parse_msgs 批量解析时 sender、sender_remark 和 hash 来自缓存的子树，访问时不再产生COM调用
+
+    python benchmarks/bench_message.py --latency 0.0001 --repeat 5
+"""
+from types import SimpleNamespace
+from common import build_main_window, make_parser, new_client, report, timeit
+from wxauto.uia import uiautomation as uia
+from wxauto.param import WxParam
+from wxauto.msgs.msg import parse_msg, parse_msgs
+
+CASES = [
+    # (名称, 访问的属性, MESSAGE_HASH, 是否批量解析)
+    ('content', (), False, False),
+    ('content+sender', ('sender',), False, False),
+    ('all (old eager init)', ('sender', 'sender_remark'), False, False),
+    ('all + hash (old eager init)', ('sender', 'sender_remark', 'hash'), True, False),
+    ('parse_msgs all', ('sender', 'sender_remark'), False, True),
+    ('parse_msgs all + hash', ('sender', 'sender_remark', 'hash'), True, True),
+]
+
+
+def parse_messages(msgbox, parent, fields, batch):
+    if batch:
+        msgs = parse_msgs(msgbox, parent)
+    else:
+        msgs = [parse_msg(control, parent) for control in msgbox.GetChildren()]
+    for msg in msgs:
+        msg.content
+        for field in fields:
+            getattr(msg, field)
+
+
+def main():
+    args = make_parser(__doc__).parse_args()
+    client = new_client(args.latency)
+    tree = build_main_window(client, msg_count=100)
+    uia.SetAutomationClient(client)
+    msgbox = uia.Control.CreateControlFromElement(tree['msgbox'])
+    parent = SimpleNamespace(root=None)
+    count = len(tree['msgbox'].children)
+
+    rows = []
+    message_hash = WxParam.MESSAGE_HASH
+    for name, fields, enable_hash, batch in CASES:
+        WxParam.MESSAGE_HASH = enable_hash
+        client.reset_stats()
+        seconds = timeit(lambda: parse_messages(msgbox, parent, fields, batch), args.repeat)
+        rows.append((name, seconds / count, client.total_calls() / args.repeat / count))
+    WxParam.MESSAGE_HASH = message_hash
+    uia.SetAutomationClient(None)
+    report(f'per message, {count} messages, latency={args.latency}s repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
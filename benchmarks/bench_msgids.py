@@ -0,0 +1,62 @@
+"""
+新消息判断：全局元组 vs MessageIdWindow（环形队列 + 哈希索引）
+
+模拟监听轮询，每次轮询消息列表末尾新增一条消息，窗口大小与消息列表长度相同，
+只对新消息id的计算计时，不包含COM调用
+
+    python benchmarks/bench_msgids.py --repeat 200
+"""
+from common import make_parser, report, timeit
+from wxauto.utils.msgids import MessageIdWindow
+
+SIZES = (50, 500, 1000, 5000)
+
+
+def tuple_update(used, now_msg_ids, capacity):
+    """原来ChatBox.get_new_msgs中的实现"""
+    if (
+        not used
+        or now_msg_ids[-1] == used[-1]
+        or not set(now_msg_ids) & set(used)
+    ):
+        return used, []
+    used_set = set(used)
+    last_one_msgid = max((x for x in now_msg_ids if x in used_set), key=used.index, default=None)
+    new1 = [x for x in now_msg_ids if x not in used_set]
+    new2 = now_msg_ids[now_msg_ids.index(last_one_msgid) + 1:] if last_one_msgid is not None else []
+    new = [i for i in new1 if i in new2] if new2 else new1
+    return tuple(used + tuple(new))[-capacity:], new
+
+
+def make_polls(size, repeat):
+    """每次轮询时消息列表中的id，列表长度保持为size"""
+    ids = [f'42-{i}' for i in range(size + repeat)]
+    return [tuple(ids[i + 1:i + size + 1]) for i in range(repeat)], tuple(ids[:size])
+
+
+def run_tuple(polls, initial, size):
+    used = initial
+    for now_msg_ids in polls:
+        used, new = tuple_update(used, now_msg_ids, size)
+        assert len(new) == 1
+
+
+def run_window(polls, initial, size):
+    window = MessageIdWindow(size, initial)
+    for now_msg_ids in polls:
+        assert len(window.update(now_msg_ids)) == 1
+
+
+def main():
+    args = make_parser(__doc__).parse_args()
+    rows = []
+    for size in SIZES:
+        polls, initial = make_polls(size, args.repeat)
+        for name, func in (('tuple', run_tuple), ('window', run_window)):
+            seconds = timeit(lambda: func(polls, initial, size), 1) / args.repeat
+            rows.append((f'{name} size={size}', seconds, 0))
+    report(f'per poll, repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
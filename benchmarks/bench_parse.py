@@ -0,0 +1,50 @@
+"""
+消息列表解析：逐条parse_msg vs 一次缓存请求的parse_msgs
+
+模拟 ChatBox.get_msgs 解析整个可见消息列表
+
+    python benchmarks/bench_parse.py --latency 0.0001 --repeat 5
+"""
+from types import SimpleNamespace
+from common import build_main_window, make_parser, new_client, report, timeit
+from wxauto.uia import uiautomation as uia
+from wxauto.msgs.msg import parse_msg, parse_msgs
+
+
+def parse_each(msgbox, parent):
+    """旧实现：逐条消息解析"""
+    return [
+        parse_msg(control, parent)
+        for control in msgbox.GetCachedChildren()
+        if control.ControlTypeName == 'ListItemControl'
+    ]
+
+
+def parse_batch(msgbox, parent):
+    return parse_msgs(msgbox, parent)
+
+
+def main():
+    args = make_parser(__doc__).parse_args()
+    client = new_client(args.latency)
+    tree = build_main_window(client, msg_count=50)
+    uia.SetAutomationClient(client)
+    msgbox = uia.Control.CreateControlFromElement(tree['msgbox'])
+    parent = SimpleNamespace(root=None)
+
+    each = [type(m).__name__ for m in parse_each(msgbox, parent)]
+    batch = [type(m).__name__ for m in parse_batch(msgbox, parent)]
+    assert each == batch, f'解析结果不一致: {each} {batch}'
+
+    rows = []
+    for name, func in (('parse_msg', parse_each), ('parse_msgs', parse_batch)):
+        client.reset_stats()
+        seconds = timeit(lambda: func(msgbox, parent), args.repeat)
+        rows.append((f'{len(each)} messages [{name}]', seconds, client.total_calls() / args.repeat))
+        print(name, {k: v // args.repeat for k, v in sorted(client.stats().items())})
+    uia.SetAutomationClient(None)
+    report(f'latency={args.latency}s repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+空闲轮询：每次读取所有消息id vs 先比较首尾消息和滚动位置
+
+模拟多个没有新消息的聊天窗口，统计轮询一遍所有聊天窗口的耗时和COM调用次数，
+最后一轮向其中一个窗口添加一条消息，确认预检不会漏掉新消息
+
+    python benchmarks/bench_precheck.py --chats 60 --messages 100
+"""
+from common import add_text_message, make_parser, new_client, report, timeit
+from wxauto.param import WxParam
+from wxauto.uia import uiautomation as uia
+from wxauto.utils.msgids import MessageIdWindow
+
+MAX_AGE = WxParam.MESSAGE_PRECHECK_MAX_AGE
+
+
+def build_chats(client, count, messages):
+    chats = []
+    for i in range(count):
+        window = client.new_element('WindowControl', class_name='ChatWnd', name=f'会话{i}', rect=(0, 0, 700, 800))
+        msgbox = window.new_child('ListControl', name='消息', rect=(0, 60, 700, 600))
+        for k in range(messages):
+            add_text_message(msgbox, f'消息{k}')
+        client.add_window(window, 0x40000 + i * 0x10)
+        control = uia.Control.CreateControlFromElement(msgbox)
+        chats.append((msgbox, control, MessageIdWindow(messages)))
+    return chats
+
+
+def poll_full(chats):
+    new = 0
+    for _, control, window in chats:
+        new += len(window.update(control.GetChildrenRuntimeIds()))
+    return new
+
+
+def poll_precheck(chats):
+    new = 0
+    for _, control, window in chats:
+        signature = control.GetChildrenSignature()
+        if window.unchanged(signature, MAX_AGE):
+            continue
+        new += len(window.update(control.GetChildrenRuntimeIds(), signature=signature))
+    return new
+
+
+def main():
+    parser = make_parser(__doc__)
+    parser.add_argument('--chats', type=int, default=60, help='聊天窗口数量')
+    parser.add_argument('--messages', type=int, default=100, help='每个聊天窗口的消息数量')
+    args = parser.parse_args()
+
+    client = new_client(args.latency)
+    uia.SetAutomationClient(client)
+    rows = []
+    for name, poll in (('full', poll_full), ('precheck', poll_precheck)):
+        chats = build_chats(client, args.chats, args.messages)
+        poll(chats)
+        client.reset_stats()
+        seconds = timeit(lambda: poll(chats), args.repeat)
+        calls = client.total_calls() / args.repeat
+        add_text_message(chats[0][0], '新消息')
+        assert poll(chats) == 1, f'{name}: 没有检测到新消息'
+        rows.append((f'{name} ({args.chats} chats)', seconds, calls))
+        for msgbox, _, _ in chats:
+            client.root.remove_child(msgbox.parent)
+    uia.SetAutomationClient(None)
+    report(f'idle poll of all chats, {args.messages} messages per chat', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+GetProgenyControl：逐层GetChildren遍历 vs 一次BuildUpdatedCache快照
+
+模拟 SessionElement 初始化时对每个会话的4次 GetProgenyControl 调用
+
+    python benchmarks/bench_progeny.py --latency 0.0001 --repeat 5
+"""
+from common import build_main_window, make_parser, new_client, report, timeit
+from wxauto.uia import uiautomation as uia
+
+
+def walk_progeny(control):
+    """旧实现：递归GetChildren，按深度分组"""
+    levels = []
+
+    def walk(c, depth=0):
+        if depth == len(levels):
+            levels.append([])
+        levels[depth].append(c)
+        for child in c.GetChildren():
+            walk(child, depth + 1)
+
+    walk(control)
+    return levels
+
+
+def walk_progeny_control(levels, depth, index=0, control_type=None):
+    try:
+        controls = levels[depth]
+        if control_type:
+            controls = [c for c in controls if c.ControlTypeName == control_type]
+        if index < len(controls):
+            return controls[index]
+    except IndexError:
+        return
+
+
+def parse_sessions_walk(session_list):
+    for item in session_list.GetCachedChildren():
+        levels = walk_progeny(item)
+        walk_progeny_control(levels, 3)
+        walk_progeny_control(levels, 4, -1, 'TextControl')
+        walk_progeny_control(levels, 4, 1, 'PaneControl')
+        walk_progeny_control(levels, 2, 2)
+
+
+def parse_sessions_snapshot(session_list):
+    for item in session_list.GetCachedChildren():
+        item.GetProgenyControl(3)
+        item.GetProgenyControl(4, -1, control_type='TextControl')
+        item.GetProgenyControl(4, 1, control_type='PaneControl')
+        item.GetProgenyControl(2, 2)
+
+
+def main():
+    args = make_parser(__doc__).parse_args()
+    client = new_client(args.latency)
+    tree = build_main_window(client, session_count=100)
+    uia.SetAutomationClient(client)
+    session_list = uia.Control.CreateControlFromElement(tree['session_list'])
+
+    rows = []
+    for name, func in (('walk', parse_sessions_walk), ('snapshot', parse_sessions_snapshot)):
+        client.reset_stats()
+        seconds = timeit(lambda: func(session_list), args.repeat)
+        rows.append((f'100 sessions [{name}]', seconds, client.total_calls() / args.repeat))
+    uia.SetAutomationClient(None)
+    report(f'latency={args.latency}s repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Control查找：Python遍历 vs UIAutomation原生条件查找
+
+    python benchmarks/bench_search.py --latency 0.0001 --repeat 20
+"""
+from common import build_main_window, make_parser, new_client, report, timeit
+from wxauto.uia import uiautomation as uia
+
+
+CASES = [
+    # (名称, 查找参数)
+    ('Button Name (missing, depth 9)', dict(control_type='ButtonControl', Name='公众号主页', searchDepth=9)),
+    ('Button Name (exists)', dict(control_type='ButtonControl', Name='发送(S)')),
+    ('List Name (exists, depth 7)', dict(control_type='ListControl', Name='会话', searchDepth=7)),
+    ('Edit (first)', dict(control_type='EditControl')),
+    ('Button foundIndex=3', dict(control_type='ButtonControl', foundIndex=3)),
+    ('Button RegexName (missing)', dict(control_type='ButtonControl', RegexName='.*?条新消息')),
+]
+
+
+def run_case(window, kwargs):
+    kwargs = dict(kwargs)
+    control_type = kwargs.pop('control_type')
+    control = getattr(window, control_type)(**kwargs)
+    return control._element if control.Exists(0) else None
+
+
+def main():
+    args = make_parser(__doc__).parse_args()
+    client = new_client(args.latency)
+    if args.tree:
+        root = client.load_file(args.tree)
+    else:
+        root = build_main_window(client)['window']
+    uia.SetAutomationClient(client)
+    window = uia.Control.CreateControlFromElement(root)
+
+    rows = []
+    for name, kwargs in CASES:
+        results = []
+        for native in (False, True):
+            uia.NATIVE_SEARCH = native
+            results.append(run_case(window, kwargs))
+            client.reset_stats()
+            seconds = timeit(lambda: run_case(window, kwargs), args.repeat)
+            rows.append((f"{name} [{'native' if native else 'walk'}]", seconds, client.total_calls() / args.repeat))
+        assert results[0] is results[1], f'{name}: 查找结果不一致 {results}'
+    uia.NATIVE_SEARCH = True
+    uia.SetAutomationClient(None)
+    report(f'latency={args.latency}s repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+新消息判断的正确性与吞吐量：原来的启发式判断 vs 按锚点对齐的序列比较
+
+随机生成消息列表的变化序列：新消息追加、向上滚动加载旧消息、列表虚拟化丢弃顶部消息、
+部分消息重新渲染（换成新的RuntimeId，内容不变）、撤回最后一条消息（换成撤回提示）的同时收到新消息，
+统计漏掉和重复报告的新消息数量以及每次轮询的耗时，不包含COM调用。
+anchor只比较id，anchor+keys同时比较消息内容（与ChatBox.get_new_msgs相同）
+
+    python benchmarks/bench_seqdiff.py --repeat 200
+"""
+import random
+import time
+from common import make_parser, report
+from wxauto.utils.msgids import MessageIdWindow
+
+CAPACITY = 100
+
+
+class SimulatedList:
+    """模拟消息列表，只记录每条消息当前控件的id和内容"""
+
+    def __init__(self, rng: random.Random, size: int):
+        self.rng = rng
+        self.serial = 0
+        self.ids = [self.new_id() for _ in range(size)]
+        self.names = [self.new_name() for _ in range(size)]
+
+    def new_id(self) -> str:
+        self.serial += 1
+        return f'42-{self.serial}'
+
+    def new_name(self) -> str:
+        return self.rng.choice(('[图片]', '[动画表情]', '好的', f'消息{self.serial}'))
+
+    def step(self) -> list:
+        """随机变化一次，返回真正的新消息id"""
+        rng = self.rng
+        received = [self.new_id() for _ in range(rng.choice((0, 0, 1, 1, 2, 5)))]
+        appended = list(received)
+        if rng.random() < 0.2:  # 向上加载更多
+            count = rng.randint(5, 30)
+            self.ids[:0] = [self.new_id() for _ in range(count)]
+            self.names[:0] = [self.new_name() for _ in range(count)]
+        if rng.random() < 0.3:  # 重新渲染若干条消息
+            for i in rng.sample(range(len(self.ids)), min(len(self.ids), rng.randint(1, 5))):
+                self.ids[i] = self.new_id()
+        if received and rng.random() < 0.1:  # 撤回最后一条消息，撤回提示也是新消息
+            self.ids[-1] = self.new_id()
+            self.names[-1] = '"张三" 撤回了一条消息'
+            appended.insert(0, self.ids[-1])
+        self.ids += received
+        self.names += [self.new_name() for _ in received]
+        if len(self.ids) > 300 and rng.random() < 0.5:  # 虚拟化，只保留最后的部分消息
+            count = rng.randint(1, len(self.ids) - 200)
+            del self.ids[:count], self.names[:count]
+        return appended
+
+
+def tuple_update(used, now_msg_ids, capacity=CAPACITY):
+    """原来ChatBox.get_new_msgs中的实现"""
+    if (
+        not used
+        or now_msg_ids[-1] == used[-1]
+        or not set(now_msg_ids) & set(used)
+    ):
+        return used, []
+    used_set = set(used)
+    last_one_msgid = max((x for x in now_msg_ids if x in used_set), key=used.index, default=None)
+    new1 = [x for x in now_msg_ids if x not in used_set]
+    new2 = now_msg_ids[now_msg_ids.index(last_one_msgid) + 1:] if last_one_msgid is not None else []
+    new = [i for i in new1 if i in new2] if new2 else new1
+    return tuple(used + tuple(new))[-capacity:], new
+
+
+def make_sequences(repeat, polls, seed=0):
+    """生成repeat个变化序列，每个序列为((初始id, 内容), [(当前id, 内容, 真正的新消息id), ...])"""
+    rng = random.Random(seed)
+    sequences = []
+    for _ in range(repeat):
+        msglist = SimulatedList(rng, rng.randint(20, 150))
+        initial = (tuple(msglist.ids), tuple(msglist.names))
+        steps = []
+        for _ in range(polls):
+            appended = msglist.step()
+            steps.append((tuple(msglist.ids), tuple(msglist.names), appended))
+        sequences.append((initial, steps))
+    return sequences
+
+
+def run_tuple(sequences):
+    missed = duplicated = 0
+    for (initial, _), steps in sequences:
+        used = initial
+        for ids, _, expected in steps:
+            used, new = tuple_update(used, ids)
+            missed += len(set(expected) - set(new))
+            duplicated += len(set(new) - set(expected))
+    return missed, duplicated
+
+
+def run_window(sequences, with_keys=False):
+    missed = duplicated = 0
+    for (initial, names), steps in sequences:
+        window = MessageIdWindow(CAPACITY, initial, names if with_keys else None)
+        for ids, names, expected in steps:
+            new = window.update(ids, keys=names if with_keys else None)
+            missed += len(set(expected) - set(new))
+            duplicated += len(set(new) - set(expected))
+    return missed, duplicated
+
+
+def main():
+    parser = make_parser(__doc__)
+    parser.add_argument('--polls', type=int, default=50, help='每个序列的轮询次数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+    sequences = make_sequences(args.repeat, args.polls, args.seed)
+    polls = args.repeat * args.polls
+    expected = sum(len(new) for _, steps in sequences for _, _, new in steps)
+
+    rows = []
+    print(f'{polls} polls, {expected} new messages')
+    print(f"{'method':<14}{'missed':>10}{'duplicated':>12}")
+    for name, func in (('tuple', run_tuple), ('anchor', run_window),
+                       ('anchor+keys', lambda sequences: run_window(sequences, True))):
+        t0 = time.perf_counter()
+        missed, duplicated = func(sequences)
+        rows.append((f'{name} per poll', (time.perf_counter() - t0) / polls, 0))
+        print(f'{name:<14}{missed:>10}{duplicated:>12}')
+    print()
+    report(f'repeat={args.repeat} polls={args.polls}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+时间文字解析：逐条解析 vs 预编译正则 + 按(时间文字, 参考日期)缓存
+
+模拟导出聊天记录时对大量重复时间文字的解析，不包含COM调用
+
+    python benchmarks/bench_time.py --repeat 20
+"""
+from common import make_parser, report, timeit
+from wxauto.utils import wechat_time
+from wxauto.utils.wechat_time import parse_wechat_time, reference_time
+
+TEXTS = [
+    '10:21', '昨天 23:05', '星期一 08:30', '星期天 12:00',
+    '2024年3月5日 14:07', '01-02 下午 12:30', '03-04 10:11:12', '以下为新消息',
+]
+
+
+def make_texts(count=5000):
+    """聊天记录中每隔几条消息出现一次时间文字，大部分重复"""
+    return [TEXTS[i % len(TEXTS)] if i % 7 else f'{i // 60 % 24:02d}:{i % 60:02d}' for i in range(count)]
+
+
+def parse_uncached(texts):
+    parse = wechat_time._parse.__wrapped__
+    for text in texts:
+        parse(text, wechat_time.get_reference_time().date())
+
+
+def parse_cached(texts):
+    wechat_time._parse.cache_clear()
+    with reference_time():
+        for text in texts:
+            parse_wechat_time(text)
+
+
+def main():
+    args = make_parser(__doc__).parse_args()
+    texts = make_texts()
+    rows = [
+        (f'uncached ({len(texts)} texts)', timeit(lambda: parse_uncached(texts), args.repeat), 0),
+        (f'cached ({len(texts)} texts)', timeit(lambda: parse_cached(texts), args.repeat), 0),
+    ]
+    report(f'repeat={args.repeat}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+基准测试公共工具
+
+基于 wxauto.uia.simulate 构造一棵与微信3.9主窗口结构相近的控件树，
+也可以通过 --tree 参数加载真实环境导出的控件树文本（例如 wxauto_DEBUG_INIT.txt）。
+"""
+from pathlib import Path
+import argparse
+import time
+import sys
+
+# 直接运行 python benchmarks/bench_xxx.py 时，从仓库根目录导入wxauto
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from wxauto.uia import simulate
+
+MAIN_WINDOW_HANDLE = 0x30010
+
+
+def add_time_message(msgbox, text='10:21'):
+    """添加一条时间消息（1个子控件）"""
+    top = _next_top(msgbox)
+    item = msgbox.new_child('ListItemControl', name=text, rect=(310, top, 1010, top + 34))
+    item.new_child('TextControl', name=text, rect=(630, top + 8, 690, top + 26))
+    return item
+
+
+def add_text_message(msgbox, content, sender='张三', is_self=False):
+    """添加一条文本消息（8个子控件）"""
+    top = _next_top(msgbox)
+    bottom = top + 52
+    item = msgbox.new_child('ListItemControl', name=content, rect=(310, top, 1010, bottom))
+    pane = item.new_child('PaneControl', rect=(310, top, 1010, bottom))
+    head_left = 960 if is_self else 320
+    if is_self:
+        pane.new_child('PaneControl', rect=(310, top, 900, bottom))
+    pane.new_child('ButtonControl', name=sender, rect=(head_left, top + 4, head_left + 36, top + 40))
+    body = pane.new_child('PaneControl', rect=(366, top, 900, bottom))
+    bubble = body.new_child('PaneControl', rect=(366, top + 4, 600, bottom - 4))
+    text_box = bubble.new_child('PaneControl', rect=(376, top + 8, 590, bottom - 8))
+    text_box.new_child('TextControl', name=content, rect=(376, top + 8, 590, bottom - 8))
+    body.new_child('PaneControl', rect=(600, top, 900, bottom))
+    if not is_self:
+        pane.new_child('PaneControl', rect=(900, top, 1010, bottom))
+    return item
+
+
+def add_session(session_list, name, content='', time_text='10:21'):
+    """添加一个会话"""
+    top = _next_top(session_list)
+    item = session_list.new_child('ListItemControl', name=name, rect=(60, top, 310, top + 64))
+    pane = item.new_child('PaneControl', rect=(60, top, 310, top + 64))
+    pane.new_child('ButtonControl', name=name, rect=(72, top + 12, 112, top + 52))
+    info = pane.new_child('PaneControl', rect=(120, top + 10, 300, top + 54))
+    line1 = info.new_child('PaneControl', rect=(120, top + 10, 300, top + 30))
+    line1.new_child('TextControl', name=name, rect=(120, top + 10, 240, top + 30))
+    line1.new_child('TextControl', name=time_text, rect=(260, top + 10, 300, top + 30))
+    line2 = info.new_child('PaneControl', rect=(120, top + 34, 300, top + 54))
+    line2.new_child('TextControl', name=content, rect=(120, top + 34, 300, top + 54))
+    return item
+
+
+def _next_top(list_element):
+    if list_element.children:
+        return list_element.children[-1].rect[3]
+    return list_element.rect[1]
+
+
+def build_main_window(client, msg_count=100, session_count=50):
+    """构造微信主窗口控件树
+
+    Returns:
+        dict: window、session_list、msgbox 等关键节点
+    """
+    window = client.new_element('WindowControl', class_name='WeChatMainWndForPC', name='微信', rect=(0, 0, 1010, 800))
+    main1 = window.new_child('PaneControl', rect=(0, 0, 1010, 800))
+    main2 = main1.new_child('PaneControl', rect=(0, 0, 1010, 800))
+    navigation = main2.new_child('PaneControl', name='导航', rect=(0, 0, 60, 800))
+    for name in ('聊天', '通讯录', '收藏', '聊天文件', '朋友圈', '视频号', '看一看', '搜一搜', '小程序面板', '手机', '设置及其他'):
+        navigation.new_child('ButtonControl', name=name, rect=(10, 0, 50, 40))
+    sessionbox = main2.new_child('PaneControl', rect=(60, 0, 310, 800))
+    search = sessionbox.new_child('PaneControl', rect=(60, 0, 310, 60))
+    search.new_child('EditControl', name='搜索', rect=(70, 20, 260, 44))
+    search.new_child('ButtonControl', name='发起群聊', rect=(270, 20, 300, 44))
+    list_pane = sessionbox.new_child('PaneControl', rect=(60, 60, 310, 800))
+    session_list = list_pane.new_child('ListControl', name='会话', rect=(60, 60, 310, 800))
+    for i in range(session_count):
+        add_session(session_list, f'会话{i}', f'消息内容{i}')
+    chatbox = main2.new_child('PaneControl', rect=(310, 0, 1010, 800))
+    title = chatbox.new_child('PaneControl', rect=(310, 0, 1010, 60))
+    title.new_child('TextControl', name='会话0', rect=(330, 20, 400, 40))
+    title.new_child('ButtonControl', name='聊天信息', rect=(960, 20, 990, 40))
+    body = chatbox.new_child('PaneControl', rect=(310, 60, 1010, 800))
+    msg_pane = body.new_child('PaneControl', rect=(310, 60, 1010, 600))
+    msgbox = msg_pane.new_child('ListControl', name='消息', rect=(310, 60, 1010, 600))
+    for i in range(msg_count):
+        if i % 10 == 0:
+            add_time_message(msgbox, f'{10 + i // 60:02d}:{i % 60:02d}')
+        else:
+            add_text_message(msgbox, f'消息{i}', sender='张三', is_self=(i % 3 == 0))
+    input_pane = body.new_child('PaneControl', rect=(310, 600, 1010, 800))
+    tools = input_pane.new_child('PaneControl', rect=(310, 600, 1010, 640))
+    toolbar = tools.new_child('ToolBarControl', rect=(310, 600, 1010, 640))
+    for name in ('表情(Alt+E)', '发送文件', '截图', '聊天记录', '语音聊天', '视频聊天'):
+        toolbar.new_child('ButtonControl', name=name, rect=(320, 605, 350, 635))
+    input_pane.new_child('EditControl', name='会话0', rect=(310, 640, 1010, 760))
+    input_pane.new_child('ButtonControl', name='发送(S)', rect=(900, 760, 990, 790))
+    client.add_window(window, MAIN_WINDOW_HANDLE)
+    return {
+        'window': window,
+        'session_list': session_list,
+        'chatbox': chatbox,
+        'msgbox': msgbox,
+    }
+
+
+def make_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--latency', type=float, default=0.0001, help='每次模拟COM调用的延迟（秒）')
+    parser.add_argument('--repeat', type=int, default=20, help='重复次数')
+    parser.add_argument('--tree', default=None, help='从控件树文本加载窗口，例如wxauto_DEBUG_INIT.txt')
+    return parser
+
+
+def timeit(func, repeat):
+    """运行repeat次，返回平均耗时（秒）"""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - t0) / repeat
+
+
+def report(title, rows):
+    """打印结果表格，rows为[(名称, 耗时秒, COM调用次数), ...]"""
+    print(title)
+    print(f"{'case':<36}{'time(ms)':>12}{'com calls':>12}")
+    for name, seconds, calls in rows:
+        print(f"{name:<36}{seconds * 1000:>12.3f}{calls:>12.1f}")
+    print()
+
+
+def new_client(latency):
+    return simulate.SimulatedClient(latency=latency)
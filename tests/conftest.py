@@ -0,0 +1,57 @@
+"""
+测试公共夹具
+
+测试基于 wxauto.uia.simulate，从 tests/data 中的控件树文本（`Control.tree()` 的输出格式）加载微信窗口，
+不需要Windows和微信客户端
+"""
+from pathlib import Path
+from types import SimpleNamespace
+from wxauto.param import WxParam
+from wxauto.uia import simulate, uiautomation as uia
+import pytest
+
+DATA_DIR = Path(__file__).parent / 'data'
+
+# 不在工作目录中创建wxauto_logs
+WxParam.ENABLE_FILE_LOGGER = False
+
+
+@pytest.fixture
+def client():
+    client = simulate.SimulatedClient()
+    uia.SetAutomationClient(client)
+    yield client
+    uia.SetAutomationClient(None)
+
+
+@pytest.fixture
+def main_window(client):
+    """加载微信主窗口，返回窗口控件"""
+    root = client.load_file(DATA_DIR / 'wechat_main.txt', handle=0x30010)
+    return uia.Control.CreateControlFromElement(root)
+
+
+def find_element(client, control_type, name=None):
+    """在模拟的控件树中查找第一个匹配的控件"""
+    for element in client.root.iter_descendants():
+        if element.control_type == getattr(uia.ControlType, control_type) and (name is None or element.name == name):
+            return element
+    raise LookupError(control_type, name)
+
+
+@pytest.fixture
+def msgbox(client, main_window):
+    """主窗口中的消息列表控件"""
+    return uia.Control.CreateControlFromElement(find_element(client, 'ListControl', '消息'))
+
+
+@pytest.fixture
+def parent():
+    """消息和会话的parent，只需要root属性"""
+    return SimpleNamespace(root=None)
+
+
+@pytest.fixture
+def no_mouse(monkeypatch):
+    """非Windows环境下没有鼠标，点击操作不做任何事"""
+    monkeypatch.setattr(uia.Control, 'MiddleClick', lambda self, *args, **kwargs: None)
@@ -0,0 +1,31 @@
+"""消息结构指纹：指纹表生成工具与解析时的查找"""
+from wxauto.msgs import fingerprint
+from wxauto.msgs.fingerprint_tools import build_table
+from wxauto.msgs.msg import parse_msgs
+from wxauto.param import WxParam
+import subprocess
+import sys
+
+
+def test_runtime_does_not_import_tools():
+    code = 'import sys, wxauto.msgs; print("wxauto.uia.simulate" in sys.modules)'
+    assert subprocess.check_output([sys.executable, '-c', code], text=True).strip() == 'False'
+
+
+def test_default_off():
+    assert WxParam.MESSAGE_FINGERPRINT is False
+
+
+def test_table_from_labeled_fixtures(msgbox, parent, tmp_path, monkeypatch):
+    expected = [type(msg).__name__ for msg in parse_msgs(msgbox, parent)]
+    for i, (control, label) in enumerate(zip(msgbox.GetChildren(), expected)):
+        path = tmp_path / label / f'{i}.txt'
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(control.snapshot(properties=fingerprint.FINGERPRINT_PROPERTIES).to_text(), encoding='utf-8')
+    table, conflicts = build_table(tmp_path)
+    assert not conflicts
+    assert set(table.values()) == set(expected)
+
+    monkeypatch.setattr(fingerprint, 'FINGERPRINTS', table)
+    monkeypatch.setattr(WxParam, 'MESSAGE_FINGERPRINT', True)
+    assert [type(msg).__name__ for msg in parse_msgs(msgbox, parent)] == expected
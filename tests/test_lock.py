@@ -0,0 +1,69 @@
+"""uilock 与 UI 工作线程：所有UI操作串行执行"""
+from wxauto.param import WxParam
+from wxauto.utils.lock import LockManager, uilock
+from wxauto.utils.worker import in_ui_worker, shutdown_ui_workers
+import threading
+import time
+import pytest
+
+
+@pytest.fixture
+def ui_worker(monkeypatch):
+    monkeypatch.setattr(WxParam, 'UI_WORKER', True)
+    yield
+    shutdown_ui_workers()
+
+
+class Recorder:
+    """记录同时执行的调用数量"""
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.workers = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.workers.append(in_ui_worker())
+        time.sleep(0.02)
+        with self._lock:
+            self.active -= 1
+
+
+def test_worker_call_waits_for_uilock(ui_worker):
+    recorder = Recorder()
+    work = uilock(recorder)
+    with LockManager.thread_lock:
+        thread = threading.Thread(target=work)
+        thread.start()
+        time.sleep(0.1)
+        # 其他线程持有锁时工作线程不会执行
+        assert recorder.workers == []
+    thread.join(1)
+    assert recorder.workers == [True]
+
+
+def test_worker_and_direct_calls_are_serialized(ui_worker):
+    recorder = Recorder()
+    work = uilock(recorder)
+
+    def direct():
+        # 不经过工作线程的调用，例如UI_WORKER切换期间
+        for _ in range(5):
+            with LockManager.thread_lock:
+                recorder()
+
+    def submitted():
+        for _ in range(5):
+            work()
+
+    threads = [threading.Thread(target=direct), threading.Thread(target=submitted)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(recorder.workers) == 10
+    assert True in recorder.workers and False in recorder.workers
+    assert recorder.max_active == 1
@@ -0,0 +1,58 @@
+"""已读消息id窗口"""
+from wxauto.utils.msgids import MessageIdRegistry, MessageIdWindow
+
+
+def test_window_capacity():
+    window = MessageIdWindow(3, 'abcde')
+    assert list(window) == ['c', 'd', 'e']
+    assert 'b' not in window and window.last == 'e'
+    assert window.position('e') > window.position('c')
+
+
+def test_update_appended():
+    window = MessageIdWindow(100, 'abc')
+    assert window.update(list('abcde')) == ['d', 'e']
+    assert window.update(list('abcde')) == []
+    # 向上加载的旧消息不是新消息
+    assert window.update(list('xyabcde')) == []
+
+
+def test_update_last_message_replaced():
+    # 最后一条消息被撤回或删除的同时收到新消息
+    window = MessageIdWindow(100, 'abc')
+    assert window.update(list('abd')) == ['d']
+    window = MessageIdWindow(100, 'abc', ['早', '好', '吃了吗'])
+    assert window.update(list('abd'), keys=['早', '好', '吃了']) == ['d']
+
+
+def test_update_rerendered_with_keys():
+    window = MessageIdWindow(100, 'abc', ['早', '好', '[图片]'])
+    # 图片加载完成后最后一条消息换了id
+    assert window.update(list('abC'), keys=['早', '好', '[图片]']) == []
+    assert window.update(list('abCd'), keys=['早', '好', '[图片]', '[图片]']) == ['d']
+    # 窗口记录了新id的key，之后仍然可以识别重新渲染
+    assert window.update(list('abCD'), keys=['早', '好', '[图片]', '[图片]']) == []
+
+
+def test_update_empty_window():
+    assert MessageIdWindow(100).update(list('ab')) == []
+    assert MessageIdWindow(100).update(list('ab'), from_empty=True) == ['a', 'b']
+
+
+def test_unchanged_signature():
+    window = MessageIdWindow(100, 'ab')
+    assert not window.unchanged(('a', 'b'), 10)
+    window.update(list('ab'), signature=('a', 'b'))
+    assert window.unchanged(('a', 'b'), 10)
+    assert not window.unchanged(('a', 'c'), 10)
+    assert not window.unchanged(('a', 'b'), -1)
+    window.reset('ab')
+    assert not window.unchanged(('a', 'b'), 10)
+
+
+def test_registry():
+    registry = MessageIdRegistry(5)
+    window = registry.get('chat')
+    assert registry.get('chat') is window and window.capacity == 5
+    assert registry.get('other', 10).capacity == 10
+    assert registry.pop('chat') is window and 'chat' not in registry
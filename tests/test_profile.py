@@ -0,0 +1,35 @@
+"""ComProfiler：COM调用按API统计"""
+from wxauto.uia import uiautomation as uia
+import pytest
+
+
+@uia.ProfileApis
+class Api:
+    def __init__(self, control):
+        self.control = control
+
+    def Name(self):
+        return self.control.Name
+
+    @uia.NoProfileApi
+    def KeepRunning(self, count):
+        for _ in range(count):
+            self.Name()
+
+
+@pytest.fixture
+def profile(client):
+    uia.EnableComProfiling()
+    uia.ComProfile.Reset()
+    yield
+    uia.EnableComProfiling(False)
+    uia.ComProfile.Reset()
+
+
+def test_blocking_method_not_profiled(profile, main_window):
+    api = Api(main_window)
+    api.KeepRunning(3)
+    apis = uia.GetComProfile()['apis']
+    assert 'Api.KeepRunning' not in apis
+    assert apis['Api.Name']['calls'] == 3
+    assert apis['Api.Name']['com_calls'] == 3
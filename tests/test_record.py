@@ -0,0 +1,48 @@
+"""消息记录的序列化：to_bytes、to_json以及保存到消息库后读取"""
+from wxauto.msgs.msg import parse_msgs
+from wxauto.msgs.record import MessageRecord
+from wxauto.msgs.store import MessageStore, to_records
+from wxauto.param import WxParam
+import pytest
+
+FILE_RECORD = MessageRecord(
+    '42', '张三', 'FriendFileMessage', 'file', 'friend', '[文件]', '张三', '老张',
+    hash='1f2e', time='2025-01-01 10:01:00', seq=1,
+    extra=(('filename', '季度报告.pdf'), ('filesize', '1.2M'), ('pages', (1, (2, 3))), ('note', None)),
+)
+
+
+@pytest.fixture
+def records(client, msgbox, parent, monkeypatch):
+    monkeypatch.setattr(WxParam, 'MESSAGE_HASH', True)
+    return to_records(parse_msgs(msgbox, parent), '张三') + [FILE_RECORD]
+
+
+def test_to_record(records):
+    assert [r.class_name for r in records[:-1]] == [
+        'TimeMessage', 'FriendTextMessage', 'SelfTextMessage', 'SystemMessage', 'TimeMessage', 'FriendTextMessage'
+    ]
+    assert all(r.chat == '张三' and r.hash for r in records)
+    # 时间消息之后的消息使用该时间
+    assert records[1].time == records[0].time
+    assert FILE_RECORD.get('filename') == '季度报告.pdf'
+    assert FILE_RECORD.get('missing', '') == ''
+
+
+@pytest.mark.parametrize('dump, load', [
+    (MessageRecord.to_bytes, MessageRecord.from_bytes),
+    (MessageRecord.to_json, MessageRecord.from_json),
+    (MessageRecord.to_dict, MessageRecord.from_dict),
+])
+def test_round_trip(records, dump, load):
+    for r in records:
+        loaded = load(dump(r))
+        assert loaded == r
+        # extra中的元组经过JSON后仍然是元组
+        assert all(type(v) is type(dict(r.extra)[k]) for k, v in loaded.extra)
+
+
+def test_store_round_trip(records):
+    store = MessageStore(':memory:')
+    assert store.add_records(records) == len(records)
+    assert sorted(store.query('张三', limit=len(records))) == sorted(records)
@@ -0,0 +1,117 @@
+"""监听轮询调度"""
+from wxauto.utils.scheduler import PollScheduler
+import threading
+
+
+def test_stats_while_listening():
+    scheduler = PollScheduler()
+    stop = threading.Event()
+    errors = []
+
+    def listen():
+        # 监听线程中不断添加和移除聊天窗口
+        n = 0
+        while not stop.is_set():
+            scheduler.add(n)
+            scheduler.remove(n - 50)
+            n += 1
+
+    def read_stats():
+        try:
+            for _ in range(2000):
+                scheduler.stats()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            stop.set()
+
+    threads = [threading.Thread(target=listen), threading.Thread(target=read_stats)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def poll(scheduler, clock, key, messages=0, duration=0):
+    """等到key到期后检查一次，返回等待的秒数"""
+    waited = 0
+    while True:
+        who, wait = scheduler.next()
+        if who is not None:
+            assert who == key
+            scheduler.done(who, messages, duration)
+            return waited
+        clock.now += wait
+        waited += wait
+
+
+def test_backoff_and_reset():
+    clock = Clock()
+    scheduler = PollScheduler(1, 5, clock=clock)
+    scheduler.add('a')
+    assert scheduler.next() == ('a', 0)
+    scheduler.done('a')
+    # 没有新消息时间隔逐次翻倍，最长为max_interval
+    assert [poll(scheduler, clock, 'a') for _ in range(4)] == [2, 4, 5, 5]
+    # 检查到新消息后恢复为最小间隔
+    assert poll(scheduler, clock, 'a', messages=1) == 5
+    assert poll(scheduler, clock, 'a') == 1
+    stats = scheduler.stats()['a']
+    assert stats['polls'] == 7 and stats['hits'] == 1 and stats['messages'] == 1
+    assert stats['interval'] == 2
+
+
+def test_fixed_interval_when_max_equals_min():
+    clock = Clock()
+    scheduler = PollScheduler(1, 1, clock=clock)
+    scheduler.add('a')
+    assert [poll(scheduler, clock, 'a') for _ in range(4)] == [0, 1, 1, 1]
+
+
+def test_slow_chat():
+    clock = Clock()
+    scheduler = PollScheduler(1, 5, slow_factor=10, clock=clock)
+    scheduler.add('a')
+    poll(scheduler, clock, 'a', messages=1, duration=0.3)
+    # 检查耗时0.3秒，间隔至少为3秒
+    assert poll(scheduler, clock, 'a', messages=1) == 3
+
+
+def test_budget():
+    clock = Clock()
+    scheduler = PollScheduler(1, 1, budget=2, clock=clock)
+    for key in 'abcd':
+        scheduler.add(key)
+    assert scheduler.next() == ('a', 0)
+    assert scheduler.next() == ('b', 0)
+    # 每秒最多检查2次，第3次需要等待补充
+    assert scheduler.next() == (None, 0.5)
+    clock.now += 0.5
+    assert scheduler.next() == ('c', 0)
+
+
+def test_wake_and_remove():
+    clock = Clock()
+    scheduler = PollScheduler(1, 5, clock=clock)
+    scheduler.add('a')
+    scheduler.add('b', delay=3)
+    assert scheduler.next() == ('a', 0)
+    scheduler.done('a')
+    assert scheduler.next() == (None, 2)
+    scheduler.wake('b')
+    assert scheduler.next() == ('b', 0)
+    scheduler.done('b')
+    scheduler.remove('a')
+    assert 'a' not in scheduler and scheduler.keys() == {'b'}
+    assert scheduler.next() == (None, 2)
+    clock.now += 2
+    assert scheduler.next() == ('b', 0)
@@ -0,0 +1,117 @@
+"""消息全文索引：分词、倒排表编码、查询解析和分块写入"""
+from wxauto.msgs import search
+from wxauto.msgs.record import MessageRecord
+from wxauto.msgs.search import SearchQuery, decode_postings, encode_postings, tokenize
+from wxauto.msgs.store import MessageStore
+import pytest
+
+
+def record(runtime_id, content, chat='张三', extra=()):
+    return MessageRecord(runtime_id, chat, 'FriendTextMessage', 'text', 'friend', content, '张三', '张三',
+                         time='2025-01-01 10:01:00', extra=extra)
+
+
+@pytest.mark.parametrize('text, tokens', [
+    ('今天开会', ['今天', '天开', '开会']),
+    ('好', ['好']),
+    ('Hello World', ['hello', 'world']),
+    ('明天meeting取消', ['明天', '取消', 'meeting']),
+    ('a_b, c-d 123', ['a', 'b', 'c', 'd', '123']),
+    ('こんにちは', ['こん', 'んに', 'にち', 'ちは']),
+    ('', []),
+    ('!!!', []),
+])
+def test_tokenize(text, tokens):
+    assert tokenize(text) == tokens
+
+
+@pytest.mark.parametrize('rowids', [
+    [],
+    [1],
+    [1, 2, 3],
+    [5, 200, 201, 70000, 2 ** 40],
+])
+def test_postings_round_trip(rowids):
+    assert decode_postings(encode_postings(rowids)) == rowids
+
+
+def test_postings_append():
+    # 从上一段最后一个rowid继续按差值编码，拼接后可以整体解码
+    data = encode_postings([3, 130]) + encode_postings([131, 20000], last=130)
+    assert decode_postings(data) == [3, 130, 131, 20000]
+    assert encode_postings([128]) == bytes([0x80, 0x01])
+
+
+@pytest.mark.parametrize('query, terms, indexed', [
+    ('开会', {'开会'}, True),
+    ('明天 开会', {'明天', '开会'}, True),
+    ('Meeting notes', {'meeting', 'notes'}, True),
+    ('好', set(), False),
+    ('', set(), False),
+])
+def test_search_query_terms(query, terms, indexed):
+    parsed = SearchQuery(query)
+    assert parsed.terms == terms
+    assert bool(parsed.terms) == indexed
+    assert bool(parsed) == bool(query)
+
+
+@pytest.mark.parametrize('query, text, matched', [
+    ('开会', '明天下午开会', True),
+    # bigram都在但不相邻
+    ('今天开会', '今天不开 开会', False),
+    ('MEETING', 'the meeting is over', True),
+    # 单词需要完整匹配
+    ('meet', 'the meeting is over', False),
+    ('好 ok', '好的 OK', True),
+    ('好 ok', '好的', False),
+])
+def test_search_query_match(query, text, matched):
+    assert SearchQuery(query).match(text) == matched
+
+
+def test_search_extra_text():
+    store = MessageStore(':memory:')
+    store.add_records([record('1', '[文件]', extra=(('filename', '季度报告.pdf'),)), record('2', '报告在哪')])
+    assert [r.id for r in store.search('报告')] == ['2', '1']
+    assert [r.id for r in store.search('季度')] == ['1']
+    # 单个字无法使用索引，按内容扫描
+    assert [r.id for r in store.search('哪')] == ['2']
+
+
+def test_postings_written_in_chunks(monkeypatch):
+    monkeypatch.setattr(search, '_CHUNK_BYTES', 16)
+    store = MessageStore(':memory:')
+    for i in range(200):
+        # 每次保存一条消息，与后台写入时的情况相同
+        store.add_records([record(str(i), f'开会 {i}')])
+    chunks = store._conn.execute(
+        "SELECT first, last, length(postings) FROM search_postings WHERE term = '开会' ORDER BY first"
+    ).fetchall()
+    assert len(chunks) > 1
+    # 追加只改写最后一块，每块大小有上限
+    assert all(size < 16 + 8 for _, _, size in chunks)
+    assert all(a[1] < b[0] for a, b in zip(chunks, chunks[1:]))
+    assert store.index.candidates(SearchQuery('开会')) == set(range(1, 201))
+    assert store.index.candidates(SearchQuery('开会 150')) == {151}
+    assert store.index.candidates(SearchQuery('取消')) == set()
+
+
+def test_reindex_old_database(tmp_path):
+    path = str(tmp_path / 'messages.db')
+    store = MessageStore(path)
+    store.add_records([record('1', '今天开会')])
+    # 旧版本的消息库只有整表倒排表 search_terms
+    store._conn.executescript("""
+        DROP TABLE search_postings;
+        CREATE TABLE search_terms (term TEXT PRIMARY KEY, last INTEGER NOT NULL, postings BLOB NOT NULL);
+        DELETE FROM search_meta;
+        INSERT INTO search_meta (key, value) VALUES ('indexed_rowid', 1);
+    """)
+    store.close()
+    store = MessageStore(path)
+    assert [r.content for r in store.search('开会')] == ['今天开会']
+    assert store._conn.execute(
+        "SELECT count(*) FROM sqlite_master WHERE name = 'search_terms'"
+    ).fetchone()[0] == 0
+    store.close()
@@ -0,0 +1,43 @@
+"""按锚点对齐的序列比较"""
+from wxauto.utils.seqdiff import diff_sequences, find_anchors
+import pytest
+
+same_text = lambda old, new: old.rstrip("'") == new.rstrip("'")
+
+
+@pytest.mark.parametrize('old, new, same, expected', [
+    # (prepended, inserted, appended, removed, replaced)
+    ('abc', 'abc', None, ([], [], [], [], [])),
+    ('abc', 'abcd', None, ([], [], ['d'], [], [])),
+    ('abc', 'xyabc', None, (['x', 'y'], [], [], [], [])),
+    ('abcd', 'cde', None, ([], [], ['e'], ['a', 'b'], [])),
+    ('abcd', 'abxd', None, ([], [], [], [], [('c', 'x')])),
+    ('abcd', 'abxyd', None, ([], ['x', 'y'], [], ['c'], [])),
+    # 最后一条消息被撤回或删除的同时收到新消息，没有依据时不配对
+    ('abc', 'abd', None, ([], [], ['d'], ['c'], [])),
+    ('abc', 'abd', same_text, ([], [], ['d'], ['c'], [])),
+    # 最后一条消息重新渲染
+    (['a', 'b', 'c'], ['a', 'b', "c'"], same_text, ([], [], [], [], [('c', "c'")])),
+    (['a', 'b', 'c'], ['a', 'b', "c'", 'd'], same_text, ([], [], ['d'], [], [('c', "c'")])),
+    (['a', 'b', 'c', 'd'], ['a', 'x', "d'"], same_text, ([], [], ['x'], ['b', 'c'], [('d', "d'")])),
+    # 最后一条消息被撤回，撤回提示占据它的位置，之后收到内容相同的新消息
+    (['a', 'b', 'c'], ['a', 'b', 'N', "c'"], same_text, ([], [], ['N', "c'"], ['c'], [])),
+    (['a', 'b', 'c'], ['a', 'N', "c'", 'd'], same_text, ([], [], ['N', 'd'], ['b'], [('c', "c'")])),
+    # 锚点之间的重新渲染
+    (['a', 'b', 'c', 'd'], ['a', "b'", 'x', 'd'], same_text, ([], ['x'], [], ['c'], [('b', "b'")])),
+])
+def test_diff_sequences(old, new, same, expected):
+    result = diff_sequences(list(old), list(new), same)
+    assert (result.prepended, result.inserted, result.appended, result.removed, result.replaced) == expected
+
+
+def test_no_anchors():
+    result = diff_sequences(list('abc'), list('xyz'))
+    assert result.anchors == 0
+    assert result.appended == list('xyz') and result.removed == list('abc')
+    assert result.new == list('xyz')
+
+
+def test_find_anchors_skips_duplicates_and_crossings():
+    # a重复出现，b和c在两个序列中顺序相反，只能保留其中之一
+    assert find_anchors(list('abcad'), list('acbd')) == [(1, 2), (4, 3)]
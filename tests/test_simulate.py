@@ -0,0 +1,268 @@
+"""在模拟的UIAutomation后端上运行消息解析、新消息检测和会话列表"""
+from wxauto.msgs.friend import FriendTextMessage
+from wxauto.msgs.mattr import SystemMessage, TimeMessage
+from wxauto.msgs.msg import parse_msg, parse_msgs
+from wxauto.msgs.self import SelfTextMessage
+from wxauto.param import WxParam
+from wxauto.ui.chatbox import ChatBox, USED_MSG_IDS
+from wxauto.ui.sessionbox import SessionBox
+from wxauto.uia import uiautomation as uia
+from wxauto.utils import msgids
+from wxauto.utils.lock import LockManager
+from conftest import find_element
+from types import SimpleNamespace
+import pytest
+import threading
+import time
+
+
+def add_text_message(msgbox, content, sender='张三'):
+    """在消息列表末尾添加一条好友文本消息，结构与控件树文本中的消息相同"""
+    top = msgbox.children[-1].rect[3]
+    bottom = top + 52
+    item = msgbox.new_child('ListItemControl', name=content, rect=(310, top, 1010, bottom))
+    pane = item.new_child('PaneControl', rect=(310, top, 1010, bottom))
+    pane.new_child('ButtonControl', name=sender, rect=(320, top + 4, 356, top + 40))
+    body = pane.new_child('PaneControl', rect=(366, top, 900, bottom))
+    bubble = body.new_child('PaneControl', rect=(366, top + 4, 600, bottom - 4))
+    text_box = bubble.new_child('PaneControl', rect=(376, top + 8, 590, bottom - 8))
+    text_box.new_child('TextControl', name=content, rect=(376, top + 8, 590, bottom - 8))
+    body.new_child('PaneControl', rect=(600, top, 900, bottom))
+    pane.new_child('PaneControl', rect=(900, top, 1010, bottom))
+    return item
+
+
+def insert_text_message(msgbox, index, content, sender='张三'):
+    """在消息列表中间插入一条好友文本消息"""
+    item = add_text_message(msgbox, content, sender)
+    return msgbox.add_child(item, index)
+
+
+@pytest.fixture
+def chatbox(client, main_window, parent, no_mouse):
+    USED_MSG_IDS.clear()
+    element = find_element(client, 'ListControl', '消息').parent.parent.parent
+    yield ChatBox(uia.Control.CreateControlFromElement(element), parent)
+    USED_MSG_IDS.clear()
+
+
+EXPECTED = [
+    (TimeMessage, '10:01', None),
+    (FriendTextMessage, '早上好', '张三'),
+    (SelfTextMessage, '早', 'self'),
+    (SystemMessage, '以上是打招呼的内容', 'system'),
+    (TimeMessage, '10:20', None),
+    (FriendTextMessage, '晚上吃什么', '张三'),
+]
+
+
+def test_parse_msg(msgbox, parent):
+    msgs = [parse_msg(control, parent) for control in msgbox.GetChildren()]
+    assert [type(msg) for msg in msgs] == [cls for cls, _, _ in EXPECTED]
+    assert [msg.content for msg in msgs] == [content for _, content, _ in EXPECTED]
+    for msg, (cls, _, sender) in zip(msgs, EXPECTED):
+        if sender is not None and cls is not SystemMessage:
+            assert msg.sender == sender
+
+
+def test_parse_msgs_matches_parse_msg(client, msgbox, parent):
+    each = [parse_msg(control, parent) for control in msgbox.GetChildren()]
+    client.reset_stats()
+    batch = parse_msgs(msgbox, parent)
+    # 发送人取自缓存的子树，不再逐条消息查找头像按钮
+    assert not client.calls['FindFirst'] and not client.calls['FindAll']
+    fields = lambda m: (type(m), m.content, m.sender, m.sender_remark)
+    assert [fields(m) for m in batch] == [fields(m) for m in each]
+
+
+def test_get_new_msgs(client, chatbox):
+    assert chatbox.get_new_msgs() == []
+    msgbox = find_element(client, 'ListControl', '消息')
+    add_text_message(msgbox, '新消息1')
+    add_text_message(msgbox, '新消息2', sender='李四')
+    msgs = chatbox.get_new_msgs()
+    assert [(type(m), m.content, m.sender) for m in msgs] == [
+        (FriendTextMessage, '新消息1', '张三'),
+        (FriendTextMessage, '新消息2', '李四'),
+    ]
+    assert chatbox.get_new_msgs() == []
+
+
+
+def test_get_new_msgs_last_message_replaced(client, chatbox):
+    assert chatbox.get_new_msgs() == []
+    msgbox = find_element(client, 'ListControl', '消息')
+    # 最后一条消息重新渲染，换了id但内容不变
+    msgbox.children.pop()
+    add_text_message(msgbox, '晚上吃什么')
+    assert chatbox.get_new_msgs() == []
+    # 最后一条消息被删除的同时收到新消息
+    msgbox.children.pop()
+    add_text_message(msgbox, '新消息')
+    assert [m.content for m in chatbox.get_new_msgs()] == ['新消息']
+
+def test_get_session(client, main_window, parent):
+    element = find_element(client, 'ListControl', '会话').parent.parent
+    sessionbox = SessionBox(uia.Control.CreateControlFromElement(element), parent)
+    sessions = sessionbox.get_session()
+    assert [s.name for s in sessions] == ['文件传输助手', '张三', '工作群', '李四']
+    assert [s.time for s in sessions] == ['10:21', '10:20', '昨天 18:02', '星期一 09:15']
+    zhangsan = sessions[1]
+    assert zhangsan.isnew and zhangsan.new_count == 2
+    assert not sessions[0].isnew
+
+
+def test_attrs_lazy(client, msgbox, parent):
+    controls = msgbox.GetChildren()
+    msgs = [parse_msg(control, parent) for control in controls]
+    client.reset_stats()
+    senders = [msg.sender for msg in msgs]
+    # sender在首次访问时才查找头像按钮，解析时不读取
+    assert client.total_calls() > 0
+    assert senders == [msg.sender for msg in parse_msgs(msgbox, parent)]
+
+
+def test_lazy_attrs_read_under_uilock(msgbox, parent):
+    msg = parse_msg(msgbox.GetChildren()[1], parent)
+    senders = []
+    thread = threading.Thread(target=lambda: senders.append(msg.sender))
+    with LockManager.thread_lock:
+        thread.start()
+        thread.join(0.1)
+        # 其他线程持有uilock时等待
+        assert thread.is_alive()
+    thread.join()
+    assert senders == ['张三']
+
+
+@pytest.mark.parametrize('message_hash', [False, True])
+def test_batch_attrs_from_cache(client, msgbox, parent, monkeypatch, message_hash):
+    monkeypatch.setattr(WxParam, 'MESSAGE_HASH', message_hash)
+    msgs = parse_msgs(msgbox, parent)
+    client.reset_stats()
+    # 批量解析时sender、sender_remark和hash取自缓存的子树，之后在监听回调等其他线程中读取不再访问控件
+    thread = threading.Thread(target=lambda: [(msg.sender, msg.sender_remark, msg.hash) for msg in msgs])
+    thread.start()
+    thread.join()
+    assert client.total_calls() == 0
+
+
+def test_get_next_new_msgs_single_snapshot(client, chatbox, monkeypatch):
+    chatbox.get_new_msgs()
+    element = find_element(client, 'ListControl', '消息')
+    fetch = chatbox.msgbox.GetCachedChildren
+
+    def fetch_then_receive():
+        # 等待消息加载完成之后、解析之前收到新消息
+        controls = fetch()
+        if not any(c.name == '新消息' for c in element.children):
+            add_text_message(element, '新消息')
+        return controls
+
+    monkeypatch.setattr(chatbox.msgbox, 'GetCachedChildren', fetch_then_receive)
+    msgs = chatbox.get_next_new_msgs(count=1, last_msg='新消息')
+    assert [m.content for m in msgs] == ['新消息']
+    # 已经返回的消息同时被标记为已处理，不会再次作为新消息返回
+    assert chatbox.get_new_msgs() == []
+
+
+def test_precheck_mid_list_insert(client, chatbox, monkeypatch):
+    element = find_element(client, 'ListControl', '消息')
+    element.props[uia.PropertyId.ScrollVerticalScrollPercentProperty] = 100.0
+    element.props[uia.PropertyId.ScrollVerticalViewSizeProperty] = 40.0
+    assert chatbox.get_new_msgs() == []
+    # 可滚动的列表中间插入消息后内容变高，可视比例变小，预检不会跳过
+    insert_text_message(element, 3, '插入1')
+    element.props[uia.PropertyId.ScrollVerticalViewSizeProperty] = 36.0
+    assert [m.content for m in chatbox.get_new_msgs()] == ['插入1']
+    # 首尾消息、滚动位置和可视比例都没有变化时，最多延迟MESSAGE_PRECHECK_MAX_AGE秒
+    insert_text_message(element, 3, '插入2')
+    assert chatbox.get_new_msgs() == []
+    later = time.monotonic() + WxParam.MESSAGE_PRECHECK_MAX_AGE + 0.1
+    monkeypatch.setattr(msgids, 'time', SimpleNamespace(monotonic=lambda: later))
+    assert [m.content for m in chatbox.get_new_msgs()] == ['插入2']
+
+
+def test_hash_cache_runtime_id_reused(client, msgbox, parent, monkeypatch):
+    monkeypatch.setattr(WxParam, 'MESSAGE_HASH', True)
+    element = msgbox._element
+    old = add_text_message(element, 'ok')
+    first = parse_msgs(msgbox, parent)[-1]
+    # 消息控件被移除后，新消息复用了同一个runtime_id
+    element.remove_child(old)
+    new = add_text_message(element, 'ok', sender='李四')
+    new.runtime_id = old.runtime_id
+    second = parse_msgs(msgbox, parent)[-1]
+    assert second.id == first.id and second.sender == '李四'
+    assert second.hash != first.hash
+    assert second.hash == parse_msg(msgbox.GetChildren()[-1], parent).hash
+
+
+def test_top_level_control(client, main_window, msgbox):
+    # 模拟的客户端按控件树查找窗口句柄的祖先
+    top = msgbox.GetTopLevelControl()
+    assert top.NativeWindowHandle == 0x30010
+    assert top.Element == main_window.Element
+    assert main_window.GetTopLevelControl().Element == main_window.Element
+    assert client.GetAncestor(0x30010, uia.GAFlag.Parent) == client.root.handle
+    assert client.GetAncestor(client.root.handle, uia.GAFlag.Root) == 0
+
+
+def insert_time_message(msgbox, index, text):
+    """在消息列表中插入一条时间消息"""
+    item = msgbox.new_child('ListItemControl', index, name=text, rect=(310, 0, 1010, 34))
+    item.new_child('TextControl', name=text, rect=(630, 8, 690, 26))
+    return item
+
+
+@pytest.fixture
+def history(client, chatbox, monkeypatch):
+    """向上滚动时每次在列表顶部加载一天的更早消息，返回从新到旧的全部消息内容"""
+    element = find_element(client, 'ListControl', '消息')
+    days = [
+        [f'2024年1月{day}日 10:00', *(f'消息{day}-{i}' for i in range(4))]
+        for day in range(1, 7)
+    ]
+    pending = list(days)
+
+    def wheel_up(self, *args, **kwargs):
+        if self.Element is element and pending:
+            time_text, *contents = pending.pop()
+            for index, content in enumerate(contents):
+                insert_text_message(element, index, content)
+            insert_time_message(element, 0, time_text)
+
+    monkeypatch.setattr(uia.Control, 'WheelUp', wheel_up)
+    initial = list(element.children)
+    expected = [c.name for c in reversed(initial)] + [name for day in reversed(days) for name in reversed(day)]
+
+    def reopen():
+        # 重新打开聊天窗口后只剩最新的消息，更早的消息需要重新滚动加载
+        for child in list(element.children):
+            if child not in initial:
+                element.remove_child(child)
+        pending[:] = days
+
+    return SimpleNamespace(expected=expected, reopen=reopen)
+
+
+@pytest.mark.parametrize('stop', [1, 6, 8, 11, 17])
+def test_history_resume_from_checkpoint(chatbox, history, stop):
+    first = chatbox.iter_history(batch=5, interval=0)
+    it = iter(first)
+    head = [next(it).content for _ in range(stop)]
+    checkpoint = first.checkpoint
+    history.reopen()
+    resumed = chatbox.iter_history(batch=5, checkpoint=checkpoint, interval=0)
+    rest = [msg.content for msg in resumed]
+    assert head + rest == history.expected
+    assert resumed.count == len(history.expected)
+
+
+def test_load_more_single_fetch(client, chatbox, history, monkeypatch):
+    monkeypatch.setattr(uia.Control, 'GetChildren', lambda self: pytest.fail('load_more只使用GetCachedChildren'))
+    element = find_element(client, 'ListControl', '消息')
+    assert chatbox.load_more(interval=0)
+    while chatbox.load_more(interval=0):
+        pass
+    assert len(element.children) == len(history.expected)
@@ -0,0 +1,72 @@
+"""本地消息库：去重规则和后台写入"""
+from wxauto.msgs.msg import parse_msgs
+from wxauto.msgs.record import MessageRecord
+from wxauto.msgs.store import MessageStore, flush_messages, get_message_store, store_messages, to_records
+from wxauto.param import WxParam
+from test_simulate import add_text_message
+import pytest
+
+
+def record(runtime_id, content, sender='张三', time='2025-01-01 10:01:00'):
+    return MessageRecord(runtime_id, '张三', 'FriendTextMessage', 'text', 'friend', content, sender, sender, time=time)
+
+
+def test_dedupe_on_stable_key():
+    store = MessageStore(':memory:')
+    assert store.add_records([record('1', '早上好'), record('2', '晚上吃什么')]) == 2
+    # 重新打开聊天窗口后runtime_id变化，仍然是同一条消息
+    assert store.add_records([record('7', '早上好'), record('8', '晚上吃什么')]) == 0
+    # runtime_id被复用，但发送人或时间不同的是另一条消息
+    assert store.add_records([record('1', '早上好', sender='李四'), record('2', '早上好', time='2025-01-01 10:20:00')]) == 2
+    assert store.count('张三') == 4
+
+
+@pytest.fixture
+def message_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(WxParam, 'MESSAGE_STORE', str(tmp_path / 'messages.db'))
+    yield get_message_store()
+    flush_messages()
+    get_message_store().close()
+
+
+def test_store_messages_off_ui_path(client, msgbox, parent, message_store):
+    msgs = parse_msgs(msgbox, parent)
+    # 解析时不写入消息库
+    assert message_store.count() == 0
+    client.reset_stats()
+    store_messages(msgs, '张三')
+    assert flush_messages()
+    # 消息属性在解析时已经读取，保存时不访问控件
+    assert client.total_calls() == 0
+    assert [r.content for r in message_store.query('张三')] == [msg.content for msg in msgs]
+    store_messages(parse_msgs(msgbox, parent), '张三')
+    assert flush_messages()
+    assert message_store.count('张三') == len(msgs)
+
+
+def test_identical_messages_kept(message_store):
+    # 同一时间段中同一发送人连续发送的相同图片
+    images = [
+        MessageRecord(str(i), '张三', 'FriendImageMessage', 'image', 'friend', '[图片]', '张三', '张三',
+                      time='2025-01-01 10:01:00', seq=i)
+        for i in range(5)
+    ]
+    assert message_store.add_records(images) == 5
+    assert message_store.add_records(images) == 0
+    # 没有时间的消息同样按seq区分
+    untimed = [record(str(i), 'ok', time='')._replace(seq=i) for i in range(3)]
+    assert message_store.add_records(untimed) == 3
+    assert message_store.count('张三') == 8
+
+
+def test_time_seq_counts_skipped_messages(client, msgbox, parent):
+    element = msgbox._element
+    for _ in range(3):
+        add_text_message(element, 'ok')
+    msgs = parse_msgs(msgbox, parent)
+    assert [m.time_seq for m in msgs if m.content == 'ok'] == [0, 1, 2]
+    # 只解析最后一条时，前面跳过的相同消息仍然计数
+    last = parse_msgs(msgbox, parent, runtimeids={msgs[-1].id})
+    assert [m.time_seq for m in last] == [2]
+    records = to_records(parse_msgs(msgbox, parent))
+    assert len({(r.sender, r.time, r.content, r.seq) for r in records}) == len(records)
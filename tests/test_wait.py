@@ -0,0 +1,37 @@
+"""事件唤醒的等待：事件密集时合并唤醒"""
+from wxauto.uia import uiautomation as uia
+import threading
+import time
+
+
+def test_event_storm_coalesced(client, monkeypatch):
+    monkeypatch.setattr(uia, 'EVENT_WAIT', True)
+    stop = threading.Event()
+
+    def storm():
+        # 例如会话列表滚动时连续触发的结构变化事件
+        while not stop.is_set():
+            uia.UIEvents.Notify(uia.EventId.StructureChangedEvent)
+            time.sleep(0.0005)
+
+    searches = []
+    thread = threading.Thread(target=storm)
+    thread.start()
+    try:
+        uia.WaitFor(lambda: searches.append(1), 0.3, interval=0.02)
+    finally:
+        stop.set()
+        thread.join()
+    # 两次查找之间至少间隔interval，不比固定间隔轮询更频繁
+    assert len(searches) <= 0.3 / 0.02 + 2
+
+
+def test_single_event_wakes_early(client, monkeypatch):
+    monkeypatch.setattr(uia, 'EVENT_WAIT', True)
+    found = threading.Event()
+    timer = threading.Timer(0.3, lambda: (found.set(), uia.UIEvents.Notify()))
+    start = time.perf_counter()
+    timer.start()
+    # 没有事件时间隔逐次翻倍，0.3秒时正在等待0.32秒，收到事件后立即检查
+    assert uia.WaitFor(found.is_set, 2, interval=0.02, maxInterval=1)
+    assert time.perf_counter() - start < 0.5
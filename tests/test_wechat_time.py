@@ -0,0 +1,69 @@
+"""微信时间文字解析"""
+from datetime import datetime
+from wxauto.utils.wechat_time import get_reference_time, parse_wechat_time, reference_time
+import pytest
+
+# 2025-03-05 星期三
+NOW = datetime(2025, 3, 5, 15, 30)
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('10:21', '2025-03-05 10:21:00'),
+    ('9:05', '2025-03-05 09:05:00'),
+    ('昨天 23:59', '2025-03-04 23:59:00'),
+    ('星期三 08:00', '2025-03-05 08:00:00'),
+    ('星期一 10:21', '2025-03-03 10:21:00'),
+    ('星期四 10:21', '2025-02-27 10:21:00'),
+    ('星期日 10:21', '2025-03-02 10:21:00'),
+    ('星期天 10:21', '2025-03-02 10:21:00'),
+    ('03-01 10:21:30', '2025-03-01 10:21:30'),
+    ('02-14 上午 12:05', '2025-02-14 00:05:00'),
+    ('02-14 下午 12:05', '2025-02-14 12:05:00'),
+    ('02-14 下午 3:05', '2025-02-14 15:05:00'),
+    ('2023年7月8日 9:05', '2023-07-08 09:05:00'),
+])
+def test_parse(text, expected):
+    assert parse_wechat_time(text, NOW) == expected
+
+
+@pytest.mark.parametrize('text, now, expected', [
+    # 年初时只有月日的时间属于去年
+    ('12-30 10:21:00', datetime(2025, 1, 2), '2024-12-30 10:21:00'),
+    ('12-30 下午 1:00', datetime(2025, 1, 2), '2024-12-30 13:00:00'),
+    ('01-02 10:21:00', datetime(2025, 1, 2), '2025-01-02 10:21:00'),
+    ('02-29 10:21:00', datetime(2025, 3, 1), '2024-02-29 10:21:00'),
+    ('昨天 10:21', datetime(2025, 1, 1), '2024-12-31 10:21:00'),
+    ('星期五 10:21', datetime(2025, 1, 1), '2024-12-27 10:21:00'),
+])
+def test_parse_cross_year(text, now, expected):
+    assert parse_wechat_time(text, now) == expected
+
+
+@pytest.mark.parametrize('text', [
+    '',
+    '刚刚',
+    '25:00',
+    '13-40 10:21:00',
+    '昨天 24:10',
+    '星期八 10:21',
+    '2025年2月30日 10:21',
+    '02-14 中午 12:05',
+])
+def test_parse_invalid(text):
+    assert parse_wechat_time(text, NOW) == text
+
+
+def test_reference_time():
+    with reference_time(NOW) as now:
+        assert now is NOW
+        assert get_reference_time() is NOW
+        assert parse_wechat_time('昨天 10:21') == '2025-03-04 10:21:00'
+        # 内层不指定时沿用外层的参考时间
+        with reference_time() as inner:
+            assert inner is NOW
+        with reference_time(datetime(2025, 1, 1)):
+            assert parse_wechat_time('昨天 10:21') == '2024-12-31 10:21:00'
+        assert get_reference_time() is NOW
+        # 显式传入的参考时间优先
+        assert parse_wechat_time('昨天 10:21', datetime(2025, 6, 1)) == '2025-05-31 10:21:00'
+    assert get_reference_time() is not NOW
@@ -18,11 +18,13 @@ from . import (
     uia,
     utils,
 )
-import comtypes.stream
-import pythoncom
-import win32com.client
-import win32process
-import win32clipboard
+import sys
+if sys.platform == 'win32':
+    import comtypes.stream
+    import pythoncom
+    import win32com.client
+    import win32process
+    import win32clipboard
 import psutil
 import uuid
 from typing import (
@@ -41,7 +43,8 @@ import requests
 import tenacity
 import time
 
-pythoncom.CoInitialize()
+if sys.platform == 'win32':
+    pythoncom.CoInitialize()
 
 __all__ = [
     'WeChat',
@@ -1,4 +1,5 @@
-from .msg import parse_msg
+from .msg import parse_msg, parse_msgs, parse_msg_controls
+from .record import MessageRecord
 from .base import (
     Message,
     BaseMessage,
@@ -58,6 +59,9 @@ from .friend import (
 
 __all__ = [
     'parse_msg',
+    'parse_msgs',
+    'parse_msg_controls',
+    'MessageRecord',
     'Message',
     'BaseMessage',
     'HumanMessage',
@@ -12,6 +12,7 @@ from wxauto.ui.component import (
     WeChatDialog
 )
 from wxauto.utils import uilock
+from .record import MessageRecord
 from wxauto.languages import *
 from typing import (
     Dict, 
@@ -20,7 +21,10 @@ from typing import (
     TYPE_CHECKING
 )
 from pathlib import Path
-from hashlib import md5
+from hashlib import blake2b
+from functools import cached_property
+from collections import OrderedDict
+import threading
 import time
 
 if TYPE_CHECKING:
@@ -30,12 +34,30 @@ def truncate_string(s: str, n: int=8) -> str:
     s = s.replace('\n', '').strip()
     return s if len(s) <= n else s[:n] + '...'
 
+# 已计算的消息哈希值，{(id, content, height, width): (structure_data, hash)}，
+# 轮询时未变化的消息直接复用，不再重新获取子控件
+_HASH_CACHE: "OrderedDict[tuple, tuple]" = OrderedDict()
+_HASH_CACHE_SIZE = 4096
+_HASH_CACHE_LOCK = threading.Lock()
+
+def _structure_hash(height: int, width: int, structure_data: List[tuple]) -> str:
+    """逐个控件更新摘要，不拼接整个字符串"""
+    h = blake2b(f'{height},{width}'.encode(), digest_size=8)
+    for item in structure_data:
+        h.update('\x1f'.join(item).encode())
+        h.update(b'\x1e')
+    return h.hexdigest()
+
 class Message:...
 
 class BaseMessage(Message):
     type: str = 'base'
     attr: str = 'base'
     control: uia.Control
+    _progeny: List[uia.Control] = None  # parse_msgs批量解析时从缓存中获取的子孙控件，先序排列
+    record_fields: tuple = ()  # 转换为MessageRecord时保存到extra中的属性
+    time: str = None  # 消息时间，批量解析时取自上方最近的时间消息，%Y-%m-%d %H:%M:%S
+    time_seq: int = 0  # 同一时间段中前面内容相同的消息数量，批量解析时设置，用于在消息库中区分重复的消息
 
     def __init__(
             self, 
@@ -45,15 +67,11 @@ class BaseMessage(Message):
         ):
         self.control = control
         self.parent = parent
-        self.sub_control_pointer = sub_control_pointer
         self.root = parent.root
         self.content = self.control.Name
         self.id = self.control.runtimeid
-        if sub_control_pointer is None:
-            self.sub_control_pointer = control.FindAll(return_pointer=True)
-        self._get_hash(WxParam.MESSAGE_HASH)
-        self.sender = self.attr
-        self.sender_remark = self.attr
+        if sub_control_pointer is not None:
+            self.sub_control_pointer = sub_control_pointer
         
         # wxlog.debug()
 
@@ -74,13 +92,66 @@ class BaseMessage(Message):
     def _lang(self, text: str) -> str:
         return MESSAGES.get(text, {WxParam.LANGUAGE: text}).get(WxParam.LANGUAGE)
     
+    # 以下属性在首次访问时才读取控件并缓存结果，也可以直接赋值覆盖，
+    # 读取控件时持有uilock，此时消息控件需要仍然存在；
+    # parse_msgs 批量解析时已经从缓存的子树中得到 sender、sender_remark 和 hash，访问时不再读取控件
+    @cached_property
+    def sender(self) -> str:
+        return self.attr
+
+    @cached_property
+    def sender_remark(self) -> str:
+        return self.attr
+
+    @cached_property
+    @uilock
+    def sub_control_pointer(self):
+        return self.control.FindAll(return_pointer=True)
+
+    @cached_property
+    def structure_data(self) -> List[tuple]:
+        self._get_hash(WxParam.MESSAGE_HASH)
+        return self.__dict__['structure_data']
+
+    @cached_property
+    def hash_text(self) -> str:
+        if not self.structure_data:
+            return ''
+        rect = self.control.CachedBoundingRectangle
+        return f'({rect.height()},{rect.width()})' + ';'.join([f"{i[0]}:{i[1]},{i[2]}" for i in self.structure_data])
+
+    @cached_property
+    def hash(self) -> str:
+        self._get_hash(WxParam.MESSAGE_HASH)
+        return self.__dict__['hash']
+
+    def _get_structure_data(self) -> List[tuple]:
+        if self._progeny is not None:
+            controls = (self.control, *self._progeny)
+            return [(i.ControlTypeName, i.ClassName or '', i.Name or '') for i in controls]
+        snapshot = self.control.snapshot(properties=('ControlType', 'ClassName', 'Name'))
+        nodes = (snapshot.root, *snapshot.iter_descendants())
+        return [(i.control_type, i.class_name or '', i.name or '') for i in nodes]
+
+    @uilock
     def _get_hash(self, enable: bool = True):
         if enable:
-            sub_controls = self.control.FindAll(pointer=self.sub_control_pointer)
-            self.structure_data = [(i.ControlTypeName,i.ClassName,i.Name) for i in sub_controls]
-            rect = self.control.BoundingRectangle
-            self.hash_text = f'({rect.height()},{rect.width()})' + ';'.join([f"{i[0]}:{i[1]},{i[2]}" for i in self.structure_data])
-            self.hash = md5(self.hash_text.encode()).hexdigest()
+            rect = self.control.CachedBoundingRectangle
+            # UIA会复用runtime_id，键中加入消息类型和发送人，避免复用的id命中另一条消息的结构
+            key = (type(self).__name__, self.id, self.sender, self.content, rect.height(), rect.width())
+            with _HASH_CACHE_LOCK:
+                cached = _HASH_CACHE.get(key)
+                if cached is not None:
+                    _HASH_CACHE.move_to_end(key)
+            if cached is None:
+                structure_data = self._get_structure_data()
+                cached = (structure_data, _structure_hash(rect.height(), rect.width(), structure_data))
+                with _HASH_CACHE_LOCK:
+                    _HASH_CACHE[key] = cached
+                    if len(_HASH_CACHE) > _HASH_CACHE_SIZE:
+                        _HASH_CACHE.popitem(last=False)
+            self.structure_data, self.hash = cached
+            self.__dict__.pop('hash_text', None)
         else:
             self.structure_data = []
             self.hash_text = ''
@@ -116,6 +187,28 @@ class BaseMessage(Message):
         """显示消息窗口"""
         self.root._show()
 
+    def to_record(self, msg_time: str = None, chat: str = None) -> MessageRecord:
+        """转换为不引用界面控件的消息记录，见`MessageRecord`
+
+        Args:
+            msg_time (str, optional): 消息时间，默认为时间消息自身的时间或空字符串
+            chat (str, optional): 聊天窗口名，默认为所在聊天窗口的名称
+        """
+        return MessageRecord(
+            id=self.id,
+            chat=chat or getattr(self.parent, 'who', '') or '',
+            class_name=self.message_type_name,
+            type=self.type,
+            attr=self.attr,
+            content=self.content,
+            sender=self.sender,
+            sender_remark=self.sender_remark,
+            hash=self.hash,
+            time=msg_time or self.time or '',
+            seq=self.time_seq,
+            extra=tuple((name, getattr(self, name)) for name in self.record_fields),
+        )
+
 
 class HumanMessage(BaseMessage):
     attr = 'human'
@@ -127,7 +220,11 @@ class HumanMessage(BaseMessage):
             sub_control_pointer = None,
         ):
         super().__init__(control, parent, sub_control_pointer)
-        self.head_control = self.control.ButtonControl(searchDepth=2)
+
+    @cached_property
+    @uilock
+    def head_control(self) -> uia.Control:
+        return self.control.ButtonControl(searchDepth=2)
 
     @uilock
     def roll_into_view(self) -> WxResponse:
@@ -0,0 +1,59 @@
+"""
+消息结构指纹
+
+以消息控件子树先序遍历得到的 (ControlType, ClassName) 序列作为指纹，
+在由已标注的控件树样本生成的指纹表 `fingerprints.FINGERPRINTS` 中查找消息类。
+一条消息只需要一次 BuildUpdatedCache 调用和一次字典查找，不依赖控件高度和内容文本，
+不同版本微信的样本可以放在同一张表中。
+
+指纹表由 `wxauto.msgs.fingerprint_tools` 根据样本生成，该模块不在解析消息时导入。
+当前发布的指纹表为空，`WxParam.MESSAGE_FINGERPRINT` 默认关闭，
+表中没有的指纹，以及在样本中对应多个消息类的指纹，仍由 `MessageClassifier` 按原规则判断。
+"""
+from wxauto.uia.snapshot import ControlSnapshot
+from .fingerprints import FINGERPRINTS
+from typing import (
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TYPE_CHECKING
+)
+from hashlib import md5
+
+if TYPE_CHECKING:
+    from wxauto import uia
+
+FINGERPRINT_PROPERTIES = ('ControlType', 'ClassName')
+
+Structure = List[Tuple[str, str]]
+
+
+def make_fingerprint(structure: Iterable[Tuple[str, str]]) -> str:
+    """根据 (ControlType, ClassName) 序列计算指纹"""
+    text = '\n'.join(f'{control_type}|{class_name or ""}' for control_type, class_name in structure)
+    return md5(text.encode()).hexdigest()[:16]
+
+
+def snapshot_structure(snapshot: ControlSnapshot) -> Structure:
+    """获取快照的 (ControlType, ClassName) 先序序列，包含根节点"""
+    return [(n.control_type, n.class_name or '') for n in (snapshot.root, *snapshot.iter_descendants())]
+
+
+def message_fingerprint(control: "uia.Control") -> str:
+    """一次缓存请求抓取消息控件子树并计算指纹"""
+    return make_fingerprint(snapshot_structure(control.snapshot(properties=FINGERPRINT_PROPERTIES)))
+
+
+def lookup(control: "uia.Control") -> Optional[str]:
+    """在指纹表中查找消息类名，未找到时返回None"""
+    if not FINGERPRINTS:
+        return None
+    return FINGERPRINTS.get(message_fingerprint(control))
+
+
+def lookup_structure(structure: Iterable[Tuple[str, str]]) -> Optional[str]:
+    """按已获取的 (ControlType, ClassName) 先序序列查找消息类名，未找到时返回None"""
+    if not FINGERPRINTS:
+        return None
+    return FINGERPRINTS.get(make_fingerprint(structure))
@@ -0,0 +1,110 @@
+"""
+消息结构指纹表的生成工具
+
+样本目录结构为 <样本目录>/<消息类名>/*.txt，每个文件是一条消息控件的 `Control.tree()` 格式文本，
+可以用 `record_fixtures` 从当前聊天窗口导出，人工检查并调整所在目录后重新生成指纹表：
+
+    python -m wxauto.msgs.fingerprint_tools fixtures/messages -o wxauto/msgs/fingerprints.py
+
+`record_fixtures` 按现有规则预先分类，只是方便人工标注，未经检查的样本只会让指纹表重复现有规则的判断。
+本模块依赖 wxauto.uia.simulate，只在生成指纹表时使用，解析消息时不会导入。
+"""
+from wxauto.uia.simulate import CONTROL_TYPE_NAMES, SimulatedClient, parse_tree_text
+from .fingerprint import FINGERPRINT_PROPERTIES, Structure, make_fingerprint, snapshot_structure
+from typing import (
+    Dict,
+    List,
+    Set,
+    Tuple,
+    TYPE_CHECKING
+)
+from pathlib import Path
+import argparse
+
+if TYPE_CHECKING:
+    from wxauto.ui.chatbox import ChatBox
+
+
+def fixture_structure(tree_text: str) -> Structure:
+    """获取样本控件树文本的 (ControlType, ClassName) 先序序列，包含根节点"""
+    root = parse_tree_text(tree_text, SimulatedClient(events=False))
+    return [
+        (CONTROL_TYPE_NAMES.get(e.control_type, 'CustomControl'), e.class_name or '')
+        for e in (root, *root.iter_descendants())
+    ]
+
+
+def build_table(fixtures_dir: str) -> Tuple[Dict[str, str], Dict[str, Set[str]]]:
+    """从样本目录生成指纹表
+
+    Args:
+        fixtures_dir (str): 样本目录，子目录名为消息类名
+
+    Returns:
+        tuple: (指纹表 {指纹: 消息类名}, 冲突的指纹 {指纹: {消息类名, ...}})
+    """
+    labels: Dict[str, Set[str]] = {}
+    for path in sorted(Path(fixtures_dir).glob('*/*.txt')):
+        fingerprint = make_fingerprint(fixture_structure(path.read_text(encoding='utf-8')))
+        labels.setdefault(fingerprint, set()).add(path.parent.name)
+    table = {fp: names.pop() for fp, names in labels.items() if len(names) == 1}
+    conflicts = {fp: names for fp, names in labels.items() if len(names) > 1}
+    return table, conflicts
+
+
+def write_table(table: Dict[str, str], path: str):
+    """将指纹表写入Python模块"""
+    lines = [
+        '# 由 python -m wxauto.msgs.fingerprint_tools 根据样本生成，请勿手动修改',
+        '# {指纹: 消息类名}',
+    ]
+    if table:
+        lines.append('FINGERPRINTS = {')
+        lines.extend(f"    '{fp}': '{name}'," for fp, name in sorted(table.items(), key=lambda item: (item[1], item[0])))
+        lines.append('}')
+    else:
+        lines.append('FINGERPRINTS = {}')
+    Path(path).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def record_fixtures(chatbox: "ChatBox", fixtures_dir: str) -> List[Path]:
+    """导出当前聊天窗口中的消息作为样本
+
+    按现有规则判断的消息类名放入对应子目录，只记录控件类型和类名，不包含消息内容，
+    导出后需要人工检查分类是否正确
+
+    Args:
+        chatbox (ChatBox): 聊天窗口
+        fixtures_dir (str): 样本目录
+
+    Returns:
+        List[Path]: 新增的样本文件
+    """
+    from .msg import parse_msg
+
+    paths = []
+    for control in chatbox.msgbox.GetChildren():
+        label = parse_msg(control, chatbox).__class__.__name__
+        snapshot = control.snapshot(properties=FINGERPRINT_PROPERTIES)
+        path = Path(fixtures_dir) / label / f'{make_fingerprint(snapshot_structure(snapshot))}.txt'
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(snapshot.to_text(), encoding='utf-8')
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='根据消息样本生成指纹表')
+    parser.add_argument('fixtures', help='样本目录，子目录名为消息类名')
+    parser.add_argument('-o', '--output', default=str(Path(__file__).with_name('fingerprints.py')), help='输出文件')
+    args = parser.parse_args()
+    table, conflicts = build_table(args.fixtures)
+    for fp, names in sorted(conflicts.items()):
+        print(f'指纹冲突，已忽略: {fp} {sorted(names)}')
+    write_table(table, args.output)
+    print(f'已写入 {len(table)} 个指纹: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,3 @@
+# 由 python -m wxauto.msgs.fingerprint_tools 根据样本生成，请勿手动修改
+# {指纹: 消息类名}
+FINGERPRINTS = {}
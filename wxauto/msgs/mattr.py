@@ -1,4 +1,5 @@
 from .base import *
+from functools import cached_property
 from wxauto.ui.component import (
     ProfileWnd,
 )
@@ -23,8 +24,14 @@ class SystemMessage(BaseMessage):
             sub_control_pointer = None,
         ):
         super().__init__(control, parent, sub_control_pointer)
-        self.sender = 'system'
-        self.sender_remark = 'system'
+
+    @cached_property
+    def sender(self) -> str:
+        return 'system'
+
+    @cached_property
+    def sender_remark(self) -> str:
+        return 'system'
 
 class TickleMessage(SystemMessage):
     attr = 'tickle'
@@ -65,15 +72,26 @@ class FriendMessage(HumanMessage):
             sub_control_pointer = None,
         ):
         super().__init__(control, parent, sub_control_pointer)
-        self.head_control = self.control.ButtonControl(RegexName='.*?')
-        self.sender = self.head_control.Name
+
+    @cached_property
+    @uilock
+    def head_control(self) -> uia.Control:
+        return self.control.ButtonControl(RegexName='.*?')
+
+    @cached_property
+    @uilock
+    def sender(self) -> str:
+        return self.head_control.Name
+
+    @cached_property
+    @uilock
+    def sender_remark(self) -> str:
         if (
             (remark_control := self.control.TextControl()).Exists(0)
             and remark_control.BoundingRectangle.top < self.head_control.BoundingRectangle.top
         ):
-            self.sender_remark = remark_control.Name
-        else:
-            self.sender_remark = self.sender
+            return remark_control.Name
+        return self.sender
 
     @property
     def _xbias(self):
@@ -2,8 +2,10 @@ from .mattr import *
 from .type import OtherMessage
 from . import self as selfmsg
 from . import friend as friendmsg
+from . import fingerprint
 from wxauto.languages import *
 from wxauto.param import WxParam
+from wxauto.utils.wechat_time import parse_wechat_time, reference_time
 from wxauto import uia
 from typing import Literal, List
 import re
@@ -57,11 +59,32 @@ SEPICIAL_MSGS = [
     ]
 ]
 
+def _message_classes(cls) -> dict:
+    classes = {cls.__name__: cls}
+    for subclass in cls.__subclasses__():
+        classes.update(_message_classes(subclass))
+    return classes
+
+# {消息类名: 消息类}，用于指纹表查找
+MESSAGE_CLASSES = _message_classes(BaseMessage)
+
 def parse_msg(
         control: uia.Control, 
         parent,
     ):
-    msg_rect = control.BoundingRectangle
+    return _parse_msg(control, parent)
+
+def _parse_msg(
+        control: uia.Control, 
+        parent,
+    ):
+    if (
+        WxParam.MESSAGE_FINGERPRINT
+        and (msgcls := MESSAGE_CLASSES.get(fingerprint.lookup(control))) is not None
+    ):
+        return msgcls(control, parent)
+
+    msg_rect = control.CachedBoundingRectangle
     height = msg_rect.height()
     mid = (msg_rect.left + msg_rect.right) / 2
 
@@ -94,6 +117,78 @@ def parse_msg(
             # control.tree
             return OtherMessage(control, parent)
 
+class MessageClassifier:
+    """按语言预先构建的消息类型分类器
+
+    正则预先编译，特殊消息按 (内容标记, 子控件数量) 建立字典直接查找，消息类提前解析，
+    `get_classifier` 在 `WxParam.LANGUAGE` 变化时重新构建
+
+    Args:
+        language (str): 语言
+    """
+    # (内容标记, 消息类型, 子控件数量, 高度条件)，与原if/elif顺序一致
+    SPECIAL_RULES = [
+        ('[图片]', 'Image', MESSAGE_ATTRS.IMG_MSG_CONTROL_NUM, None),
+        ('[视频]', 'Video', MESSAGE_ATTRS.VIDEO_MSG_CONTROL_NUM, None),
+        ('[文件]', 'File', MESSAGE_ATTRS.FILE_MSG_CONTROL_NUM, None),
+        ('[位置]', 'Location', MESSAGE_ATTRS.LOCATION_MSG_CONTROL_NUM, lambda h: h > MESSAGE_ATTRS.LOCATION_MSG_HEIGHT),
+        ('[链接]', 'Link', MESSAGE_ATTRS.LINK_CARD_MSG_CONTROL_NUM, None),
+        ('[动画表情]', 'Emotion', MESSAGE_ATTRS.EMOTION_MSG_CONTROL_NUM, None),
+        ('[聊天记录]', 'Merge', MESSAGE_ATTRS.MERGE_MSG_CONTROL_NUM, lambda h: h >= MESSAGE_ATTRS.MERGE_MSG_HEIGHT),
+        ('[名片]', 'PersonalCard', MESSAGE_ATTRS.PERSONAL_CARD_MSG_CONTROL_NUM, lambda h: h >= MESSAGE_ATTRS.PERSONAL_CARD_MSG_HEIGHT),
+        ('[笔记]', 'Note', MESSAGE_ATTRS.NOTE_MSG_CONTROL_NUM, None),
+    ]
+
+    def __init__(self, language: str):
+        self.language = language
+        self.re_quote = re.compile(self._lang('re_引用消息'), re.DOTALL)
+        self.re_voice = re.compile(self._lang('re_语音'))
+        self.re_tickle = re.compile(self._lang('re_拍一拍'))
+        self.text_lengths = frozenset(MESSAGE_ATTRS.TEXT_MSG_CONTROL_NUM)
+        self.quote_lengths = frozenset(MESSAGE_ATTRS.QUOTE_MSG_CONTROL_NUM)
+        self.voice_lengths = frozenset(MESSAGE_ATTRS.VOICE_MSG_CONTROL_NUM)
+        self.classes = {
+            attr: {
+                name: getattr(module, f'{attr}{name}Message')
+                for name in ('Text', 'Quote', 'Voice', 'Other', *(rule[1] for rule in self.SPECIAL_RULES))
+            }
+            for attr, module in (('Friend', friendmsg), ('Self', selfmsg))
+        }
+        # {(内容, 子控件数量): (消息类型, 高度条件)}
+        self.special = {}
+        for marker, name, lengths, height_check in self.SPECIAL_RULES:
+            for length in lengths:
+                # 不同标记翻译后相同时保留先出现的规则
+                self.special.setdefault((self._lang(marker), length), (name, height_check))
+
+    def _lang(self, text: str) -> str:
+        return MESSAGES.get(text, {self.language: text}).get(self.language)
+
+    def resolve(self, attr: Literal['Self', 'Friend'], content: str, length: int, height: int):
+        """根据消息内容、子控件数量和高度返回消息类"""
+        classes = self.classes[attr]
+        if (rule := self.special.get((content, length))) is not None:
+            name, height_check = rule
+            if height_check is None or height_check(height):
+                return classes[name]
+        if length in self.text_lengths:
+            return classes['Text']
+        if length in self.quote_lengths and self.re_quote.match(content):
+            return classes['Quote']
+        if length in self.voice_lengths and self.re_voice.match(content):
+            return classes['Voice']
+        return classes['Other']
+
+
+_classifier: MessageClassifier = None
+
+def get_classifier() -> MessageClassifier:
+    """获取当前语言的消息分类器"""
+    global _classifier
+    if _classifier is None or _classifier.language != WxParam.LANGUAGE:
+        _classifier = MessageClassifier(WxParam.LANGUAGE)
+    return _classifier
+
 def parse_msg_type(
         control: uia.Control,
         parent,
@@ -104,91 +199,172 @@ def parse_msg_type(
         sub_control_pointer = control.FindAll(return_pointer=True)
     length = sub_control_pointer.Length - 1
     content = control.Name
-    msg_rect = control.BoundingRectangle
+    msg_rect = control.CachedBoundingRectangle
     height = msg_rect.height()
     wxlog.debug(f"parse message: c({content}), l({length}), h({height})")
-    if attr == 'Friend':
-        msgtype = friendmsg
+    msgcls = get_classifier().resolve(attr, content, length, height)
+    return msgcls(control, parent, sub_control_pointer)
+
+def parse_msgs(
+        msgbox: uia.Control,
+        parent,
+        control_types: tuple = ('ListItemControl',),
+        runtimeids: set = None,
+        children: list = None
+    ) -> List[BaseMessage]:
+    """批量解析消息列表
+
+    通过一次缓存请求获取消息列表的整棵控件子树，按消息分组后解析，
+    判断消息类型以及构造消息对象时读取的属性都来自缓存，不再逐条消息产生COM调用
+
+    Args:
+        msgbox (uia.Control): 消息列表控件
+        parent: 消息所在的ChatBox
+        control_types (tuple): 需要解析的消息控件类型
+        runtimeids (set): 只解析这些runtimeid的消息，None为全部
+        children (list): 已获取的 `msgbox.GetCachedChildrenWithProgeny()` 结果，
+            需要与其他操作使用同一份消息列表时传入，None时重新获取
+
+    Returns:
+        List[BaseMessage]: 消息对象列表
+    """
+    msgs = []
+    msg_time = None
+    seen = {}
+    with reference_time():
+        if children is None:
+            children = msgbox.GetCachedChildrenWithProgeny()
+        for control, progeny in children:
+            if control.ControlTypeName not in control_types:
+                continue
+            if runtimeids is not None and control.runtimeid not in runtimeids:
+                # 跳过的消息仍然用于确定后面消息的时间和time_seq
+                if len(progeny) in MESSAGE_ATTRS.TIME_MSG_CONTROL_NUM:
+                    msg_time = parse_wechat_time(control.Name)
+                    seen.clear()
+                else:
+                    _next_seq(seen, control.Name)
+                continue
+            msg = _parse_cached_msg(control, progeny, parent)
+            _load_cached_attrs(msg, progeny)
+            _set_time_seq(msg, seen)
+            msgs.append(msg)
+            msg_time = propagate_time((msg,), msg_time)
+    return msgs
+
+def parse_msg_controls(controls: List[uia.Control], parent) -> List[BaseMessage]:
+    """解析指定的几个消息控件
+
+    每个控件通过一次缓存请求获取自己的子树，适合消息列表很长但只需要解析其中少量消息的情况，
+    例如加载更多消息后只解析顶部新加载的消息
+
+    Args:
+        controls (List[uia.Control]): 消息控件，通常来自 `GetCachedChildren`
+        parent: 消息所在的ChatBox
+
+    Returns:
+        List[BaseMessage]: 消息对象列表，顺序与controls相同
+    """
+    msgs = []
+    seen = {}
+    with reference_time():
+        for control in controls:
+            control, progeny = control.GetCachedProgeny()
+            msg = _parse_cached_msg(control, progeny, parent)
+            _load_cached_attrs(msg, progeny)
+            _set_time_seq(msg, seen)
+            msgs.append(msg)
+    propagate_time(msgs)
+    return msgs
+
+def propagate_time(msgs: List[BaseMessage], msg_time: str = None) -> str:
+    """按顺序将每条时间消息的时间设置到其后的消息上，已经有时间的消息不变
+
+    Args:
+        msgs (List[BaseMessage]): 按从上到下排列的消息
+        msg_time (str): 第一条时间消息之前的消息使用的时间
+
+    Returns:
+        str: 最后的时间，可以传给下一批消息
+    """
+    for msg in msgs:
+        if msg.attr == 'time':
+            msg_time = msg.time
+        elif msg.time is None:
+            msg.time = msg_time
+    return msg_time
+
+def _load_cached_attrs(msg: BaseMessage, progeny: List[tuple]):
+    """保存缓存的子树，开启MESSAGE_HASH时用它计算hash，不产生COM调用，其余属性仍在首次访问时读取"""
+    msg._progeny = [c for c, _ in progeny]
+    if WxParam.MESSAGE_HASH:
+        msg._get_hash()
+
+def _next_seq(seen: dict, name: str) -> int:
+    """返回同一时间段中前面名称相同的消息数量"""
+    seq = seen.get(name, 0)
+    seen[name] = seq + 1
+    return seq
+
+def _set_time_seq(msg: BaseMessage, seen: dict):
+    """设置消息的time_seq，遇到时间消息时开始新的时间段"""
+    if msg.attr == 'time':
+        seen.clear()
     else:
-        msgtype = selfmsg
-    
-    # Special Message Type
-    if content in SEPICIAL_MSGS:
-        # ImageMessage
-        if content == _lang('[图片]') and length in MESSAGE_ATTRS.IMG_MSG_CONTROL_NUM:
-            return getattr(msgtype, f'{attr}ImageMessage')(control, parent, sub_control_pointer)
-        
-        # VideoMessage
-        elif content == _lang('[视频]') and length in MESSAGE_ATTRS.VIDEO_MSG_CONTROL_NUM:
-            return getattr(msgtype, f'{attr}VideoMessage')(control, parent, sub_control_pointer)
-        
-        # FileMessage
-        elif content == _lang('[文件]') and length in MESSAGE_ATTRS.FILE_MSG_CONTROL_NUM:
-            return getattr(msgtype, f'{attr}FileMessage')(control, parent, sub_control_pointer)
-        
-        # LocationMessage
-        elif (
-            content == _lang('[位置]') 
-            and length in MESSAGE_ATTRS.LOCATION_MSG_CONTROL_NUM
-            and height > MESSAGE_ATTRS.LOCATION_MSG_HEIGHT
-        ):
-            return getattr(msgtype, f'{attr}LocationMessage')(control, parent, sub_control_pointer)
-        
-        # LinkMessage
-        elif (
-            content == _lang('[链接]')
-            and length in MESSAGE_ATTRS.LINK_CARD_MSG_CONTROL_NUM
-            # and height >= MESSAGE_ATTRS.LINK_CARD_MSG_HEIGHT
-        ):
-            return getattr(msgtype, f'{attr}LinkMessage')(control, parent, sub_control_pointer)
-        
-        # EmotionMessage
-        elif (
-            content == _lang('[动画表情]')
-            and length in MESSAGE_ATTRS.EMOTION_MSG_CONTROL_NUM
-        ):
-            return getattr(msgtype, f'{attr}EmotionMessage')(control, parent, sub_control_pointer)
-        
-        # MergeMessage
-        elif (
-            content == _lang('[聊天记录]')
-            and length in MESSAGE_ATTRS.MERGE_MSG_CONTROL_NUM
-            and height >= MESSAGE_ATTRS.MERGE_MSG_HEIGHT
-        ):
-            return getattr(msgtype, f'{attr}MergeMessage')(control, parent, sub_control_pointer)
-        
-        # PersonalCardMessage
-        elif (
-            content == _lang('[名片]')
-            and length in MESSAGE_ATTRS.PERSONAL_CARD_MSG_CONTROL_NUM
-            and height >= MESSAGE_ATTRS.PERSONAL_CARD_MSG_HEIGHT
-        ):
-            return getattr(msgtype, f'{attr}PersonalCardMessage')(control, parent, sub_control_pointer)
-        
-        # NoteMessage
-        elif (
-            content == _lang('[笔记]')
-            and length in MESSAGE_ATTRS.NOTE_MSG_CONTROL_NUM
-        ):
-            return getattr(msgtype, f'{attr}NoteMessage')(control, parent, sub_control_pointer)
-    
-    # TextMessage
-    if length in MESSAGE_ATTRS.TEXT_MSG_CONTROL_NUM:
-        return getattr(msgtype, f'{attr}TextMessage')(control, parent, sub_control_pointer)
-    
-    # QuoteMessage
-    elif (
-        rematch := re.compile(_lang('re_引用消息'), re.DOTALL).match(content)
-        and length in MESSAGE_ATTRS.QUOTE_MSG_CONTROL_NUM
+        msg.time_seq = _next_seq(seen, msg.control.Name)
+
+def _parse_cached_msg(
+        control: uia.Control,
+        progeny: List[tuple],
+        parent,
     ):
-        return getattr(msgtype, f'{attr}QuoteMessage')(control, parent, sub_control_pointer)
-    
-    # VoiceMessage    
-    elif (
-        rematch := re.compile(_lang('re_语音')).match(content)
-        and length in MESSAGE_ATTRS.VOICE_MSG_CONTROL_NUM
+    """与parse_msg的判断规则相同，子控件来自GetCachedChildrenWithProgeny"""
+    if (
+        WxParam.MESSAGE_FINGERPRINT
+        and fingerprint.FINGERPRINTS
+        and (msgcls := MESSAGE_CLASSES.get(fingerprint.lookup_structure(
+            (c.ControlTypeName, c.ClassName) for c in (control, *(i[0] for i in progeny))
+        ))) is not None
     ):
-        return getattr(msgtype, f'{attr}VoiceMessage')(control, parent, sub_control_pointer)
-    
-    # print(length, content)
-    return getattr(msgtype, f'{attr}OtherMessage')(control, parent, sub_control_pointer)
+        return msgcls(control, parent)
+
+    msg_rect = control.CachedBoundingRectangle
+    mid = (msg_rect.left + msg_rect.right) / 2
+    length = len(progeny)
+    classifier = get_classifier()
+
+    # TimeMessage
+    if length in MESSAGE_ATTRS.TIME_MSG_CONTROL_NUM:
+        return TimeMessage(control, parent)
+
+    # FriendMessage or SelfMessage
+    if (head_control := next((c for c, depth in progeny if depth <= 2 and c.ControlTypeName == 'ButtonControl'), None)) is not None:
+        attr = 'Friend' if head_control.CachedBoundingRectangle.left < mid else 'Self'
+        content = control.Name
+        height = msg_rect.height()
+        wxlog.debug(f"parse message: c({content}), l({length}), h({height})")
+        msg = classifier.resolve(attr, content, length, height)(control, parent)
+        _set_cached_sender(msg, head_control, progeny)
+        return msg
+
+    # SystemMessage or TickleMessage
+    if length in MESSAGE_ATTRS.SYS_MSG_CONTROL_NUM:
+        return SystemMessage(control, parent)
+    elif any(c.ControlTypeName == 'ListItemControl' and classifier.re_tickle.match(c.Name) for c, _ in progeny):
+        return TickleMessage(control, parent)
+    return OtherMessage(control, parent)
+
+def _set_cached_sender(msg: HumanMessage, head_control: uia.Control, progeny: List[tuple]):
+    """用缓存子树中的头像按钮和备注名设置发送人，与FriendMessage中的查找规则相同，不再产生COM调用"""
+    msg.head_control = head_control
+    if not isinstance(msg, FriendMessage):
+        return
+    msg.sender = head_control.Name
+    remark_control = next((c for c, _ in progeny if c.ControlTypeName == 'TextControl'), None)
+    if (
+        remark_control is not None
+        and remark_control.CachedBoundingRectangle.top < head_control.CachedBoundingRectangle.top
+    ):
+        msg.sender_remark = remark_control.Name
+    else:
+        msg.sender_remark = msg.sender
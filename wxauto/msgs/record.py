@@ -0,0 +1,93 @@
+"""
+消息记录
+
+`MessageRecord` 是与界面控件脱离的只读消息数据，只包含字符串和元组，
+不引用任何 COM 对象，适合大量保存历史消息，可以序列化为 JSON 或紧凑的 bytes。
+需要对消息进行界面操作时，通过 `bind` 按消息id重新获取聊天窗口中的消息对象。
+
+Example:
+    >>> record = msg.to_record()
+    >>> data = record.to_bytes()
+    >>> record = MessageRecord.from_bytes(data)
+    >>> msg = record.bind(chat)  # 消息仍在聊天窗口中时返回消息对象
+"""
+from typing import Any, Dict, NamedTuple, Tuple
+import json
+
+
+def _freeze(value: Any) -> Any:
+    """JSON反序列化得到的列表转换回元组，保证记录经过序列化后与原记录相等"""
+    if isinstance(value, list):
+        return tuple(_freeze(i) for i in value)
+    return value
+
+
+class MessageRecord(NamedTuple):
+    """消息记录，字段含义与消息对象的同名属性相同"""
+    id: str
+    chat: str  # 聊天窗口名
+    class_name: str  # 消息类名，例如'FriendTextMessage'
+    type: str
+    attr: str
+    content: str
+    sender: str
+    sender_remark: str
+    hash: str = ''
+    time: str = ''  # 消息时间，%Y-%m-%d %H:%M:%S，未知时为空字符串
+    seq: int = 0  # 同一时间段中前面内容相同的消息数量
+    extra: Tuple[Tuple[str, Any], ...] = ()  # 各消息类型特有的属性，例如文件消息的filename
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """获取extra中的属性"""
+        for k, v in self.extra:
+            if k == key:
+                return v
+        return default
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = self._asdict()
+        data['extra'] = dict(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MessageRecord':
+        data = dict(data)
+        data['extra'] = tuple((k, _freeze(v)) for k, v in data.get('extra', {}).items())
+        return cls(**data)
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'MessageRecord':
+        return cls.from_dict(json.loads(text))
+
+    def to_bytes(self) -> bytes:
+        """按字段顺序序列化为紧凑的bytes，不包含字段名"""
+        return json.dumps(
+            [*self[:-1], [list(i) for i in self.extra]],
+            ensure_ascii=False,
+            separators=(',', ':')
+        ).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'MessageRecord':
+        *fields, extra = json.loads(data)
+        return cls(*fields, tuple((k, _freeze(v)) for k, v in extra))
+
+    def bind(self, chat):
+        """重新获取对应的消息对象
+
+        消息id为控件的RuntimeId，只在消息控件仍然存在时有效，消息滚出可视范围或窗口重新打开后可能无法获取
+
+        Args:
+            chat: Chat、WeChat或ChatBox对象
+
+        Returns:
+            BaseMessage: 消息对象，未找到时返回None
+        """
+        if hasattr(chat, 'GetMessageById'):
+            msg = chat.GetMessageById(self.id)
+        else:
+            msg = chat.get_msg_by_id(self.id)
+        return msg or None
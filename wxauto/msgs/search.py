@@ -0,0 +1,204 @@
+"""
+消息全文索引
+
+对本地消息库（见 `wxauto.msgs.store`）中的消息内容建立倒排索引，与消息表保存在同一个 SQLite 文件中。
+
+- 中日韩文字按相邻两个字切分（bigram），单独出现的一个字作为一个词
+- 其他文字按单词切分，统一转为小写
+- 每个词的倒排表为递增的消息rowid，按差值的varint编码压缩保存
+- 倒排表分块保存，以 (term, first) 为键，first为块中第一个rowid；新消息追加到最后一块，
+  最后一块超过 `_CHUNK_BYTES` 后新建一块，每次写入只改写一个有上限的块，不会随倒排表变长而变慢
+
+查询时按first顺序拼接各块得到完整的倒排表，取所有词倒排表的交集作为候选，再按原文逐条确认，因此 bigram 不相邻的误命中会被排除。
+只包含单个中日韩文字的查询无法使用索引，会退化为按内容扫描。
+"""
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple
+)
+import sqlite3
+import json
+import re
+
+_CJK = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+_WORD = re.compile(r'[^\W_]+')
+
+_SCHEMA = """
+DROP TABLE IF EXISTS search_terms;
+CREATE TABLE IF NOT EXISTS search_postings (
+    term TEXT NOT NULL,
+    first INTEGER NOT NULL,
+    last INTEGER NOT NULL,
+    postings BLOB NOT NULL,
+    PRIMARY KEY (term, first)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS search_meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+# 旧版本的整表倒排表 search_terms 已删除，使用新的键名记录索引进度，打开旧消息库时重新建立索引
+_INDEXED_KEY = 'postings_rowid'
+_CHUNK_BYTES = 4096  # 每块倒排表的大小上限（字节），超过后新建一块
+
+
+def tokenize(text: str) -> List[str]:
+    """切分为索引词，中日韩文字按bigram，其他按单词"""
+    text = text.lower()
+    tokens = []
+    for run in _CJK.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    tokens.extend(_WORD.findall(_CJK.sub(' ', text)))
+    return tokens
+
+
+def encode_postings(rowids: Iterable[int], last: int = 0) -> bytes:
+    """将递增的rowid按与前一个的差值编码为varint"""
+    data = bytearray()
+    for rowid in rowids:
+        delta = rowid - last
+        last = rowid
+        while delta >= 0x80:
+            data.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        data.append(delta)
+    return bytes(data)
+
+
+def decode_postings(data: bytes) -> List[int]:
+    rowids = []
+    last = value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        last += value
+        rowids.append(last)
+        value = shift = 0
+    return rowids
+
+
+class SearchQuery:
+    """解析后的查询
+
+    Args:
+        query (str): 查询文字，多个词之间为且的关系
+    """
+
+    def __init__(self, query: str):
+        text = query.lower()
+        self.cjk_runs = _CJK.findall(text)
+        self.words = _WORD.findall(_CJK.sub(' ', text))
+        # 可以使用索引的词，单个中日韩文字在索引中只代表单独出现的字，不能用于查找
+        self.terms = set(self.words)
+        for run in self.cjk_runs:
+            self.terms.update(run[i:i + 2] for i in range(len(run) - 1))
+
+    def __bool__(self):
+        return bool(self.cjk_runs or self.words)
+
+    def match(self, text: str) -> bool:
+        """按原文确认是否命中"""
+        text = text.lower()
+        if not all(run in text for run in self.cjk_runs):
+            return False
+        if self.words:
+            words = set(_WORD.findall(_CJK.sub(' ', text)))
+            return all(word in words for word in self.words)
+        return True
+
+
+def message_text(content: str, extra: str) -> str:
+    """参与索引的文字：消息内容以及extra中的文字，例如文件名、引用内容"""
+    values = [v for v in json.loads(extra).values() if isinstance(v, str)] if extra else []
+    return '\n'.join([content, *values])
+
+
+class MessageIndex:
+    """消息表的倒排索引，由MessageStore在持有锁时调用
+
+    Args:
+        conn (sqlite3.Connection): 消息库连接
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._conn.executescript(_SCHEMA)
+
+    @property
+    def indexed_rowid(self) -> int:
+        row = self._conn.execute('SELECT value FROM search_meta WHERE key = ?', (_INDEXED_KEY,)).fetchone()
+        return row[0] if row else 0
+
+    def update(self) -> int:
+        """索引所有尚未索引的消息，返回索引的消息数量，不提交事务"""
+        postings: Dict[str, List[int]] = {}
+        last_rowid = self.indexed_rowid
+        count = 0
+        for rowid, content, extra in self._conn.execute(
+            'SELECT rowid, content, extra FROM messages WHERE rowid > ? ORDER BY rowid', (last_rowid,)
+        ):
+            for term in set(tokenize(message_text(content, extra))):
+                postings.setdefault(term, []).append(rowid)
+            last_rowid = rowid
+            count += 1
+        if not count:
+            return 0
+        for term, rowids in postings.items():
+            row = self._conn.execute(
+                'SELECT first, last, postings FROM search_postings WHERE term = ? ORDER BY first DESC LIMIT 1',
+                (term,)
+            ).fetchone()
+            if row and len(row[2]) < _CHUNK_BYTES:
+                # 追加到最后一块，只改写这一块
+                first, last, data = row
+                self._conn.execute(
+                    'UPDATE search_postings SET last = ?, postings = ? WHERE term = ? AND first = ?',
+                    (rowids[-1], data + encode_postings(rowids, last), term, first)
+                )
+            else:
+                # 每块从0开始按差值编码，可以单独解码
+                self._conn.execute(
+                    'INSERT INTO search_postings (term, first, last, postings) VALUES (?, ?, ?, ?)',
+                    (term, rowids[0], rowids[-1], encode_postings(rowids))
+                )
+        self._conn.execute(
+            'INSERT OR REPLACE INTO search_meta (key, value) VALUES (?, ?)', (_INDEXED_KEY, last_rowid)
+        )
+        return count
+
+    def candidates(self, query: SearchQuery) -> Optional[Set[int]]:
+        """返回包含所有索引词的消息rowid，查询中没有可用的索引词时返回None"""
+        if not query.terms:
+            return None
+        lists: List[Tuple[int, List[bytes]]] = []
+        for term in query.terms:
+            chunks = [row[0] for row in self._conn.execute(
+                'SELECT postings FROM search_postings WHERE term = ? ORDER BY first', (term,)
+            )]
+            if not chunks:
+                return set()
+            lists.append((sum(map(len, chunks)), chunks))
+        lists.sort(key=lambda item: item[0])
+        result = set(self._merge(lists[0][1]))
+        for _, chunks in lists[1:]:
+            if not result:
+                break
+            result.intersection_update(self._merge(chunks))
+        return result
+
+    @staticmethod
+    def _merge(chunks: List[bytes]) -> List[int]:
+        """按first顺序拼接各块的rowid"""
+        rowids = []
+        for data in chunks:
+            rowids.extend(decode_postings(data))
+        return rowids
@@ -0,0 +1,355 @@
+"""
+本地消息库
+
+设置 `WxParam.MESSAGE_STORE` 为数据库文件路径后，获取到的消息都会以 `MessageRecord` 的形式保存到 SQLite 中，
+按 (chat, time) 和 (chat, sender) 建立索引，通过 `Chat.QueryMessages` 查询历史消息时不再需要滚动界面，程序重启后仍然可用。
+
+消息时间取自同一批消息中前面最近的一条时间消息，没有时为空字符串。
+runtime_id在重新打开聊天窗口或重启微信后会变化，消息以 (chat, sender, time, content, seq) 去重，
+seq为同一时间段中前面内容相同的消息数量，同一时间段中连续发送的相同图片、表情或文字不会被合并。
+时间段的开头不在消息列表中时（时间为空字符串），seq从列表顶部开始计数，列表滚动后可能重复保存这部分消息。
+`store_messages` 只把消息记录放入队列，由后台线程写入数据库，不占用解析消息和监听轮询的时间。
+新保存的消息会同时加入全文索引（见 `wxauto.msgs.search`），通过 `WeChat.SearchHistory` 跨聊天搜索。
+"""
+from .record import MessageRecord
+from .search import MessageIndex, SearchQuery, message_text
+from wxauto.param import WxParam
+from wxauto.logger import wxlog
+from typing import (
+    Iterable,
+    List,
+    Union,
+    TYPE_CHECKING
+)
+from datetime import datetime
+import threading
+import sqlite3
+import queue
+import json
+import time
+
+if TYPE_CHECKING:
+    from .base import BaseMessage
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    rowid INTEGER PRIMARY KEY,
+    chat TEXT NOT NULL,
+    runtime_id TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    attr TEXT NOT NULL,
+    content TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    sender_remark TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    time TEXT NOT NULL,
+    extra TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    created REAL NOT NULL,
+    UNIQUE (chat, sender, time, content, seq)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_time ON messages (chat, time);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_sender ON messages (chat, sender);
+"""
+
+_COLUMNS = 'runtime_id, chat, class_name, type, attr, content, sender, sender_remark, hash, time, extra, seq'
+
+
+def normalize_time(time_str: str) -> str:
+    """统一为 %Y-%m-%d %H:%M:%S 格式，保证按字符串排序即按时间排序"""
+    if not time_str:
+        return ''
+    try:
+        return datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return time_str
+
+
+def _like_pattern(text: str) -> str:
+    """包含text的LIKE模式，配合 ESCAPE '\\' 使用"""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class MessageStore:
+    """基于SQLite的本地消息库，可在多个线程中使用
+
+    Args:
+        path (str): 数据库文件路径，':memory:'为内存数据库
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self.index = MessageIndex(self._conn)
+        self.index.update()
+        self._conn.commit()
+
+    def __repr__(self):
+        return f'<MessageStore "{self.path}">'
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def add_records(self, records: Iterable[MessageRecord]) -> int:
+        """保存消息记录，返回新增的数量"""
+        now = time.time()
+        rows = [
+            (r.id, r.chat, r.class_name, r.type, r.attr, r.content, r.sender, r.sender_remark,
+             r.hash, normalize_time(r.time), json.dumps(dict(r.extra), ensure_ascii=False), r.seq, now)
+            for r in records
+        ]
+        if not rows:
+            return 0
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                f'INSERT OR IGNORE INTO messages ({_COLUMNS}, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            added = self._conn.total_changes - before
+            if added:
+                self.index.update()
+            self._conn.commit()
+            return added
+
+    def add_messages(self, msgs: List["BaseMessage"], chat: str = None) -> int:
+        """按顺序保存一批消息，时间消息之后的消息使用该时间
+
+        Args:
+            msgs (List[BaseMessage]): 同一聊天窗口中的消息
+            chat (str, optional): 聊天窗口名，默认为消息所在聊天窗口的名称
+        """
+        return self.add_records(to_records(msgs, chat))
+
+    def query(
+            self,
+            chat: str,
+            sender: str = None,
+            since: str = None,
+            until: str = None,
+            msg_type: str = None,
+            keyword: str = None,
+            limit: int = 100,
+        ) -> List[MessageRecord]:
+        """查询消息
+
+        Args:
+            chat (str): 聊天窗口名
+            sender (str, optional): 发送人
+            since (str, optional): 开始时间（包含），格式为 %Y-%m-%d %H:%M:%S，可以只写日期
+            until (str, optional): 结束时间（不包含），格式同上
+            msg_type (str, optional): 消息内容类型，例如'text'、'image'
+            keyword (str, optional): 消息内容包含的文字
+            limit (int, optional): 最多返回的数量，返回时间最新的limit条，按时间先后排序
+
+        Returns:
+            List[MessageRecord]: 消息记录
+        """
+        sql = f'SELECT {_COLUMNS} FROM messages WHERE chat = ?'
+        args = [chat]
+        if sender is not None:
+            sql += ' AND sender = ?'
+            args.append(sender)
+        if since is not None:
+            sql += ' AND time >= ?'
+            args.append(since)
+        if until is not None:
+            sql += ' AND time < ?'
+            args.append(until)
+        if msg_type is not None:
+            sql += ' AND type = ?'
+            args.append(msg_type)
+        if keyword:
+            sql += " AND content LIKE ? ESCAPE '\\'"
+            args.append(_like_pattern(keyword))
+        sql += ' ORDER BY time DESC, rowid DESC LIMIT ?'
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [self._to_record(row) for row in reversed(rows)]
+
+    def search(
+            self,
+            query: str,
+            chats: Union[str, List[str]] = None,
+            since: str = None,
+            limit: int = 100,
+        ) -> List[MessageRecord]:
+        """全文搜索消息
+
+        Args:
+            query (str): 查询文字，空格分隔的多个词需要同时出现
+            chats (Union[str, List[str]], optional): 限定的聊天窗口名
+            since (str, optional): 开始时间（包含），格式为 %Y-%m-%d %H:%M:%S，可以只写日期
+            limit (int, optional): 最多返回的数量
+
+        Returns:
+            List[MessageRecord]: 按时间从新到旧排序的消息记录
+        """
+        parsed = SearchQuery(query)
+        if not parsed:
+            return []
+        conditions, args = [], []
+        if chats is not None:
+            chats = [chats] if isinstance(chats, str) else list(chats)
+            conditions.append(f'chat IN ({", ".join("?" * len(chats))})')
+            args.extend(chats)
+        if since is not None:
+            conditions.append('time >= ?')
+            args.append(since)
+        with self._lock:
+            candidates = self.index.candidates(parsed)
+            if candidates is not None:
+                rows = []
+                candidates = sorted(candidates)
+                # 分批查询，避免超过SQLite参数数量限制
+                for i in range(0, len(candidates), 500):
+                    chunk = candidates[i:i + 500]
+                    where = ' AND '.join(conditions + [f'rowid IN ({", ".join("?" * len(chunk))})'])
+                    rows.extend(self._conn.execute(
+                        f'SELECT rowid, {_COLUMNS} FROM messages WHERE {where}', args + chunk
+                    ).fetchall())
+            else:
+                run = max(parsed.cjk_runs, key=len)
+                where = ' AND '.join(conditions + ["content LIKE ? ESCAPE '\\'"])
+                rows = self._conn.execute(
+                    f'SELECT rowid, {_COLUMNS} FROM messages WHERE {where}',
+                    args + [_like_pattern(run)]
+                ).fetchall()
+        # 按时间从新到旧，时间相同时后保存的在前
+        rows.sort(key=lambda row: (row[10], row[0]), reverse=True)
+        result = []
+        for row in rows:
+            if parsed.match(message_text(row[6], row[11])):
+                result.append(self._to_record(row[1:]))
+                if len(result) >= limit:
+                    break
+        return result
+
+    def chats(self) -> List[str]:
+        """获取库中所有聊天窗口名"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute('SELECT DISTINCT chat FROM messages ORDER BY chat')]
+
+    def count(self, chat: str = None) -> int:
+        with self._lock:
+            if chat is None:
+                return self._conn.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+            return self._conn.execute('SELECT COUNT(*) FROM messages WHERE chat = ?', (chat,)).fetchone()[0]
+
+    @staticmethod
+    def _to_record(row: tuple) -> MessageRecord:
+        (runtime_id, chat, class_name, msg_type, attr, content,
+         sender, sender_remark, msg_hash, msg_time, extra, seq) = row
+        return MessageRecord.from_dict(dict(
+            id=runtime_id,
+            chat=chat,
+            class_name=class_name,
+            type=msg_type,
+            attr=attr,
+            content=content,
+            sender=sender,
+            sender_remark=sender_remark,
+            hash=msg_hash,
+            time=msg_time,
+            seq=seq,
+            extra=json.loads(extra),
+        ))
+
+
+_store: MessageStore = None
+_store_lock = threading.Lock()
+
+
+def get_message_store() -> MessageStore:
+    """获取 `WxParam.MESSAGE_STORE` 对应的消息库，未设置时返回None"""
+    global _store
+    path = WxParam.MESSAGE_STORE
+    if not path:
+        return None
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = MessageStore(path)
+        return _store
+
+
+def to_records(msgs: List["BaseMessage"], chat: str = None) -> List[MessageRecord]:
+    """按顺序将一批消息转换为消息记录，时间消息之后的消息使用该时间"""
+    records = []
+    msg_time = ''
+    for msg in msgs:
+        if msg.attr == 'time':
+            msg_time = msg.time
+        records.append(msg.to_record(msg_time, chat))
+    return records
+
+
+class MessageWriter:
+    """在后台线程中将消息记录写入 `WxParam.MESSAGE_STORE` 对应的消息库"""
+
+    def __init__(self, name: str = 'wxauto-message-writer'):
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, records: List[MessageRecord]):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        self._queue.put(records)
+
+    def flush(self, timeout: float = None) -> bool:
+        """等待已放入队列的记录写入完成，超时返回False"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            records = self._queue.get()
+            if isinstance(records, threading.Event):
+                records.set()
+                continue
+            try:
+                if (store := get_message_store()) is not None:
+                    store.add_records(records)
+            except Exception as e:
+                wxlog.warning(f'保存消息到本地消息库失败: {e}')
+
+
+_writer = MessageWriter()
+
+
+def store_messages(msgs: List["BaseMessage"], chat: str = None):
+    """启用消息库时保存消息，记录在后台线程中写入，失败时只记录日志
+
+    消息的属性在解析时已经读取，转换为消息记录时不会访问控件
+
+    Args:
+        msgs (List[BaseMessage]): 同一聊天窗口中按顺序排列的消息
+        chat (str, optional): 聊天窗口名，主窗口的ChatBox会切换聊天，需要由调用方传入
+    """
+    if not msgs or not WxParam.MESSAGE_STORE:
+        return
+    try:
+        records = to_records(msgs, chat)
+    except Exception as e:
+        wxlog.warning(f'保存消息到本地消息库失败: {e}')
+        return
+    _writer.put(records)
+
+
+def flush_messages(timeout: float = 5) -> bool:
+    """等待 `store_messages` 放入队列的消息写入消息库，查询前调用"""
+    return _writer.flush(timeout)
@@ -19,6 +19,7 @@ from wxauto.utils.win32 import (
     GetAllWindows
 )
 from .base import *
+from functools import cached_property
 from typing import (
     Union,
     Literal,
@@ -50,6 +51,7 @@ class TextMessage(HumanMessage):
 
 class QuoteMessage(HumanMessage):
     type = 'quote'
+    record_fields = ('quote_content',)
     
     def __init__(
             self, 
@@ -191,6 +193,7 @@ class VoiceMessage(HumanMessage):
 
 class FileMessage(HumanMessage):
     type = 'file'
+    record_fields = ('filename', 'filesize')
     
     def __init__(
             self, 
@@ -199,8 +202,16 @@ class FileMessage(HumanMessage):
             sub_control_pointer = None,
         ):
         super().__init__(control, parent, sub_control_pointer)
-        self.filename = control.GetProgenyControl(9, control_type='TextControl').Name
-        self.filesize = control.GetProgenyControl(10, control_type='TextControl').Name
+
+    @cached_property
+    @uilock
+    def filename(self) -> str:
+        return self.control.GetProgenyControl(9, control_type='TextControl').Name
+
+    @cached_property
+    @uilock
+    def filesize(self) -> str:
+        return self.control.GetProgenyControl(10, control_type='TextControl').Name
 
     @uilock
     def download(
@@ -218,6 +229,7 @@ class FileMessage(HumanMessage):
             while not (menu := CMenuWnd(self.parent)):
                 self.roll_into_view()
                 self.right_click()
+                uia.WaitForEvent(0.1)
             return menu
         if force_click:
             self.click()
@@ -249,6 +261,7 @@ class FileMessage(HumanMessage):
 
 class LocationMessage(HumanMessage):
     type = 'location'
+    record_fields = ('address',)
     
     def __init__(
             self, 
@@ -257,16 +270,23 @@ class LocationMessage(HumanMessage):
             sub_control_pointer = None,
         ):
         super().__init__(control, parent, sub_control_pointer)
-        self.address = self._address()
 
-    def _address(self):
-        """获取位置信息"""
+    @cached_property
+    def address(self) -> str:
+        return self._address()
+
+    @cached_property
+    @uilock
+    def location_data(self) -> Dict[str, str]:
         location_control1 = self.control.GetProgenyControl(7, 1)
         location_control2 = self.control.GetProgenyControl(7)
-        self.location_data = {
+        return {
             'location': '' if location_control1 is None else location_control1.Name,
             'point': location_control2.Name
         }
+
+    def _address(self):
+        """获取位置信息"""
         return self.location_data['location'] + self.location_data['point']
 
 
@@ -16,6 +16,19 @@ class WxParam:
     # 是否启用消息哈希值用于辅助判断消息，开启后会稍微影响性能
     MESSAGE_HASH: bool = False
 
+    # 是否优先按消息控件结构指纹判断消息类型，见wxauto.msgs.fingerprint，需要先根据人工标注的样本生成指纹表
+    MESSAGE_FINGERPRINT: bool = False
+
+    # 本地消息库（SQLite）文件路径，设置后在后台保存获取到的消息，可通过Chat.QueryMessages查询，见wxauto.msgs.store
+    MESSAGE_STORE: str = None
+
+    # 每个聊天窗口保存的已处理消息id数量，用于判断新消息，见wxauto.utils.msgids
+    MESSAGE_ID_WINDOW: int = 100
+
+    # 获取新消息前先比较消息列表首尾消息、滚动位置和可视比例，与上一次相同时跳过读取所有消息，
+    # 相同的情况下最多跳过多久，超过后仍读取一次，也是特征没有覆盖到的变化（例如列表中间插入的消息）的最大延迟，单位秒，0为不预检
+    MESSAGE_PRECHECK_MAX_AGE: float = 3
+
     # 头像到消息X偏移量，用于消息定位，点击消息等操作
     DEFAULT_MESSAGE_XBIAS = 51
 
@@ -27,9 +40,29 @@ class WxParam:
     # 监听消息时间间隔，单位秒
     LISTEN_INTERVAL: int = 1
 
+    # 聊天窗口没有新消息时检查间隔逐次翻倍，最长为该值，有新消息后恢复为LISTEN_INTERVAL，单位秒
+    # 默认与LISTEN_INTERVAL相同，即固定间隔轮询；调大可以减少空闲聊天窗口的检查次数，
+    # 但空闲聊天窗口收到的第一条消息最多要等待该值才能获取到
+    LISTEN_MAX_INTERVAL: float = 1
+
+    # 所有监听的聊天窗口每秒最多检查的次数，0为不限制，聊天窗口较多时超出的检查会被推迟
+    LISTEN_POLL_BUDGET: float = 0
+
+    # 是否通过UIAutomation结构变化事件监听消息，只检查收到事件的聊天窗口，事件不可用时按LISTEN_INTERVAL轮询
+    LISTEN_EVENT: bool = False
+
+    # 事件监听模式下检查所有聊天窗口的间隔，用于补充遗漏的事件，单位秒
+    LISTEN_EVENT_POLL_INTERVAL: float = 10
+
+    # 事件监听模式下收到事件后等待多久再获取新消息，用于合并同一条消息触发的多个事件，单位秒
+    LISTEN_EVENT_DELAY: float = 0.03
+
     # 监听执行器线程池大小
     LISTENER_EXCUTOR_WORKERS: int = 4
 
+    # 是否在独立的STA工作线程中串行执行所有UI操作（被uilock装饰的方法），见wxauto.utils.worker
+    UI_WORKER: bool = False
+
     # 搜索聊天对象超时时间，单位秒
     SEARCH_CHAT_TIMEOUT: int = 5
 
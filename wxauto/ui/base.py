@@ -3,9 +3,11 @@ from wxauto.param import PROJECT_NAME
 from wxauto.logger import wxlog
 from wxauto.utils.lock import uilock
 from abc import ABC, abstractmethod
-import win32gui
 from typing import Union
 import time
+import sys
+if sys.platform == 'win32':
+    import win32gui
 
 class BaseUIWnd(ABC):
     _ui_cls_name: str = None
@@ -19,12 +19,20 @@ from wxauto.utils import (
     ReadClipboardData,
     uilock
 )
-from wxauto.msgs import parse_msg
+from wxauto.utils.msgids import MessageIdRegistry, MessageIdWindow
+from wxauto.msgs import parse_msg, parse_msgs, parse_msg_controls
+from wxauto.msgs.store import normalize_time, store_messages
+from wxauto.utils.wechat_time import reference_time
 from wxauto import uia
 from wxauto.logger import wxlog
 from wxauto.uia import RollIntoView, Control
 from typing import Union, List,Literal
+from collections import deque
+from datetime import datetime
 import threading
+import hashlib
+import base64
+import json
 import time
 import os
 import re
@@ -33,13 +41,15 @@ def truncate_string(s: str, n: int=8) -> str:
     s = s.replace('\n', '').strip()
     return s if len(s) <= n else s[:n] + '...'
 
-USED_MSG_IDS = {}
+# 每个聊天窗口已处理过的消息id，键为消息列表控件的runtimeid
+USED_MSG_IDS = MessageIdRegistry()
 
 class ChatBox:
     def __init__(self, control: uia.Control, parent):
         self.control: Control = control
         self.root = parent
         self.parent = parent  # `wx` or `chat`
+        uia.AddElementCacheRoot(control)  # 聊天窗口中的控件都从这里查找，缓存找到的控件
         self.init()
 
     def init(self):
@@ -50,15 +60,16 @@ class ChatBox:
         self._empty = False   # 用于记录是否为完全没有聊天记录的窗口，因为这种窗口之前有不会触发新消息判断的问题
         if (cid := self.id) and cid not in USED_MSG_IDS:
             # print("init chatbox", cid)
-            USED_MSG_IDS[cid] = tuple((i.runtimeid for i in self.msgbox.GetChildren()))
-            if not USED_MSG_IDS[cid]:
+            window = USED_MSG_IDS.get(cid, WxParam.MESSAGE_ID_WINDOW)
+            window.reset(*self.msgbox.GetChildrenRuntimeIdsAndNames())
+            if not window:
                 self._empty = True
 
     def _lang(self, text: str) -> str:
         return WECHAT_CHAT_BOX.get(text, {WxParam.LANGUAGE: text}).get(WxParam.LANGUAGE)
     
     def _update_used_msg_ids(self):
-        USED_MSG_IDS[self.id] = tuple((i.runtimeid for i in self.msgbox.GetChildren()))
+        self.used_msg_ids.reset(*self.msgbox.GetChildrenRuntimeIdsAndNames())
     
     # @uilock
     def _open_chat_more_info(self):
@@ -90,10 +101,8 @@ class ChatBox:
         return None
 
     @property
-    def used_msg_ids(self):
-        if self.id not in USED_MSG_IDS:
-            USED_MSG_IDS[self.id] = tuple()
-        return USED_MSG_IDS[self.id]
+    def used_msg_ids(self) -> MessageIdWindow:
+        return USED_MSG_IDS.get(self.id, WxParam.MESSAGE_ID_WINDOW)
     
     def get_info(self):
         chat_info = {}
@@ -296,81 +305,73 @@ class ChatBox:
         return emotion_wnd.select_emotion(index)
     
     def load_more(self, interval=0.3):
-        msg_len = len(self.msgbox.GetChildren())
-        loadmore = self.msgbox.GetChildren()[0]
-        loadmore_top = loadmore.BoundingRectangle.top
+        # 每次滚动后只获取一次子控件，数量和顶部位置都取自同一次缓存请求
+        children = self.msgbox.GetCachedChildren()
+        msg_len = len(children)
+        loadmore_top = children[0].CachedBoundingRectangle.top
         while True:
-            if len(self.msgbox.GetChildren()) > msg_len:
+            self.msgbox.WheelUp(wheelTimes=10)
+            time.sleep(interval)
+            children = self.msgbox.GetCachedChildren()
+            if len(children) > msg_len:
                 isload = True
                 break
-            else:
-                msg_len = len(self.msgbox.GetChildren())
-                self.msgbox.WheelUp(wheelTimes=10)
-                time.sleep(interval)
-                if self.msgbox.GetChildren()[0].BoundingRectangle.top == loadmore_top\
-                    and len(self.msgbox.GetChildren()) == msg_len:
-                    isload = False
-                    break
-                else:
-                    loadmore_top = self.msgbox.GetChildren()[0].BoundingRectangle.top
-                    
+            top = children[0].CachedBoundingRectangle.top
+            if top == loadmore_top and len(children) == msg_len:
+                isload = False
+                break
+            msg_len, loadmore_top = len(children), top
+
         self.msgbox.WheelUp(wheelTimes=1, waitTime=0.1)
         if isload:
             return WxResponse.success()
         else:
             return WxResponse.failure("没有更多消息了")
     
+    def iter_history(
+            self,
+            until: str = None,
+            batch: int = 50,
+            checkpoint: str = None,
+            newest_first: bool = True,
+            interval: float = 0.3
+        ) -> 'ChatHistory':
+        return ChatHistory(self, until, batch, checkpoint, newest_first, interval)
+
     # @uilock
     def get_msgs(self):
         if self.msgbox.Exists(0):
-            return [
-                parse_msg(msg_control, self) 
-                for msg_control 
-                in self.msgbox.GetChildren()
-                if msg_control.ControlTypeName in ('ListItemControl', 'CheckBoxControl')
-            ]
+            return parse_msgs(self.msgbox, self, ('ListItemControl', 'CheckBoxControl'))
         return []
     
     def get_new_msgs(self):
         if not self.msgbox.Exists(0):
             return []
-        msg_controls = self.msgbox.GetChildren()
-        now_msg_ids = tuple((i.runtimeid for i in msg_controls))
+        used_msg_ids = self.used_msg_ids
+        signature = None
+        if WxParam.MESSAGE_PRECHECK_MAX_AGE > 0:
+            # 首尾消息和滚动位置与上一次相同时消息列表基本没有变化，不需要读取所有消息
+            signature = self.msgbox.GetChildrenSignature()
+            if used_msg_ids.unchanged(signature, WxParam.MESSAGE_PRECHECK_MAX_AGE):
+                return []
+        now_msg_ids, names = self.msgbox.GetChildrenRuntimeIdsAndNames()
         if not now_msg_ids:  # 当前没有消息id
             return []
-        if self._empty and self.used_msg_ids:
+        if self._empty and used_msg_ids:
             self._empty = False
-        if not self._empty and (
-            (not self.used_msg_ids and now_msg_ids)  # 没有使用过的消息id，但当前有消息id
-            or now_msg_ids[-1] == self.used_msg_ids[-1] # 当前最后一条消息id和上次一样
-            or not set(now_msg_ids)&set(self.used_msg_ids)  # 当前消息id和上次没有交集
-        ):
+        # 与上一次的消息列表按锚点对齐，锚点之间插入和最后一个锚点之后追加的消息为新消息，
+        # 换了id但内容不变的重新渲染的消息和向上加载的消息不算新消息
+        new = used_msg_ids.update(now_msg_ids, from_empty=self._empty, signature=signature, keys=names)
+        if not new:
             # wxlog.debug('没有新消息')
             return []
-        
-        used_msg_ids_set = set(self.used_msg_ids)
-        last_one_msgid = max(
-            (x for x in now_msg_ids if x in used_msg_ids_set), 
-            key=self.used_msg_ids.index, default=None
-        )
-        new1 = [x for x in now_msg_ids if x not in used_msg_ids_set]
-        new2 = now_msg_ids[now_msg_ids.index(last_one_msgid) + 1 :]\
-            if last_one_msgid is not None else []
-        new = [i for i in new1 if i in new2] if new2 else new1
-        USED_MSG_IDS[self.id] = tuple(self.used_msg_ids + tuple(new))[-100:]
-        new_controls = [i for i in msg_controls if i.runtimeid in new]
         self.msgbox.MiddleClick()
-        return [
-                parse_msg(msg_control, self) 
-                for msg_control 
-                in new_controls
-                if msg_control.ControlTypeName == 'ListItemControl'
-            ]
+        return parse_msgs(self.msgbox, self, runtimeids=set(new))
     
     def get_msg_by_id(self, msg_id: str):
         if not self.msgbox.Exists(0):
             return []
-        msg_controls = self.msgbox.GetChildren()
+        msg_controls = self.msgbox.GetCachedChildren()
         if control_list := [i for i in msg_controls if i.runtimeid == msg_id]:
             return parse_msg(control_list[0], self)
 
@@ -419,20 +420,19 @@ class ChatBox:
             time.sleep(0.5)
         t0 = time.time()
         while True:
-            msg_controls = self.msgbox.GetChildren()
+            msg_controls = self.msgbox.GetCachedChildren()
             if len(msg_controls) > count:
                 break
             if time.time() - t0 > 3:
                 count = len(msg_controls)
                 break
-        _used_msg_ids = self.used_msg_ids
-        USED_MSG_IDS[self.id] = tuple((i.runtimeid for i in msg_controls))
-        msgs = [
-            parse_msg(msg_control, self)
-            for msg_control
-            in msg_controls
-            if msg_control.ControlTypeName == 'ListItemControl'
-        ]
+        # 重置已处理的消息id和解析消息使用同一份消息列表，两次获取之间到达的消息不会被标记为已处理却没有返回
+        children = self.msgbox.GetCachedChildrenWithProgeny()
+        _used_msg_ids = set(self.used_msg_ids.reset(
+            [control.runtimeid for control, _ in children],
+            [control.Name for control, _ in children]
+        ))
+        msgs = parse_msgs(self.msgbox, self, children=children)
 
         # 3. 如果有“以下是新消息”标志，则直接返回该标志下的所有消息即可
         index = next((
@@ -590,6 +590,196 @@ class ChatBox:
                 top_items = [TopMsg(self, i) for i in topmsgwnd.ListControl().GetChildren()]
         return top_items
 
+def _history_digest(msg) -> str:
+    """用于定位断点的消息摘要，只使用重新打开窗口后不变的内容"""
+    text = f'{msg.type}|{msg.attr}|{msg.sender}|{msg.content}'
+    return hashlib.md5(text.encode('utf-8')).hexdigest()[:12]
+
+
+class ChatHistory:
+    """向上滚动逐批获取聊天记录的迭代器
+
+    每次滚动后只解析新加载到列表顶部的消息，已经解析过的消息不会再次解析，
+    只保留少量消息id用于确定新加载的范围，从新到旧返回时内存占用与聊天记录的长度无关
+
+    迭代过程中可以随时读取 `checkpoint`，保存后传给新的迭代器即可从中断的位置继续向上获取，
+    聊天窗口重新打开后也可以使用
+
+    Args:
+        chatbox (ChatBox): 聊天窗口
+        until (str): 获取到该时间为止，格式为 %Y-%m-%d %H:%M:%S，可以只写日期，默认获取到最早的消息
+        batch (int): 每次至少加载多少条消息后再解析
+        checkpoint (str): 之前的迭代器的 `checkpoint`
+        newest_first (bool): 是否从新到旧返回，为False时会先获取全部消息再从旧到新返回
+        interval (float): 滚动间隔，单位秒
+    """
+    ANCHOR_SIZE = 3
+
+    def __init__(
+            self,
+            chatbox: ChatBox,
+            until: str = None,
+            batch: int = 50,
+            checkpoint: str = None,
+            newest_first: bool = True,
+            interval: float = 0.3
+        ):
+        self.chatbox = chatbox
+        self.chat = chatbox.editbox.Name
+        self.until = normalize_time(until) if until else None
+        self.batch = max(int(batch), 1)
+        self.newest_first = newest_first
+        self.interval = interval
+        self.count = 0
+        # 所有消息使用同一个参考时间解析时间文字
+        self._now = datetime.now()
+        # 最早返回的几条消息的摘要，从上到下排列
+        self._anchor = deque(maxlen=self.ANCHOR_SIZE)
+        # 列表顶部已解析的消息id
+        self._known = deque(maxlen=max(self.batch, 50))
+        self._known_set = set()
+        self._target = None
+        self._window = []
+        # 最早返回的摘要之后又返回的时间消息数量，保存在断点中
+        self._times = 0
+        # 从断点继续时需要跳过的时间消息数量，这几条在中断前已经返回过
+        self._skip_times = 0
+        if checkpoint:
+            data = json.loads(base64.urlsafe_b64decode(checkpoint.encode('ascii')))
+            if data['chat'] != self.chat:
+                raise ValueError(f'checkpoint不属于当前聊天窗口：{data["chat"]}')
+            self.count = data['count']
+            self._target = data['anchor'] or None
+            self._anchor.extend(data['anchor'])
+            self._times = self._skip_times = data.get('times', 0) if self._target else 0
+
+    def __repr__(self):
+        return f'<wxauto ChatHistory of "{self.chat}" count={self.count}>'
+
+    @property
+    def checkpoint(self) -> str:
+        """当前位置的断点，只包含最早返回的几条消息的摘要"""
+        data = {'chat': self.chat, 'count': self.count, 'anchor': list(self._anchor), 'times': self._times}
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+    def __iter__(self):
+        msgs = self._iter_newest_first()
+        if not self.newest_first:
+            msgs = reversed(list(msgs))
+        yield from msgs
+
+    def _iter_newest_first(self):
+        # 消息要等到遇见上方的时间消息后才能确定时间以及是否在until范围内，
+        # 每批消息顶部的消息所属的时间消息在下一批中
+        pending = []
+        for segment in self._segments():
+            if self._target is not None:
+                segment = self._seek(segment)
+                if segment is None:
+                    continue
+            for msg in reversed(segment):
+                if self._skip_time(msg):
+                    continue
+                if msg.attr != 'time':
+                    pending.append(msg)
+                    continue
+                msg_time = normalize_time(msg.time or '')
+                if self.until and msg_time and msg_time < self.until:
+                    return
+                for i in pending:
+                    if i.time is None:
+                        i.time = msg.time
+                yield from self._emit(pending)
+                pending = []
+                yield from self._emit((msg,))
+        if self._target is not None:
+            wxlog.warning(f'未找到断点位置，已加载到最早的消息：{self.chat}')
+        yield from self._emit(pending)
+
+    def _emit(self, msgs):
+        for msg in msgs:
+            self.count += 1
+            if msg.attr != 'time':
+                self._anchor.appendleft(_history_digest(msg))
+                self._times = 0
+            else:
+                self._times += 1
+            yield msg
+
+    def _skip_time(self, msg) -> bool:
+        """找到断点后，跳过断点紧邻上方已经返回过的时间消息"""
+        if self._skip_times and msg.attr == 'time':
+            self._skip_times -= 1
+            return True
+        self._skip_times = 0
+        return False
+
+    def _seek(self, segment):
+        """在新加载的消息中查找断点，找到时返回断点上方的消息，否则返回None"""
+        items = [(i, _history_digest(msg)) for i, msg in enumerate(segment) if msg.attr != 'time']
+        items += [(None, digest) for digest in self._window]
+        digests = [digest for _, digest in items]
+        size = len(self._target)
+        for start in range(len(digests) - size + 1):
+            if digests[start:start + size] == self._target:
+                self._target = None
+                self._window = []
+                return segment[:items[start][0]]
+        # 断点可能跨越两批消息，保留顶部的几条用于下一次匹配
+        self._window = digests[:size - 1]
+        return None
+
+    def _remember(self, ids):
+        for rid in reversed(ids):
+            if len(self._known) == self._known.maxlen:
+                self._known_set.discard(self._known[-1])
+            self._known.appendleft(rid)
+            self._known_set.add(rid)
+
+    def _message_controls(self) -> List[Control]:
+        return [c for c in self.chatbox.msgbox.GetCachedChildren() if c.ControlTypeName == 'ListItemControl']
+
+    def _segments(self):
+        """依次返回每一批新加载的消息，每批消息按从上到下排列"""
+        msgbox = self.chatbox.msgbox
+        if not msgbox.Exists(0):
+            return
+        with reference_time(self._now):
+            msgs = parse_msgs(msgbox, self.chatbox)
+        if not msgs:
+            return
+        self._remember([msg.id for msg in msgs])
+        store_messages(msgs, self.chat)
+        yield msgs
+        while controls := self._load_more():
+            with reference_time(self._now):
+                msgs = parse_msg_controls(controls, self.chatbox)
+            store_messages(msgs, self.chat)
+            yield msgs
+
+    def _load_more(self) -> List[Control]:
+        """向上滚动直到加载了batch条新消息或者没有更多消息，返回新加载的消息控件"""
+        msgbox = self.chatbox.msgbox
+        last = None
+        while True:
+            controls = self._message_controls()
+            index = next((i for i, c in enumerate(controls) if c.runtimeid in self._known_set), None)
+            if index is None:
+                wxlog.warning(f'消息列表已刷新，无法确定新加载的消息：{self.chat}')
+                return []
+            if index >= self.batch:
+                break
+            state = (len(controls), controls[0].CachedBoundingRectangle.top)
+            if state == last:
+                break
+            last = state
+            msgbox.WheelUp(wheelTimes=10)
+            time.sleep(self.interval)
+        controls = controls[:index]
+        self._remember([c.runtimeid for c in controls])
+        return controls
+
+
 class TopMsg:
     def __init__(self, parent, control):
         self.parent = parent
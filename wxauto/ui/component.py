@@ -279,22 +279,21 @@ class ProfileWnd(BaseUISubWnd):
         add_control.Click()
         NewFriendsWnd = AddFriendWindow(self)
         AlertWnd = self.root.control.WindowControl(ClassName='AlertDialog')
-        t0 = time.time()
-        status = 0
-        while time.time() - t0 < 5:
-            if NewFriendsWnd.exists(0.1):
+
+        def check_status():
+            if NewFriendsWnd.exists(0):
                 wxlog.debug("添加朋友窗口存在")
-                status = 1
-                break
+                return 1
             elif dialog := [i for i in self.root._get_windows() if i.Name=='添加朋友请求']:
                 wxlog.debug("从窗口枚举中找到添加朋友请求窗口")
                 NewFriendsWnd.control = dialog[0]
-                status = 1
-                break
-            elif AlertWnd.Exists(0.1):
+                return 1
+            elif AlertWnd.Exists(0):
                 wxlog.debug("存在意外对话框")
-                status = 2
-                break
+                return 2
+            return 0
+        
+        status = uia.WaitFor(check_status, 5, self.root.control)
         if status == 0:
             self.close()
             return WxResponse.failure(f"添加失败")
@@ -351,16 +350,12 @@ class WeChatDialog(BaseUISubWnd):
     def __init__(self, parent, wait=3):
         self.root = parent.root
         
-        t0 = time.time()
-        while True:
-            if time.time() - t0 > wait:
-                break
-            wins = [i for i in self.root._get_windows() if 'Dialog' in i.ClassName]
-            if wins:
-                self.control = wins[0]
-                break
-            else:
-                self.control = None
+        wins = uia.WaitFor(
+            lambda: [i for i in self.root._get_windows() if 'Dialog' in i.ClassName],
+            wait, 
+            self.root.control
+        )
+        self.control = wins[0] if wins else None
 
     def get_all_text(self):
         return [text for i in self.control.FindAll() if (text:=i.Name)]
@@ -482,7 +477,7 @@ class WeChatImage(BaseUISubWnd):
                     return result
             else:
                 self.t_ocr.Click()
-            time.sleep(0.1)
+            uia.WaitForEvent(0.1, self.control)
         return result
     
     def save(self, dir_path=None, timeout=10) -> Path:
@@ -536,7 +531,7 @@ class WeChatImage(BaseUISubWnd):
                     return WxResponse.failure('微信BUG无法获取该图片，请重新获取')
                 n += 1
                 wxlog.debug(traceback.format_exc())
-            time.sleep(0.1)
+            uia.WaitForEvent(0.1, self.control)
         filename = f"wxauto_{self.type}_{now_time()}{suffix}"
         filepath = get_file_dir(dir_path) / filename
         wxlog.debug(f"保存到文件：{filepath}")
@@ -560,12 +555,10 @@ class NoteWindow(BaseUISubWnd):
         if wait:
             time.sleep(wait)
         if self.control and self.control.Exists(0):
-            t0 = time.time()
-            while self.control.TextControl(Name='加载中').Exists(0):
-                if time.time() - t0 > WxParam.NOTE_LOAD_TIMEOUT:
-                    wxlog.debug("微信笔记加载超时")
-                    raise WxautoNoteLoadTimeoutError("微信笔记加载超时")
-                time.sleep(0.1)
+            loading = self.control.TextControl(Name='加载中')
+            if not loading.Disappears(WxParam.NOTE_LOAD_TIMEOUT, 0.1):
+                wxlog.debug("微信笔记加载超时")
+                raise WxautoNoteLoadTimeoutError("微信笔记加载超时")
             if (dialog := self.control.PaneControl(ClassName='WeUIDialog')).Exists(0):
                 self.dialog_texts = ''.join([i.Name for i in dialog.FindAll(control_type='TextControl')])
                 wxlog.debug(f"弹窗内容：{self.dialog_texts}")
@@ -709,26 +702,33 @@ class AddMemberWnd(BaseUISubWnd):
         wxlog.debug("提交添加好友请求")
         confirmdlg = self.control.WindowControl(ClassName='ConfirmDialog')
         alertdlg = self.control.WindowControl(ClassName='AlertDialog')
-        t0 = time.time()
-        while True:
-            if time.time() - t0 > 5:
-                raise TimeoutError("新增群好友等待超时")
-            if not self.control.Exists(0.1):
-                wxlog.debug("新增群好友成功，无须再次确认")
-                return WxResponse.success()
-            if confirmdlg.Exists(0.1):
-                wxlog.debug("新增群好友成功，确认添加")
-                time.sleep(1)
-                # confirmdlg.ButtonControl(Name='确定').Click()
-                confirmdlg.SendKeys('{ENTER}')
-                return WxResponse.success()
-            if alertdlg.Exists(0.3):
-                content_list = alertdlg.FindAll(control_type='TextControl')
-                alert_content = ' '.join([c.Name for c in content_list])
-                wxlog.debug(f"新增群好友失败：{alert_content}")
-                alertdlg.SendKeys('{Esc}')
-                self.close()
-                return WxResponse.failure(f"新增群好友失败：{alert_content}")
+
+        def check_result():
+            if not self.control.Exists(0):
+                return 'closed'
+            if confirmdlg.Exists(0):
+                return 'confirm'
+            if alertdlg.Exists(0):
+                return 'alert'
+        
+        result = uia.WaitFor(check_result, 5, self.control)
+        if not result:
+            raise TimeoutError("新增群好友等待超时")
+        if result == 'closed':
+            wxlog.debug("新增群好友成功，无须再次确认")
+            return WxResponse.success()
+        if result == 'confirm':
+            wxlog.debug("新增群好友成功，确认添加")
+            time.sleep(1)
+            # confirmdlg.ButtonControl(Name='确定').Click()
+            confirmdlg.SendKeys('{ENTER}')
+            return WxResponse.success()
+        content_list = alertdlg.FindAll(control_type='TextControl')
+        alert_content = ' '.join([c.Name for c in content_list])
+        wxlog.debug(f"新增群好友失败：{alert_content}")
+        alertdlg.SendKeys('{Esc}')
+        self.close()
+        return WxResponse.failure(f"新增群好友失败：{alert_content}")
             
     def reason(self, content: str):
         reasondlg = self.parent.root.control.PaneControl(ClassName='WeUIDialog')
@@ -801,7 +801,7 @@ class NewFriendElement:
                 dialog.SendKeys('{Esc}')
                 self.root.ChatBox.ButtonControl(Name='').Click()
                 return WxResponse.failure(msg=systext)
-            time.sleep(0.1)
+            uia.WaitForEvent(0.1, edit)
         self.root.ChatBox.ButtonControl(Name='').Click()
         return WxResponse.success()
     
@@ -1000,7 +1000,7 @@ class WeChatBrowser:
             self.control.PaneControl(ClassName='Chrome_WidgetWin_0').MenuControl(searchDepth=5)
         while not menu_control.Exists(0):
             more_control.Click()
-            time.sleep(0.1)
+            uia.WaitForEvent(0.1, menu_control)
         menu = self._BrowserMenu(menu_control)
         result = menu.select(option)
         menu.close()
@@ -1021,20 +1021,16 @@ class WeChatBrowser:
         ):
             if time.time()-t0>timeout:
                 break
-            time.sleep(0.1)
+            uia.WaitForEvent(0.1, self.control)
         while not self.select_option(self._lang("复制链接")):
             if time.time()-t0>timeout:
                 return WxResponse.failure('获取链接超时')
-            time.sleep(0.1)
+            uia.WaitForEvent(0.1, self.control)
         url = ReadClipboardData()['13']
         return url
 
 def get_wx_browser(func, timeout=10) -> WeChatBrowser:
-    t0 = time.time()
-    func()
-    while True:
-        if time.time() - t0 > timeout:
-            return WxResponse.failure('无法打开微信浏览器')
+    def find_browser():
         wins = [
             i for i in GetAllWindows() 
             if i[1]==WeChatBrowser._ui_cls_name
@@ -1044,6 +1040,11 @@ def get_wx_browser(func, timeout=10) -> WeChatBrowser:
         for browser in browsers:
             if len(browser.get_tabs()) > 0:
                 return browser
+    
+    func()
+    if browser := uia.WaitFor(find_browser, timeout):
+        return browser
+    return WxResponse.failure('无法打开微信浏览器')
 
 class ChatRecordWnd(BaseUISubWnd):
     def __init__(self, parent):
@@ -1056,9 +1057,10 @@ class ChatRecordWnd(BaseUISubWnd):
         
         msgids = []
         msgs = []
+        now = datetime.datetime.now()
         listcontrol = self.control.ListControl()
         while True:
-            listitems = listcontrol.GetChildren()
+            listitems = listcontrol.GetCachedChildren()
             listitemids = [item.GetRuntimeId() for item in listitems]
             try:
                 msgids = msgids[msgids.index(listitemids[0]):]
@@ -1069,7 +1071,7 @@ class ChatRecordWnd(BaseUISubWnd):
                 if msgid not in msgids:
                     msgids.append(msgid)
                     sender = item.GetProgenyControl(4, control_type='TextControl').Name
-                    msgtime = parse_wechat_time(item.GetProgenyControl(4, 1, control_type='TextControl').Name)
+                    msgtime = parse_wechat_time(item.GetProgenyControl(4, 1, control_type='TextControl').Name, now)
                     if '[图片]' in item.Name:
                         # wait for image loading
                         for _ in range(10):
@@ -1108,7 +1110,7 @@ class ChatRecordWnd(BaseUISubWnd):
             if (
                 topcontrol.Exists(0.1) 
                 and top == topcontrol.BoundingRectangle.top 
-                and listitemids == [item.GetRuntimeId() for item in listcontrol.GetChildren()]
+                and listitemids == [item.GetRuntimeId() for item in listcontrol.GetCachedChildren()]
             ):
                 self.control.SendKeys('{Esc}')
                 return msgs
@@ -1155,7 +1157,7 @@ class ContactManagerWindow(BaseUISubWnd):
         """
         wxlog.debug("获取好友列表")
         contacts_list = []
-        contact_ele_list = self.ContactBox.ListControl().GetChildren()
+        contact_ele_list = self.ContactBox.ListControl().GetCachedChildren()
 
         n = 0
         idx = 0
@@ -1178,7 +1180,7 @@ class ContactManagerWindow(BaseUISubWnd):
 
             n = 0
             while n < 5:
-                nowlist = [i.GetRuntimeId() for i in self.ContactBox.ListControl().GetChildren()]
+                nowlist = [i.GetRuntimeId() for i in self.ContactBox.ListControl().GetCachedChildren()]
                 if lastid != nowlist[-1] and lastid in nowlist and top_ele == ele.BoundingRectangle.top:
                     break
 
@@ -1189,12 +1191,12 @@ class ContactManagerWindow(BaseUISubWnd):
                 top_ele = ele.BoundingRectangle.top
 
             while True:
-                nowlist = [i.GetRuntimeId() for i in self.ContactBox.ListControl().GetChildren()]
+                nowlist = [i.GetRuntimeId() for i in self.ContactBox.ListControl().GetCachedChildren()]
                 if lastid in nowlist:
                     break
                 time.sleep(0.01)
             idx = nowlist.index(lastid) + 1
-            contact_ele_list = self.ContactBox.ListControl().GetChildren()[idx:]
+            contact_ele_list = self.ContactBox.ListControl().GetCachedChildren()[idx:]
         return contacts_list
     
     def get_all_recent_groups(self, speed: int = 1, wait=0.05):
@@ -1213,7 +1215,7 @@ class ContactManagerWindow(BaseUISubWnd):
 
         n = 0
         idx = 0
-        group_list_items = group_list_control.GetChildren()
+        group_list_items = group_list_control.GetCachedChildren()
         while n < 5:
             for _, item in enumerate(group_list_items):
                 text_control1, text_control2 = item.TextControl().GetParentControl().GetChildren()
@@ -1229,7 +1231,7 @@ class ContactManagerWindow(BaseUISubWnd):
 
             n = 0
             while n < 5:
-                nowlist = [i.GetRuntimeId() for i in group_list_control.GetChildren()]
+                nowlist = [i.GetRuntimeId() for i in group_list_control.GetCachedChildren()]
                 if lastid != nowlist[-1] and lastid in nowlist and top_ele == item.BoundingRectangle.top:
                     break
 
@@ -1240,10 +1242,10 @@ class ContactManagerWindow(BaseUISubWnd):
                 top_ele = item.BoundingRectangle.top
 
             while True:
-                nowlist = [i.GetRuntimeId() for i in group_list_control.GetChildren()]
+                nowlist = [i.GetRuntimeId() for i in group_list_control.GetCachedChildren()]
                 if lastid in nowlist:
                     break
                 time.sleep(0.01)
             idx = nowlist.index(lastid) + 1
-            group_list_items = group_list_control.GetChildren()[idx:]
+            group_list_items = group_list_control.GetCachedChildren()[idx:]
         return groups
\ No newline at end of file
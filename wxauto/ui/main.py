@@ -37,10 +37,11 @@ from typing import (
     Literal
 )
 import time
-import winreg
 import random
 import os
 import sys
+if sys.platform == 'win32':
+    import winreg
 
 class WeChatSubWnd(BaseUISubWnd):
     _ui_cls_name: str = 'ChatWnd'
@@ -61,6 +62,7 @@ class WeChatSubWnd(BaseUISubWnd):
             hwnd = key
         self.control = uia.ControlFromHandle(hwnd)
         if self.control is not None:
+            uia.AddElementCacheRoot(self.control)
             chatbox_control = self.control.PaneControl(ClassName='', searchDepth=1)
             self._chat_api = ChatBox(chatbox_control, self)
             self.nickname = self.control.Name
@@ -304,6 +306,7 @@ class WeChatMainWnd(WeChatSubWnd):
         try:
             self.HWND = hwnd
             self.control = uia.ControlFromHandle(hwnd)
+            uia.AddElementCacheRoot(self.control)
             MainControl1 = [i for i in self.control.GetChildren() if not i.ClassName][0]
             MainControl2 = MainControl1.GetFirstChildControl()
             navigation_control, sessionbox_control, chatbox_control  = MainControl2.GetChildren()
@@ -317,7 +320,7 @@ class WeChatMainWnd(WeChatSubWnd):
         except Exception as e:
             debug_file = os.path.join(os.getcwd(), 'wxauto_DEBUG_INIT.txt')
             with open(debug_file, 'w', encoding='utf8') as f:
-                f.write(self.control.tree_text)
+                f.write(self.control.tree() or '')
             raise Exception(f'WeChat实例初始化失败，请将该文件发给管理员反馈：{debug_file}')
 
     def __repr__(self):
@@ -388,9 +391,9 @@ class WeChatMainWnd(WeChatSubWnd):
         wait = False
         self._navigation_api.contact_icon.Click()
         cti = self._session_api.control.ListItemControl(Name=self._lang("新的朋友"))
-        while not cti.Exists(0):
+        while not cti.Exists(uia.OPERATION_WAIT_TIME if wait else 0):
             wait = True
-            self.SessionBox.WheelUp(wheelTimes=3)
+            self.SessionBox.WheelUp(wheelTimes=3, waitTime=0)
         # if wait:
         #     time.sleep(1)
         # self.SessionBox.WheelUp(wheelTimes=3)
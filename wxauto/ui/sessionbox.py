@@ -44,13 +44,13 @@ class SessionBox:
         if self.session_list.Exists(0):
             return [
                 SessionElement(i, self) 
-                for i in self.session_list.GetChildren()
+                for i in self.session_list.GetCachedChildren()
                 if i.Name != self._lang('折叠置顶聊天')
                 and not re.match(self._lang('re_置顶聊天'), i.Name)
-                and i.BoundingRectangle.height() != 0
+                and i.CachedBoundingRectangle.height() != 0
             ]
         elif self.archived_session_list.Exists(0):
-            return [SessionElement(i, self) for i in self.archived_session_list.GetChildren()]
+            return [SessionElement(i, self) for i in self.archived_session_list.GetCachedChildren()]
         else:
             return []
     
@@ -186,10 +186,12 @@ class SessionBox:
 
     def open_contact_manager(self):
         wxlog.debug("打开联系人管理")
-        while not (contact_btn := self.control.ButtonControl(Name=self._lang('通讯录管理'))).Exists(0):
+        contact_btn = self.control.ButtonControl(Name=self._lang('通讯录管理'))
+        scrolled = False
+        while not contact_btn.Exists(0.6 if scrolled else 0):
+            scrolled = True
             self.go_top()
-            self.control.WheelUp(wheelTimes=5)
-            time.sleep(0.1)
+            self.control.WheelUp(wheelTimes=5, waitTime=0)
         contact_btn.Click()
 
 
@@ -0,0 +1,751 @@
+# cython: language_level=3
+"""
+模拟的 UIAutomation 后端
+
+在内存中构造一棵控件树，提供与 IUIAutomationElement / IUIAutomation / TreeWalker 相同的调用接口，
+`Control` 通过 `SetAutomationClient` 切换到该后端后，即可在非 Windows 环境下运行消息解析、新消息检测等逻辑。
+
+控件树可以直接从 `Control.tree()` 的输出（例如 wxauto_DEBUG_INIT.txt）加载，
+每次“COM 调用”都会被计数，并可按调用名注入延迟，用于模拟真实 COM 调用的耗时。
+
+本模块只依赖标准库。
+
+Example:
+    >>> from wxauto.uia import simulate, uiautomation as uia
+    >>> client = simulate.SimulatedClient(latency=0.0002)
+    >>> root = client.load_file('wxauto_DEBUG_INIT.txt')
+    >>> uia.SetAutomationClient(client)
+    >>> window = uia.Control.CreateControlFromElement(root)
+"""
+import re
+import time
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# UIAutomation 常量，与 uiautomation.ControlType / PropertyId 保持一致
+CONTROL_TYPES = {
+    'AppBarControl': 50040,
+    'ButtonControl': 50000,
+    'CalendarControl': 50001,
+    'CheckBoxControl': 50002,
+    'ComboBoxControl': 50003,
+    'CustomControl': 50025,
+    'DataGridControl': 50028,
+    'DataItemControl': 50029,
+    'DocumentControl': 50030,
+    'EditControl': 50004,
+    'GroupControl': 50026,
+    'HeaderControl': 50034,
+    'HeaderItemControl': 50035,
+    'HyperlinkControl': 50005,
+    'ImageControl': 50006,
+    'ListControl': 50008,
+    'ListItemControl': 50007,
+    'MenuBarControl': 50010,
+    'MenuControl': 50009,
+    'MenuItemControl': 50011,
+    'PaneControl': 50033,
+    'ProgressBarControl': 50012,
+    'RadioButtonControl': 50013,
+    'ScrollBarControl': 50014,
+    'SemanticZoomControl': 50039,
+    'SeparatorControl': 50038,
+    'SliderControl': 50015,
+    'SpinnerControl': 50016,
+    'SplitButtonControl': 50031,
+    'StatusBarControl': 50017,
+    'TabControl': 50018,
+    'TabItemControl': 50019,
+    'TableControl': 50036,
+    'TextControl': 50020,
+    'ThumbControl': 50027,
+    'TitleBarControl': 50037,
+    'ToolBarControl': 50021,
+    'ToolTipControl': 50022,
+    'TreeControl': 50023,
+    'TreeItemControl': 50024,
+    'WindowControl': 50032,
+}
+CONTROL_TYPE_NAMES = {v: k for k, v in CONTROL_TYPES.items()}
+
+RuntimeIdProperty = 30000
+BoundingRectangleProperty = 30001
+ProcessIdProperty = 30002
+ControlTypeProperty = 30003
+NameProperty = 30005
+AutomationIdProperty = 30011
+ClassNameProperty = 30012
+NativeWindowHandleProperty = 30020
+
+# TreeScope 按 UIAutomation 的位定义解析
+TreeScope_Element = 1
+TreeScope_Children = 2
+TreeScope_Descendants = 4
+
+# 事件，与 uiautomation.EventId 保持一致
+StructureChangedEvent = 20002
+MenuOpenedEvent = 20003
+WindowOpenedEvent = 20016
+WindowClosedEvent = 20017
+StructureChangeType_ChildAdded = 0
+StructureChangeType_ChildRemoved = 1
+
+# GetAncestor，与 uiautomation.GAFlag 保持一致
+GA_PARENT = 1
+GA_ROOT = 2
+
+# [ButtonControl 3]("ClassName", "Name", "AutomationId", "4252...", (l,t,r,b))
+_LINE_PATTERN = re.compile(
+    r'\[(?P<type>\w+) (?P<depth>\d+)\]'
+    r'\("(?P<cls>.*?)", "(?P<name>.*)", "(?P<aid>.*?)", "(?P<rid>[-\d]*)"'
+    r'(?:, \((?P<rect>-?\d+,-?\d+,-?\d+,-?\d+)\))?\)\s*$'
+)
+_TREE_PREFIX_CHARS = '│├└─  '
+
+
+class SimRect:
+    """模拟 CurrentBoundingRectangle 返回的 RECT"""
+    __slots__ = ('left', 'top', 'right', 'bottom')
+
+    def __init__(self, left: int = 0, top: int = 0, right: int = 0, bottom: int = 0):
+        self.left = left
+        self.top = top
+        self.right = right
+        self.bottom = bottom
+
+    def __repr__(self) -> str:
+        return f'SimRect({self.left},{self.top},{self.right},{self.bottom})'
+
+
+class SimCondition:
+    """模拟 IUIAutomationCondition，`match(element)` 判断是否满足条件"""
+    __slots__ = ('match', 'description')
+
+    def __init__(self, match: Callable[['SimElement'], bool], description: str = ''):
+        self.match = match
+        self.description = description
+
+    def __repr__(self) -> str:
+        return f'<SimCondition {self.description}>'
+
+
+class SimElementArray:
+    """模拟 IUIAutomationElementArray"""
+    __slots__ = ('_elements', '_client')
+
+    def __init__(self, elements: List['SimElement'], client: 'SimulatedClient'):
+        self._elements = elements
+        self._client = client
+
+    @property
+    def Length(self) -> int:
+        return len(self._elements)
+
+    def GetElement(self, index: int) -> 'SimElement':
+        self._client._hit('GetElement')
+        return self._elements[index]
+
+    def __len__(self) -> int:
+        return len(self._elements)
+
+    def __iter__(self):
+        return iter(self._elements)
+
+
+class SimElement:
+    """模拟 IUIAutomationElement
+
+    同一个控件始终对应同一个 SimElement 对象，因此可以直接用 `==` 比较。
+    """
+    __slots__ = (
+        '_client', 'parent', 'children', '_index',
+        'control_type', 'class_name', 'name', 'automation_id',
+        'runtime_id', 'rect', 'handle', 'process_id', 'props',
+    )
+
+    def __init__(
+            self,
+            client: 'SimulatedClient',
+            control_type: int,
+            class_name: str = '',
+            name: str = '',
+            automation_id: str = '',
+            runtime_id: Tuple[int, ...] = None,
+            rect: Tuple[int, int, int, int] = (0, 0, 0, 0),
+            handle: int = 0,
+            process_id: int = 0,
+            **props
+        ):
+        self._client = client
+        self.parent: Optional[SimElement] = None
+        self.children: List[SimElement] = []
+        self._index = 0
+        self.control_type = control_type
+        self.class_name = class_name
+        self.name = name
+        self.automation_id = automation_id
+        self.runtime_id = tuple(runtime_id) if runtime_id else client._new_runtime_id()
+        self.rect = tuple(rect)
+        self.handle = handle
+        self.process_id = process_id
+        self.props = props
+
+    def __repr__(self) -> str:
+        return f'<SimElement {CONTROL_TYPE_NAMES.get(self.control_type, self.control_type)} "{self.name}">'
+
+    # ---------------------------------------- IUIAutomationElement ----------------------------------------
+    @property
+    def CurrentControlType(self) -> int:
+        self._client._hit('CurrentControlType')
+        return self.control_type
+
+    @property
+    def CurrentName(self) -> str:
+        self._client._hit('CurrentName')
+        return self.name
+
+    @property
+    def CurrentClassName(self) -> str:
+        self._client._hit('CurrentClassName')
+        return self.class_name
+
+    @property
+    def CurrentAutomationId(self) -> str:
+        self._client._hit('CurrentAutomationId')
+        return self.automation_id
+
+    @property
+    def CurrentBoundingRectangle(self) -> SimRect:
+        self._client._hit('CurrentBoundingRectangle')
+        return SimRect(*self.rect)
+
+    @property
+    def CurrentNativeWindowHandle(self) -> int:
+        self._client._hit('CurrentNativeWindowHandle')
+        return self.handle
+
+    @property
+    def CurrentProcessId(self) -> int:
+        self._client._hit('CurrentProcessId')
+        return self.process_id
+
+    def __getattr__(self, name: str):
+        # 其余 Current* 属性从 props 中读取，未设置时返回 UIA 的默认值
+        if name.startswith('Current'):
+            self._client._hit(name)
+            return self.props.get(name[7:], _DEFAULT_PROPERTIES.get(name[7:], ''))
+        raise AttributeError(f"'SimElement' object has no attribute '{name}'")
+
+    def GetRuntimeId(self) -> List[int]:
+        self._client._hit('GetRuntimeId')
+        return list(self.runtime_id)
+
+    def GetCurrentPropertyValue(self, propertyId: int):
+        self._client._hit('GetCurrentPropertyValue')
+        return self._property(propertyId)
+
+    def GetCurrentPropertyValueEx(self, propertyId: int, ignoreDefaultValue: int = 0):
+        self._client._hit('GetCurrentPropertyValueEx')
+        return self._property(propertyId)
+
+    def GetCurrentPattern(self, patternId: int):
+        self._client._hit('GetCurrentPattern')
+        return None
+
+    def FindAll(self, scope: int, condition: SimCondition) -> SimElementArray:
+        self._client._hit('FindAll')
+        return SimElementArray([e for e in self._scope(scope) if condition.match(e)], self._client)
+
+    def FindAllBuildCache(self, scope: int, condition: SimCondition, cacheRequest: 'SimCacheRequest') -> SimElementArray:
+        self._client._hit('FindAllBuildCache')
+        return SimElementArray([e for e in self._scope(scope) if condition.match(e)], self._client)
+
+    # 缓存的属性在进程内读取，不计入调用次数
+    @property
+    def CachedControlType(self) -> int:
+        return self.control_type
+
+    @property
+    def CachedName(self) -> str:
+        return self.name
+
+    @property
+    def CachedClassName(self) -> str:
+        return self.class_name
+
+    @property
+    def CachedAutomationId(self) -> str:
+        return self.automation_id
+
+    @property
+    def CachedBoundingRectangle(self) -> SimRect:
+        return SimRect(*self.rect)
+
+    def GetCachedPropertyValue(self, propertyId: int):
+        return self._property(propertyId)
+
+    def BuildUpdatedCache(self, cacheRequest: 'SimCacheRequest') -> 'SimElement':
+        self._client._hit('BuildUpdatedCache')
+        return self
+
+    def GetCachedChildren(self) -> Optional[SimElementArray]:
+        # 缓存的子控件，与COM一样没有子控件时返回None
+        if self.children:
+            return SimElementArray(self.children, self._client)
+
+    def FindFirst(self, scope: int, condition: SimCondition) -> Optional['SimElement']:
+        self._client._hit('FindFirst')
+        for e in self._scope(scope):
+            if condition.match(e):
+                return e
+
+    def SetFocus(self) -> int:
+        self._client._hit('SetFocus')
+        return 0
+
+    # ---------------------------------------- 树操作（不计入调用次数） ----------------------------------------
+    def _property(self, propertyId: int):
+        if propertyId == ControlTypeProperty:
+            return self.control_type
+        elif propertyId == NameProperty:
+            return self.name
+        elif propertyId == ClassNameProperty:
+            return self.class_name
+        elif propertyId == AutomationIdProperty:
+            return self.automation_id
+        elif propertyId == RuntimeIdProperty:
+            return list(self.runtime_id)
+        elif propertyId == BoundingRectangleProperty:
+            return self.rect
+        elif propertyId == NativeWindowHandleProperty:
+            return self.handle
+        elif propertyId == ProcessIdProperty:
+            return self.process_id
+        return self.props.get(propertyId)
+
+    def _scope(self, scope: int) -> Iterable['SimElement']:
+        if scope & TreeScope_Element:
+            yield self
+        if scope & TreeScope_Descendants:
+            yield from self.iter_descendants()
+        elif scope & TreeScope_Children:
+            yield from self.children
+
+    def iter_descendants(self, max_depth: int = 0xFFFFFFFF) -> Iterable['SimElement']:
+        """先序遍历所有后代控件"""
+        stack = [(child, 1) for child in reversed(self.children)]
+        while stack:
+            element, depth = stack.pop()
+            yield element
+            if depth < max_depth:
+                stack.extend((child, depth + 1) for child in reversed(element.children))
+
+    def _reindex(self, start: int = 0) -> None:
+        for i in range(start, len(self.children)):
+            self.children[i]._index = i
+
+    def add_child(self, child: 'SimElement', index: int = None) -> 'SimElement':
+        """添加子控件，index为None时添加到末尾"""
+        if child.parent is not None:
+            child.parent.remove_child(child)
+        child.parent = self
+        if index is None:
+            child._index = len(self.children)
+            self.children.append(child)
+        else:
+            self.children.insert(index, child)
+            self._reindex(index)
+        self._client._index_handle(child)
+        if self._client._handlers:
+            self._client.raise_structure_changed(child, StructureChangeType_ChildAdded)
+            if self is self._client.root:
+                self._client.raise_automation_event(WindowOpenedEvent, child)
+            elif child.control_type == CONTROL_TYPES['MenuControl']:
+                self._client.raise_automation_event(MenuOpenedEvent, child)
+        return child
+
+    def remove_child(self, child: 'SimElement') -> None:
+        """移除子控件"""
+        index = child._index
+        del self.children[index]
+        child.parent = None
+        self._reindex(index)
+        if self._client._handlers:
+            if self is self._client.root:
+                self._client.raise_automation_event(WindowClosedEvent, child)
+            self._client.raise_structure_changed(self, StructureChangeType_ChildRemoved)
+
+    def set_name(self, name: str) -> None:
+        """修改Name，并触发属性变化事件"""
+        self.name = name
+        if self._client._handlers:
+            self._client.raise_property_changed(self, NameProperty, name)
+
+    def is_in_scope(self, element: 'SimElement', scope: int) -> bool:
+        """判断本控件是否在element的scope范围内"""
+        if self is element:
+            return bool(scope & TreeScope_Element)
+        parent = self.parent
+        if parent is element:
+            return bool(scope & (TreeScope_Children | TreeScope_Descendants))
+        while parent is not None:
+            if parent is element:
+                return bool(scope & TreeScope_Descendants)
+            parent = parent.parent
+        return False
+
+    def new_child(self, control_type: str, index: int = None, **kwargs) -> 'SimElement':
+        """创建并添加子控件，control_type为控件类型名，例如'ListItemControl'"""
+        child = SimElement(self._client, CONTROL_TYPES[control_type], **kwargs)
+        return self.add_child(child, index)
+
+
+_DEFAULT_PROPERTIES = {
+    'IsEnabled': 1,
+    'IsOffscreen': 0,
+    'IsPassword': 0,
+    'IsKeyboardFocusable': 0,
+    'HasKeyboardFocus': 0,
+    'IsControlElement': 1,
+    'IsContentElement': 1,
+    'IsDataValidForForm': 0,
+    'IsRequiredForForm': 0,
+    'Culture': 0,
+    'Orientation': 0,
+}
+
+
+class SimCacheRequest:
+    """模拟 IUIAutomationCacheRequest，模拟的控件属性始终可读，这里只记录请求的属性"""
+
+    def __init__(self):
+        self.properties = []
+        self.patterns = []
+        self.TreeScope = TreeScope_Element
+        self.TreeFilter = None
+
+    def AddProperty(self, propertyId: int) -> None:
+        self.properties.append(propertyId)
+
+    def AddPattern(self, patternId: int) -> None:
+        self.patterns.append(patternId)
+
+
+class SimTreeWalker:
+    """模拟 IUIAutomationTreeWalker（RawViewWalker）"""
+
+    def __init__(self, client: 'SimulatedClient'):
+        self._client = client
+
+    def GetParentElement(self, element: SimElement) -> Optional[SimElement]:
+        self._client._hit('GetParentElement')
+        return element.parent
+
+    def GetFirstChildElement(self, element: SimElement) -> Optional[SimElement]:
+        self._client._hit('GetFirstChildElement')
+        if element.children:
+            return element.children[0]
+
+    def GetLastChildElement(self, element: SimElement) -> Optional[SimElement]:
+        self._client._hit('GetLastChildElement')
+        if element.children:
+            return element.children[-1]
+
+    def GetFirstChildElementBuildCache(self, element: SimElement, cacheRequest: SimCacheRequest) -> Optional[SimElement]:
+        self._client._hit('GetFirstChildElementBuildCache')
+        if element.children:
+            return element.children[0]
+
+    def GetLastChildElementBuildCache(self, element: SimElement, cacheRequest: SimCacheRequest) -> Optional[SimElement]:
+        self._client._hit('GetLastChildElementBuildCache')
+        if element.children:
+            return element.children[-1]
+
+    def GetNextSiblingElement(self, element: SimElement) -> Optional[SimElement]:
+        self._client._hit('GetNextSiblingElement')
+        parent = element.parent
+        if parent is not None and element._index + 1 < len(parent.children):
+            return parent.children[element._index + 1]
+
+    def GetPreviousSiblingElement(self, element: SimElement) -> Optional[SimElement]:
+        self._client._hit('GetPreviousSiblingElement')
+        parent = element.parent
+        if parent is not None and element._index > 0:
+            return parent.children[element._index - 1]
+
+
+class SimAutomation:
+    """模拟 IUIAutomation"""
+
+    def __init__(self, client: 'SimulatedClient'):
+        self._client = client
+
+    def GetRootElement(self) -> SimElement:
+        self._client._hit('GetRootElement')
+        return self._client.root
+
+    def GetFocusedElement(self) -> SimElement:
+        self._client._hit('GetFocusedElement')
+        return self._client.focused or self._client.root
+
+    def ElementFromHandle(self, handle: int) -> Optional[SimElement]:
+        self._client._hit('ElementFromHandle')
+        return self._client._handles.get(handle)
+
+    def CompareElements(self, element1: SimElement, element2: SimElement) -> int:
+        self._client._hit('CompareElements')
+        return int(element1 is element2)
+
+    def CreateCacheRequest(self) -> SimCacheRequest:
+        return SimCacheRequest()
+
+    def CreateTrueCondition(self) -> SimCondition:
+        return SimCondition(lambda e: True, 'True')
+
+    def CreateFalseCondition(self) -> SimCondition:
+        return SimCondition(lambda e: False, 'False')
+
+    def CreatePropertyCondition(self, propertyId: int, value) -> SimCondition:
+        if propertyId == RuntimeIdProperty:
+            value = tuple(value)
+            return SimCondition(lambda e: e.runtime_id == value, f'RuntimeId={value}')
+        return SimCondition(lambda e: e._property(propertyId) == value, f'{propertyId}={value!r}')
+
+    def CreateAndCondition(self, condition1: SimCondition, condition2: SimCondition) -> SimCondition:
+        return SimCondition(
+            lambda e: condition1.match(e) and condition2.match(e),
+            f'({condition1.description} and {condition2.description})'
+        )
+
+    def CreateOrCondition(self, condition1: SimCondition, condition2: SimCondition) -> SimCondition:
+        return SimCondition(
+            lambda e: condition1.match(e) or condition2.match(e),
+            f'({condition1.description} or {condition2.description})'
+        )
+
+    def CreateNotCondition(self, condition: SimCondition) -> SimCondition:
+        return SimCondition(lambda e: not condition.match(e), f'not {condition.description}')
+
+    # 事件处理器同步回调，与COM一样以 Handle*Event 方法接收事件
+    def AddAutomationEventHandler(self, eventId: int, element: SimElement, scope: int, cacheRequest, handler) -> None:
+        self._client._add_handler(('event', eventId), element, scope, handler)
+
+    def AddStructureChangedEventHandler(self, element: SimElement, scope: int, cacheRequest, handler) -> None:
+        self._client._add_handler(('structure', StructureChangedEvent), element, scope, handler)
+
+    def AddPropertyChangedEventHandler(self, element: SimElement, scope: int, cacheRequest, handler, propertyArray) -> None:
+        for propertyId in propertyArray:
+            self._client._add_handler(('property', propertyId), element, scope, handler)
+
+    def RemoveStructureChangedEventHandler(self, element: SimElement, handler) -> None:
+        self._client._remove_handler(('structure', StructureChangedEvent), element, handler)
+
+    def RemoveAllEventHandlers(self) -> None:
+        self._client._remove_all_handlers()
+
+
+class SimulatedClient:
+    """模拟的 `_AutomationClient`
+
+    Args:
+        latency (float): 每次调用注入的默认延迟（秒），默认为0
+        latencies (dict): 按调用名单独指定延迟，例如 {'FindAll': 0.002, 'CurrentName': 0.0001}
+        events (bool): 是否投递事件，为False时模拟收不到UIAutomation事件的环境
+    """
+    def __init__(self, latency: float = 0.0, latencies: Dict[str, float] = None, events: bool = True):
+        self.latency = latency
+        self.latencies = dict(latencies or {})
+        self.events = events
+        self._handlers: List[tuple] = []
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._runtime_id_seed = 0
+        self._handles: Dict[int, SimElement] = {}
+        self.focused: Optional[SimElement] = None
+        self.IUIAutomation = SimAutomation(self)
+        self.ViewWalker = SimTreeWalker(self)
+        self.UIAutomationCore = None
+        self.root = SimElement(self, CONTROL_TYPES['PaneControl'], '#32769', '桌面 1', handle=0x10010)
+        self._handles[self.root.handle] = self.root
+
+    def __repr__(self) -> str:
+        return f'<SimulatedClient windows={len(self.root.children)} calls={sum(self.calls.values())}>'
+
+    def _hit(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+        delay = self.latencies.get(name, self.latency)
+        if delay > 0:
+            _wait(delay)
+
+    def GetAncestor(self, handle: int, flag: int) -> int:
+        """按控件树查找窗口句柄的祖先，代替Win32的GetAncestor
+
+        Args:
+            handle (int): 窗口句柄
+            flag (int): GAFlag，Parent为上层最近的有句柄的控件，Root和RootOwner为桌面下的顶层窗口
+
+        Returns:
+            int: 祖先的窗口句柄，handle为桌面或不存在时为0
+        """
+        self._hit('GetAncestor')
+        element = self._handles.get(handle)
+        if element is None or element is self.root:
+            return 0
+        if flag == GA_PARENT:
+            parent = element.parent
+            while parent is not None and not parent.handle:
+                parent = parent.parent
+            return parent.handle if parent is not None else 0
+        while element.parent is not None and element.parent is not self.root:
+            element = element.parent
+        return element.handle
+
+    def _new_runtime_id(self) -> Tuple[int, ...]:
+        with self._lock:
+            self._runtime_id_seed += 1
+            return (42, 0x5A1A, self._runtime_id_seed)
+
+    def _index_handle(self, element: SimElement) -> None:
+        if element.handle:
+            self._handles[element.handle] = element
+
+    def _add_handler(self, key: tuple, element: SimElement, scope: int, handler) -> None:
+        with self._lock:
+            self._handlers.append((key, element, scope, handler))
+
+    def _remove_handler(self, key: tuple, element: SimElement, handler) -> None:
+        with self._lock:
+            self._handlers = [h for h in self._handlers if not (h[0] == key and h[1] is element and h[3] is handler)]
+
+    def _remove_all_handlers(self) -> None:
+        with self._lock:
+            self._handlers = []
+
+    def _listeners(self, key: tuple, sender: SimElement) -> list:
+        if not self.events:
+            return []
+        with self._lock:
+            handlers = list(self._handlers)
+        return [handler for k, element, scope, handler in handlers if k == key and sender.is_in_scope(element, scope)]
+
+    def raise_automation_event(self, event_id: int, sender: SimElement) -> None:
+        """触发事件，例如WindowOpenedEvent"""
+        for handler in self._listeners(('event', event_id), sender):
+            handler.HandleAutomationEvent(sender, event_id)
+
+    def raise_structure_changed(self, sender: SimElement, change_type: int) -> None:
+        """触发结构变化事件"""
+        for handler in self._listeners(('structure', StructureChangedEvent), sender):
+            handler.HandleStructureChangedEvent(sender, change_type, list(sender.runtime_id))
+
+    def raise_property_changed(self, sender: SimElement, property_id: int, value) -> None:
+        """触发属性变化事件"""
+        for handler in self._listeners(('property', property_id), sender):
+            handler.HandlePropertyChangedEvent(sender, property_id, value)
+
+    def stats(self) -> Dict[str, int]:
+        """获取各调用的次数"""
+        with self._lock:
+            return dict(self.calls)
+
+    def total_calls(self) -> int:
+        """获取调用总次数"""
+        with self._lock:
+            return sum(self.calls.values())
+
+    def reset_stats(self) -> None:
+        """清空调用计数"""
+        with self._lock:
+            self.calls.clear()
+
+    def new_element(self, control_type: str, **kwargs) -> SimElement:
+        """创建一个未挂载的控件，control_type为控件类型名，例如'TextControl'"""
+        return SimElement(self, CONTROL_TYPES[control_type], **kwargs)
+
+    def add_window(self, window: SimElement, handle: int = None) -> SimElement:
+        """将控件作为顶层窗口挂到桌面下，handle用于`ControlFromHandle`"""
+        if handle is not None:
+            window.handle = handle
+        elif not window.handle:
+            window.handle = 0x20000 + len(self.root.children) * 0x10
+        self.root.add_child(window)
+        for element in window.iter_descendants():
+            self._index_handle(element)
+        return window
+
+    def load_tree(self, tree_text: str, handle: int = None) -> SimElement:
+        """从`Control.tree()`的输出文本加载控件树，并作为顶层窗口挂到桌面下
+
+        Args:
+            tree_text (str): 控件树文本
+            handle (int): 窗口句柄，默认自动分配
+
+        Returns:
+            SimElement: 控件树的根节点
+        """
+        return self.add_window(parse_tree_text(tree_text, self), handle)
+
+    def load_file(self, path: str, handle: int = None, encoding: str = 'utf-8') -> SimElement:
+        """从文件加载控件树，例如wxauto_DEBUG_INIT.txt"""
+        with open(path, 'r', encoding=encoding) as f:
+            return self.load_tree(f.read(), handle)
+
+
+def _wait(seconds: float) -> None:
+    # time.sleep 的精度在毫秒级以下不可靠，短延迟使用忙等待
+    if seconds >= 0.002:
+        time.sleep(seconds)
+        return
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def parse_tree_line(line: str) -> Optional[dict]:
+    """解析控件树文本中的一行，无法解析时返回None"""
+    m = _LINE_PATTERN.match(line.lstrip(_TREE_PREFIX_CHARS))
+    if not m:
+        return None
+    rid = m.group('rid')
+    rect = m.group('rect')
+    return {
+        'control_type': m.group('type'),
+        'depth': int(m.group('depth')),
+        'class_name': m.group('cls'),
+        'name': m.group('name'),
+        'automation_id': m.group('aid'),
+        'runtime_id': (int(rid),) if rid.lstrip('-').isdigit() else None,
+        'rect': tuple(int(i) for i in rect.split(',')) if rect else (0, 0, 0, 0),
+    }
+
+
+def parse_tree_text(tree_text: str, client: SimulatedClient) -> SimElement:
+    """将`Control.tree()`的输出文本解析为SimElement树，返回根节点
+
+    文本中不属于控件树的行会被忽略，层级以每行记录的深度为准。
+    """
+    root = None
+    stack: List[SimElement] = []
+    for line in tree_text.splitlines():
+        info = parse_tree_line(line)
+        if info is None:
+            continue
+        depth = info.pop('depth')
+        control_type = CONTROL_TYPES.get(info.pop('control_type'), CONTROL_TYPES['CustomControl'])
+        element = SimElement(client, control_type, **info)
+        if root is None:
+            root = element
+            base = depth
+            stack = [root]
+            continue
+        level = depth - base
+        if level <= 0 or level > len(stack):
+            raise ValueError(f'控件树层级错误: {line}')
+        del stack[level:]
+        stack[-1].add_child(element)
+        stack.append(element)
+    if root is None:
+        raise ValueError('未找到任何控件')
+    return root
@@ -0,0 +1,238 @@
+# cython: language_level=3
+"""
+控件树快照
+
+`Control.snapshot()` 通过一次跨进程的缓存请求抓取整棵控件树，转换为不引用任何 COM 对象的只读结构，
+之后的遍历、查找、比较都在纯 Python 中完成，不再产生 COM 调用。
+
+快照按广度优先顺序存储节点，同一父节点的子节点在 `nodes` 中连续排列，
+节点通过 `first_child` / `child_count` 记录子节点范围。
+
+本模块只依赖标准库，快照可以被 pickle 后发送到其他进程中解析，也可以在两次轮询之间比较。
+
+Example:
+    >>> snap = msgbox.snapshot(max_depth=4, properties=('Name', 'ControlType', 'RuntimeId'))
+    >>> for item in snap.children(snap.root):
+    ...     print(item.control_type, item.name)
+"""
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+Rect = Tuple[int, int, int, int]
+
+
+class SnapshotNode(NamedTuple):
+    """快照中的一个控件，未抓取的属性为None"""
+    index: int
+    depth: int
+    parent: int  # 父节点序号，根节点为-1
+    first_child: int
+    child_count: int
+    control_type: str  # 控件类型名，例如'ListItemControl'
+    class_name: Optional[str]
+    name: Optional[str]
+    automation_id: Optional[str]
+    rect: Optional[Rect]  # (left, top, right, bottom)
+    runtime_id: Optional[Tuple[int, ...]]
+
+    @property
+    def runtimeid(self) -> Optional[str]:
+        """与 `Control.runtimeid` 相同格式的字符串"""
+        if self.runtime_id is None:
+            return None
+        return '-'.join(str(i) for i in self.runtime_id)
+
+    @property
+    def height(self) -> int:
+        return self.rect[3] - self.rect[1] if self.rect else 0
+
+    @property
+    def width(self) -> int:
+        return self.rect[2] - self.rect[0] if self.rect else 0
+
+
+class ControlSnapshot:
+    """只读的控件树快照
+
+    Args:
+        nodes (tuple): 按广度优先顺序排列的SnapshotNode，nodes[0]为根节点
+    """
+    __slots__ = ('nodes', '_levels')
+
+    def __init__(self, nodes: Tuple[SnapshotNode, ...]):
+        object.__setattr__(self, 'nodes', tuple(nodes))
+        object.__setattr__(self, '_levels', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('ControlSnapshot is immutable')
+
+    def __reduce__(self):
+        return (ControlSnapshot, (self.nodes,))
+
+    def __repr__(self) -> str:
+        return f'<ControlSnapshot nodes={len(self.nodes)} depth={self.depth}>'
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[SnapshotNode]:
+        return iter(self.nodes)
+
+    def __getitem__(self, index: int) -> SnapshotNode:
+        return self.nodes[index]
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ControlSnapshot) and self.nodes == other.nodes
+
+    def __hash__(self) -> int:
+        return hash(self.nodes)
+
+    @property
+    def root(self) -> SnapshotNode:
+        return self.nodes[0]
+
+    @property
+    def depth(self) -> int:
+        """最大深度，根节点深度为0"""
+        return self.nodes[-1].depth if self.nodes else 0
+
+    # ---------------------------------------- 遍历 ----------------------------------------
+    def children(self, node: SnapshotNode = None) -> Tuple[SnapshotNode, ...]:
+        """获取子节点，node为None时为根节点"""
+        node = self.root if node is None else node
+        return self.nodes[node.first_child:node.first_child + node.child_count]
+
+    def parent(self, node: SnapshotNode) -> Optional[SnapshotNode]:
+        if node.parent >= 0:
+            return self.nodes[node.parent]
+
+    def iter_descendants(self, node: SnapshotNode = None, max_depth: int = 0xFFFFFFFF) -> Iterator[SnapshotNode]:
+        """先序遍历后代节点，顺序与`Control.tree()`一致"""
+        node = self.root if node is None else node
+        stack = [(child, 1) for child in reversed(self.children(node))]
+        while stack:
+            child, depth = stack.pop()
+            yield child
+            if depth < max_depth and child.child_count:
+                stack.extend((c, depth + 1) for c in reversed(self.children(child)))
+
+    def level(self, depth: int) -> Tuple[SnapshotNode, ...]:
+        """获取某一深度的所有节点"""
+        levels = self._levels
+        if levels is None:
+            starts = []
+            for node in self.nodes:
+                if node.depth == len(starts):
+                    starts.append(node.index)
+            starts.append(len(self.nodes))
+            levels = tuple(self.nodes[starts[i]:starts[i + 1]] for i in range(len(starts) - 1))
+            object.__setattr__(self, '_levels', levels)
+        if -len(levels) <= depth < len(levels):
+            return levels[depth]
+        return ()
+
+    def progeny(self, depth: int, index: int = 0, control_type: str = None) -> Optional[SnapshotNode]:
+        """与`Control.GetProgenyControl`相同，获取第depth层的第index个节点"""
+        nodes = self.level(depth)
+        if control_type:
+            nodes = [n for n in nodes if n.control_type == control_type]
+        if -len(nodes) <= index < len(nodes):
+            return nodes[index]
+
+    def find_all(
+            self,
+            node: SnapshotNode = None,
+            control_type: str = None,
+            name: str = None,
+            class_name: str = None,
+            automation_id: str = None,
+            predicate: Callable[[SnapshotNode], bool] = None,
+            max_depth: int = 0xFFFFFFFF
+        ) -> List[SnapshotNode]:
+        """查找node的所有满足条件的后代节点"""
+        result = []
+        for n in self.iter_descendants(node, max_depth):
+            if (
+                (control_type is None or n.control_type == control_type)
+                and (name is None or n.name == name)
+                and (class_name is None or n.class_name == class_name)
+                and (automation_id is None or n.automation_id == automation_id)
+                and (predicate is None or predicate(n))
+            ):
+                result.append(n)
+        return result
+
+    def find(self, node: SnapshotNode = None, **kwargs) -> Optional[SnapshotNode]:
+        """查找第一个满足条件的后代节点，参数同`find_all`"""
+        result = self.find_all(node, **kwargs)
+        return result[0] if result else None
+
+    def texts(self, node: SnapshotNode = None, control_type: str = 'TextControl') -> List[str]:
+        """获取node下所有指定类型节点的非空Name"""
+        return [n.name for n in self.iter_descendants(node) if n.control_type == control_type and n.name]
+
+    # ---------------------------------------- 比较 ----------------------------------------
+    def diff(self, other: 'ControlSnapshot', node: SnapshotNode = None, other_node: SnapshotNode = None) -> Tuple[List[SnapshotNode], List[SnapshotNode]]:
+        """按RuntimeId比较两个快照中某节点的子节点
+
+        Returns:
+            tuple: (other中新增的子节点, other中被移除的子节点)
+        """
+        old = self.children(node)
+        new = other.children(other_node)
+        old_ids = {n.runtime_id for n in old}
+        new_ids = {n.runtime_id for n in new}
+        return (
+            [n for n in new if n.runtime_id not in old_ids],
+            [n for n in old if n.runtime_id not in new_ids],
+        )
+
+    def to_text(self) -> str:
+        """转换为与`Control.tree()`相同格式的文本，可以由`simulate.SimulatedClient.load_tree`加载"""
+        lines = []
+        nodes = [self.root] + list(self.iter_descendants())
+        for n in nodes:
+            rid = ''.join(str(i) for i in n.runtime_id) if n.runtime_id else ''
+            name = (n.name or '').replace('\n', '')
+            line = f'{"    " * n.depth}[{n.control_type} {n.depth}]("{n.class_name or ""}", "{name}", "{n.automation_id or ""}", "{rid}"'
+            if n.rect:
+                line += ', ({},{},{},{})'.format(*n.rect)
+            lines.append(line + ')')
+        return '\n'.join(lines) + '\n'
+
+
+def build_snapshot(
+        root: Any,
+        get_children: Callable[[Any], Iterable[Any]],
+        get_properties: Callable[[Any], tuple],
+        max_depth: int = 0xFFFFFFFF
+    ) -> ControlSnapshot:
+    """广度优先遍历构造快照
+
+    Args:
+        root: 根节点对象
+        get_children: 获取子节点对象的函数
+        get_properties: 获取节点属性的函数，
+            返回(control_type, class_name, name, automation_id, rect, runtime_id)
+        max_depth: 最大深度，根节点深度为0
+
+    Returns:
+        ControlSnapshot: 快照
+    """
+    items = [root]
+    parents = [-1]
+    depths = [0]
+    ranges = []
+    i = 0
+    while i < len(items):
+        start = len(items)
+        if depths[i] < max_depth:
+            for child in get_children(items[i]) or ():
+                items.append(child)
+                parents.append(i)
+                depths.append(depths[i] + 1)
+        ranges.append((start, len(items) - start))
+        i += 1
+    return ControlSnapshot(
+        SnapshotNode(i, depths[i], parents[i], ranges[i][0], ranges[i][1], *get_properties(item))
+        for i, item in enumerate(items)
+    )
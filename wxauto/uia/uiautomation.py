@@ -20,22 +20,36 @@ import datetime
 import re
 import random
 import threading
+import queue
+import atexit
+import functools
+import inspect
+import types
 import ctypes
-import _ctypes
 import ctypes.wintypes
-import comtypes #need pip install comtypes
-import comtypes.client
-import win32gui
-import win32api
-import win32con
-import win32ui
+if sys.platform == 'win32':
+    import comtypes #need pip install comtypes
+    import comtypes.client
+    import win32gui
+    import win32api
+    import win32con
+    import win32ui
+else:
+    # only the simulated backend is usable off Windows, see wxauto.uia.simulate and SetAutomationClient
+    comtypes = None
 import pyperclip
 from PIL import ImageGrab
 from typing import (Any, Callable, Dict, List, Iterable, Tuple)  # need pip install typing for Python3.4 or lower
 from .uiplug import *
+from .snapshot import ControlSnapshot, SnapshotNode, build_snapshot
 from hashlib import md5
 
-comtypes.CoInitialize()
+if comtypes:
+    comtypes.CoInitialize()
+    COMError = comtypes.COMError
+else:
+    class COMError(Exception):
+        """Placeholder of comtypes.COMError off Windows, never raised."""
 TreeNode = Any
 
 # print('uia done')
@@ -48,9 +62,15 @@ OPERATION_WAIT_TIME = 0.5
 MAX_PATH = 260
 DEBUG_SEARCH_TIME = False
 DEBUG_EXIST_DISAPPEAR = False
+NATIVE_SEARCH = True  # compile searchProperties into UIAutomation conditions and search with FindFirst/FindAll
+RUNTIMEID_HASH = False  # if True, Control.runtimeid is the md5 of size, Name and RuntimeId instead of the interned RuntimeId
+RUNTIMEID_TABLE_SIZE = 65536  # max count of interned runtime ids
+ELEMENT_CACHE = True  # reuse the elements found by Control.Exists from the roots added by AddElementCacheRoot, see ElementPathCache
+EVENT_WAIT = True  # wake the waits in Control.Exists, Control.Disappears and WaitFor by UIAutomation events, see UIEventHub
+EVENT_WAIT_MAX_INTERVAL = 0.1  # max polling interval seconds of the adaptive polling while no event arrives
 S_OK = 0
 
-IsNT6orHigher = os.sys.getwindowsversion().major >= 6
+IsNT6orHigher = sys.platform == 'win32' and sys.getwindowsversion().major >= 6
 ProcessTime = time.perf_counter  #this returns nearly 0 when first call it if python version <= 3.6
 ProcessTime()  # need to call it once if python version <= 3.6
 
@@ -62,7 +82,8 @@ try:
             if n >= max:
                 return node
             nn = '\n'
-            nodename = f"[{ele.ControlTypeName} {n}](\"{ele.ClassName}\", \"{ele.Name.replace(nn, '')}\", \"{ele.AutomationId}\", \"{''.join([str(i) for i in ele.GetRuntimeId()])}\")"
+            rect = ele.BoundingRectangle
+            nodename = f"[{ele.ControlTypeName} {n}](\"{ele.ClassName}\", \"{ele.Name.replace(nn, '')}\", \"{ele.AutomationId}\", \"{''.join([str(i) for i in ele.GetRuntimeId()])}\", ({rect.left},{rect.top},{rect.right},{rect.bottom}))"
             if not node:
                 node1 = Node(nodename)
             else:
@@ -136,6 +157,33 @@ class _AutomationClient:
 
         SetDpiAwareness(dpiAwarenessPerMonitor=True)
 
+    def GetAncestor(self, handle: int, flag: int) -> int:
+        """
+        Look up the ancestor of a native window, a simulated client provides the same method for its element tree.
+        handle: int, the handle of a native window.
+        flag: int, a value in class `GAFlag`.
+        Return int, a native window handle.
+        """
+        return GetAncestor(handle, flag)
+
+
+def SetAutomationClient(client=None) -> None:
+    """
+    Replace the automation client used by `Control` and the module functions.
+    client: an object which provides `IUIAutomation` and `ViewWalker`, such as `simulate.SimulatedClient`,
+            if None, the default COM client will be created on next use.
+    """
+    if client is not None and ComProfile.enabled:
+        client = _ProfiledClient(client)
+    _AutomationClient._instance = client
+    ElementCache.Invalidate()
+    UIEvents.Stop()
+
+
+def GetAutomationClient() -> '_AutomationClient':
+    """Return the automation client currently in use."""
+    return _AutomationClient.instance()
+
 
 class _DllClient:
     _instance = None
@@ -279,6 +327,17 @@ ControlTypeNames = {
 }
 
 
+# property name -> PropertyId, the properties can be prefetched by `Control.FindAllBuildCache`
+CACHED_PROPERTIES = {
+    'Name': 30005,
+    'ControlType': 30003,
+    'ClassName': 30012,
+    'AutomationId': 30011,
+    'BoundingRectangle': 30001,
+    'RuntimeId': 30000,
+}
+
+
 class PatternId:
     """
     PatternId from IUIAutomation.
@@ -360,12 +419,24 @@ PatternIdNames = {
 class TreeScope:
     Element = 1
     Children = 2
-    Parent = 4
-    Descendants = 8
+    Descendants = 4
+    Parent = 8
     Subtree = 7
     Ancestors = 16
     All = 31
 
+class EventId:
+    """
+    EventId from IUIAutomation, only the events used by `UIEventHub` are listed.
+    Refer https://docs.microsoft.com/en-us/windows/win32/winauto/uiauto-event-ids
+    """
+    MenuClosedEvent = 20007
+    MenuOpenedEvent = 20003
+    StructureChangedEvent = 20002
+    AutomationPropertyChangedEvent = 20004
+    Window_WindowClosedEvent = 20017
+    Window_WindowOpenedEvent = 20016
+
 class PropertyId:
     """
     PropertyId from IUIAutomation.
@@ -4045,7 +4116,7 @@ class ObjectModelPattern():
         """Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nn-uiautomationclient-iuiautomationobjectmodelpattern"""
         self.pattern = pattern
 
-    def GetUnderlyingObjectModel(self) -> ctypes.POINTER(comtypes.IUnknown):
+    def GetUnderlyingObjectModel(self) -> 'ctypes.POINTER(comtypes.IUnknown)':
         """
         Call IUIAutomationObjectModelPattern::GetUnderlyingObjectModel, todo.
         Return `ctypes.POINTER(comtypes.IUnknown)`, an interface used to access the underlying object model of the provider.
@@ -4680,7 +4751,7 @@ class TextRange():
         if textRange:
             return TextRange(textRange=textRange)
 
-    def GetAttributeValue(self, textAttributeId: int) -> ctypes.POINTER(comtypes.IUnknown):
+    def GetAttributeValue(self, textAttributeId: int) -> 'ctypes.POINTER(comtypes.IUnknown)':
         """
         Call IUIAutomationTextRange::GetAttributeValue.
         textAttributeId: int, a value in class `TextAttributeId`.
@@ -5344,15 +5415,1119 @@ PatternConstructors = {
 }
 
 
-def CreatePattern(patternId: int, pattern: ctypes.POINTER(comtypes.IUnknown)):
+def CreatePattern(patternId: int, pattern: 'ctypes.POINTER(comtypes.IUnknown)'):
     """Create a concreate pattern by pattern id and pattern(POINTER(IUnknown))."""
     subPattern = pattern.QueryInterface(GetPatternIdInterface(patternId))
     if subPattern:
         return PatternConstructors[patternId](pattern=subPattern)
 
 
+_NativeSearchProperties = {
+    'ControlType': PropertyId.ControlTypeProperty,
+    'ClassName': PropertyId.ClassNameProperty,
+    'AutomationId': PropertyId.AutomationIdProperty,
+    'Name': PropertyId.NameProperty,
+}
+
+
+_RuntimeIdTable = {}
+_RuntimeIdLock = threading.Lock()
+
+
+def InternRuntimeId(runtimeId: Iterable[int]) -> str:
+    """
+    Return str, the interned id of a runtime id, such as '42-1836952-4'.
+    The same runtime id always returns the same str object, so ids from different polls compare by reference.
+    """
+    key = tuple(runtimeId)
+    rid = _RuntimeIdTable.get(key)
+    if rid is None:
+        with _RuntimeIdLock:
+            rid = _RuntimeIdTable.get(key)
+            if rid is None:
+                if len(_RuntimeIdTable) >= RUNTIMEID_TABLE_SIZE:
+                    # drop the oldest quarter, dict keeps insertion order
+                    for oldKey in list(_RuntimeIdTable)[:RUNTIMEID_TABLE_SIZE // 4]:
+                        del _RuntimeIdTable[oldKey]
+                rid = '-'.join(map(str, key))
+                _RuntimeIdTable[key] = rid
+    return rid
+
+
+def _HashRuntimeId(control: 'Control') -> str:
+    content = control.Name
+    rect = control.CachedBoundingRectangle
+    hash_text = f'({rect.height()},{rect.width()}){content}{control.GetRuntimeId()}'
+    return md5(hash_text.encode()).hexdigest()
+
+
+def _GetElementDepth(element, root, maxDepth: int) -> int:
+    """
+    Return int, the depth of element under root, root's children is 1, or None if it is deeper than maxDepth.
+    """
+    client = _AutomationClient.instance()
+    depth = 0
+    while element and depth < maxDepth:
+        element = client.ViewWalker.GetParentElement(element)
+        depth += 1
+        if element and client.IUIAutomation.CompareElements(element, root):
+            return depth
+
+
+class ElementPathCache:
+    """
+    Cache of the elements found by `Control.Exists`, grouped by the native window which the search root lays in.
+    Only the searches from a long-lived root added by `AddElementCacheRoot` are cached,
+    the short-lived searches, such as the ones from a list item, cost more to record than they save.
+    An entry is keyed by the search root and the search properties, it stores the found element
+    and its child index path from the search root.
+    A hit is validated cheaply: the element must still be in the tree and its Name must still match,
+    if it is gone, the path is navigated again and the control there is checked with all search properties,
+    if that fails too, the entry is dropped and `Control.Exists` searches the tree as usual.
+    """
+    MaxEntries = 512  # per window
+    MaxSiblings = 64  # do not record a path if a control has more previous siblings than this
+
+    def __init__(self):
+        self._windows = {}  # {handle: {key: (element, path)}}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.renavigations = 0
+        self.misses = 0
+
+    @staticmethod
+    def _GetWindowHandle(element) -> int:
+        """Return the native window handle of element or of its nearest ancestor which has one, or 0."""
+        client = _AutomationClient.instance()
+        handle = element.CurrentNativeWindowHandle
+        while not handle:
+            element = client.ViewWalker.GetParentElement(element)
+            if not element:
+                break
+            handle = element.CurrentNativeWindowHandle
+        return handle or 0
+
+    def AddRoot(self, control: 'Control') -> None:
+        """
+        Cache the searches from control, control should live as long as the window, such as a window or a pane of it.
+        """
+        if '_elementCacheRoot' not in control.__dict__:
+            control._elementCacheRoot = None
+
+    @classmethod
+    def _GetRoot(cls, control: 'Control'):
+        """Return (handle, rootRuntimeId) of control's search root, or None if the search can not be cached."""
+        root = control.searchFromControl
+        if root is None or not root._element or 'Compare' in control.searchProperties:
+            return None
+        memo = root.__dict__.get('_elementCacheRoot', False)
+        if memo is False:
+            return None
+        if memo and memo[0] is root._element:
+            return memo[1], memo[2]
+        handle = cls._GetWindowHandle(root._element)
+        rootRuntimeId = tuple(root._element.GetRuntimeId())
+        root._elementCacheRoot = (root._element, handle, rootRuntimeId)
+        return handle, rootRuntimeId
+
+    @staticmethod
+    def _GetKey(control: 'Control', rootRuntimeId) -> tuple:
+        return (rootRuntimeId, control.searchDepth, control.foundIndex, tuple(sorted(control.searchProperties.items())))
+
+    @staticmethod
+    def _Match(control: 'Control', element, full: bool) -> bool:
+        """
+        Check whether element still matches control's searchProperties,
+        if full is False, only the properties which may change (Name, SubName, RegexName) are checked.
+        """
+        name = None
+        for key, value in control.searchProperties.items():
+            if key in ('Name', 'SubName', 'RegexName'):
+                if name is None:
+                    name = element.CurrentName or ''
+                if key == 'Name' and name != value:
+                    return False
+                if key == 'SubName' and value not in name:
+                    return False
+                if key == 'RegexName' and not control.regexName.match(name):
+                    return False
+            elif not full:
+                continue
+            elif key == 'ControlType' and element.CurrentControlType != value:
+                return False
+            elif key == 'ClassName' and element.CurrentClassName != value:
+                return False
+            elif key == 'AutomationId' and element.CurrentAutomationId != value:
+                return False
+        return True
+
+    @staticmethod
+    def _Navigate(rootElement, path: tuple):
+        walker = _AutomationClient.instance().ViewWalker
+        element = rootElement
+        for index in path:
+            element = walker.GetFirstChildElement(element)
+            for _ in range(index):
+                if not element:
+                    return None
+                element = walker.GetNextSiblingElement(element)
+            if not element:
+                return None
+        return element
+
+    def _GetPath(self, rootElement, element, maxDepth: int) -> tuple:
+        client = _AutomationClient.instance()
+        path = []
+        while not client.IUIAutomation.CompareElements(element, rootElement):
+            if len(path) >= maxDepth:
+                return None
+            index = 0
+            sibling = client.ViewWalker.GetPreviousSiblingElement(element)
+            while sibling:
+                index += 1
+                if index > self.MaxSiblings:
+                    return None
+                sibling = client.ViewWalker.GetPreviousSiblingElement(sibling)
+            path.append(index)
+            element = client.ViewWalker.GetParentElement(element)
+            if not element:
+                return None
+        return tuple(reversed(path))
+
+    def Lookup(self, control: 'Control'):
+        """
+        Return `ctypes.POINTER(IUIAutomationElement)` cached for control's search, or None.
+        """
+        root = self._GetRoot(control)
+        if root is None:
+            return None
+        handle, rootRuntimeId = root
+        key = self._GetKey(control, rootRuntimeId)
+        with self._lock:
+            entry = self._windows.get(handle, {}).get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        element, path = entry
+        client = _AutomationClient.instance()
+        try:
+            if client.ViewWalker.GetParentElement(element) and self._Match(control, element, False):
+                self.hits += 1
+                return element
+            if path is not None:
+                element = self._Navigate(control.searchFromControl._element, path)
+                if element and self._Match(control, element, True):
+                    with self._lock:
+                        self._windows.get(handle, {})[key] = (element, path)
+                    self.renavigations += 1
+                    return element
+        except COMError:
+            pass
+        with self._lock:
+            self._windows.get(handle, {}).pop(key, None)
+        self.misses += 1
+        return None
+
+    def Store(self, control: 'Control', element) -> None:
+        """
+        Store the element found by control's search.
+        """
+        root = self._GetRoot(control)
+        if root is None:
+            return
+        handle, rootRuntimeId = root
+        try:
+            path = self._GetPath(control.searchFromControl._element, element, min(control.searchDepth, 64))
+        except COMError:
+            path = None
+        with self._lock:
+            entries = self._windows.setdefault(handle, {})
+            if len(entries) >= self.MaxEntries:
+                del entries[next(iter(entries))]
+            entries[self._GetKey(control, rootRuntimeId)] = (element, path)
+
+    def Invalidate(self, handle: int = None) -> None:
+        """
+        Drop the cached elements in the window of handle, or all of them if handle is None.
+        """
+        with self._lock:
+            if handle is None:
+                self._windows.clear()
+            else:
+                self._windows.pop(handle, None)
+
+
+ElementCache = ElementPathCache()
+
+
+def InvalidateElementCache(handle: int = None) -> None:
+    """
+    Drop the elements cached by `Control.Exists` in the window of handle, or all of them if handle is None.
+    """
+    ElementCache.Invalidate(handle)
+
+
+def AddElementCacheRoot(control: 'Control') -> None:
+    """
+    Cache the elements found by `Control.Exists` when searching from control, see `ElementPathCache`.
+    control: `Control`, a control which lives as long as its window, such as the window itself.
+    """
+    ElementCache.AddRoot(control)
+
+
+class _UIEventSink:
+    """
+    Receive UIAutomation events and wake the waiters of `UIEventHub`,
+    or call onStructureChanged(changeType) instead for a sink created by `UIEventHub.Subscribe`.
+    """
+
+    def __init__(self, hub: 'UIEventHub', onStructureChanged: Callable[[int], None] = None):
+        super().__init__()
+        self._hub = hub
+        self._onStructureChanged = onStructureChanged
+
+    def HandleAutomationEvent(self, sender, eventId):
+        self._hub.Notify(eventId)
+
+    def HandleStructureChangedEvent(self, sender, changeType, runtimeId):
+        if self._onStructureChanged is not None:
+            self._onStructureChanged(changeType)
+        else:
+            self._hub.Notify(EventId.StructureChangedEvent)
+
+    def HandlePropertyChangedEvent(self, sender, propertyId, newValue):
+        self._hub.Notify(EventId.AutomationPropertyChangedEvent)
+
+
+def _CreateEventSink(hub: 'UIEventHub', core, onStructureChanged: Callable[[int], None] = None) -> _UIEventSink:
+    """
+    core: the comtypes module of UIAutomationCore.dll, None for a simulated client.
+    onStructureChanged: a function with one parameter changeType, see `_UIEventSink`.
+    Return a COM object implementing the event handler interfaces, or a plain `_UIEventSink` if core is None.
+    """
+    if core is None:
+        return _UIEventSink(hub, onStructureChanged)
+
+    class _COMEventSink(_UIEventSink, comtypes.COMObject):
+        _com_interfaces_ = [core.IUIAutomationEventHandler,
+                            core.IUIAutomationStructureChangedEventHandler,
+                            core.IUIAutomationPropertyChangedEventHandler]
+
+    return _COMEventSink(hub, onStructureChanged)
+
+
+class UIEventHub:
+    """
+    Wake the threads waiting in `Control.Exists`, `Control.Disappears`, `WaitFor` and `WaitForEvent`
+    when UIAutomation raises an event.
+    WindowOpened, WindowClosed, MenuOpened and MenuClosed are listened on the desktop,
+    StructureChanged and Name changed are listened on the windows passed to `Watch`.
+    `Subscribe` calls a function when the structure of a window changes, without waking the waiters.
+    For the COM client, the handlers are registered in a MTA thread, so the events are delivered while the waiting thread is blocked.
+    If the handlers can't be registered or the waited change raises no event, the waiters fall back to adaptive polling.
+    """
+    RootEvents = (EventId.Window_WindowOpenedEvent, EventId.Window_WindowClosedEvent,
+                  EventId.MenuOpenedEvent, EventId.MenuClosedEvent)
+    MaxWatchedWindows = 64
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._started = False
+        self._available = False
+        self._watched = set()
+        self._subscribers = {}  # {handle: callback}
+        self._subscriptions = {}  # {handle: (element, handler)}, only used in the thread registering the handlers
+        self._session = None  # (automation, core, sink) of a simulated client
+        self._requests = None  # queue of the window handles to watch, consumed by the MTA thread
+        self._thread = None
+        self.events = 0
+
+    @property
+    def Available(self) -> bool:
+        """Return bool, True if the event handlers are registered."""
+        return self._available
+
+    @property
+    def Generation(self) -> int:
+        """Return int, increased by every event."""
+        return self._generation
+
+    def Notify(self, eventId: int = 0) -> None:
+        """Wake all the waiters, called by the event handlers."""
+        with self._condition:
+            self._generation += 1
+            self.events += 1
+            self._condition.notify_all()
+
+    def Wait(self, generation: int, timeout: float) -> Tuple[int, bool]:
+        """
+        Block until an event arrives after generation or timeout seconds passed.
+        generation: int, got from `Generation`.
+        Return Tuple[int, bool], the current generation and whether an event arrived.
+        """
+        with self._condition:
+            if self._generation == generation and timeout > 0:
+                self._condition.wait(timeout)
+            return self._generation, self._generation != generation
+
+    def Start(self) -> bool:
+        """
+        Register the desktop event handlers if not registered.
+        Return bool, True if the events are available.
+        """
+        with self._lock:
+            if self._started:
+                return self._available
+            self._started = True
+        client = _AutomationClient.instance()
+        if getattr(client, 'UIAutomationCore', None) is None:
+            # a simulated client raises the events synchronously, no need of a MTA thread
+            core = None
+            sink = _CreateEventSink(self, core)
+            try:
+                self._AddRootHandlers(client.IUIAutomation, core, sink)
+            except AttributeError:
+                return False
+            self._session = (client.IUIAutomation, core, sink)
+            self._available = True
+        else:
+            ready = threading.Event()
+            self._requests = queue.Queue()
+            self._thread = threading.Thread(target=self._Run, args=(self._requests, ready), name='UIEventHub', daemon=True)
+            self._thread.start()
+            ready.wait(TIME_OUT_SECOND)
+        return self._available
+
+    def Stop(self) -> None:
+        """Remove all the event handlers, the waiters fall back to polling until `Start` is called again."""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+            self._available = False
+            self._watched.clear()
+            self._subscribers.clear()
+        session, self._session = self._session, None
+        if session:
+            session[0].RemoveAllEventHandlers()
+            self._subscriptions.clear()
+        requests, self._requests = self._requests, None
+        thread, self._thread = self._thread, None
+        if requests:
+            requests.put(None)
+            if thread is not threading.current_thread():
+                thread.join(1)
+        self.Notify()
+
+    def Watch(self, handle: int) -> None:
+        """Listen StructureChanged and Name changed events of the window of handle and its descendants."""
+        if not handle or not self._available:
+            return
+        with self._lock:
+            if handle in self._watched or len(self._watched) >= self.MaxWatchedWindows:
+                return
+            self._watched.add(handle)
+        if self._session:
+            self._AddWindowHandlers(*self._session, handle)
+        elif self._requests:
+            self._requests.put(handle)
+
+    def Subscribe(self, handle: int, callback: Callable[[int], None]) -> bool:
+        """
+        Call callback(changeType) when the structure of the window of handle or its descendants changes,
+        replace the previous callback of the same window.
+        The callback is called in the thread receiving the events, it should return quickly, such as setting a flag.
+        handle: int, a native window handle.
+        callback: a function with one parameter changeType, a value of StructureChangeType.
+        Return bool, True if the events are available, otherwise the caller should keep polling.
+        """
+        if not handle or not self.Start():
+            return False
+        with self._lock:
+            self._subscribers[handle] = callback
+        if self._session:
+            self._AddSubscription(*self._session[:2], handle)
+        elif self._requests:
+            self._requests.put(('subscribe', handle))
+        return True
+
+    def Unsubscribe(self, handle: int) -> None:
+        """Stop calling the callback passed to `Subscribe` for the window of handle."""
+        with self._lock:
+            if self._subscribers.pop(handle, None) is None:
+                return
+        if self._session:
+            self._RemoveSubscription(self._session[0], handle)
+        elif self._requests:
+            self._requests.put(('unsubscribe', handle))
+
+    def IsSubscribed(self, handle: int) -> bool:
+        """Return bool, True if the window of handle is subscribed and the events are available."""
+        return self._available and handle in self._subscribers
+
+    def _Dispatch(self, handle: int, changeType: int) -> None:
+        callback = self._subscribers.get(handle)
+        if callback is not None:
+            try:
+                callback(changeType)
+            except Exception:
+                pass
+
+    def _AddSubscription(self, automation, core, handle: int) -> None:
+        self._RemoveSubscription(automation, handle)
+        try:
+            element = automation.ElementFromHandle(handle)
+            if not element:
+                return
+            sink = _CreateEventSink(self, core, lambda changeType: self._Dispatch(handle, changeType))
+            handler = self._Interface(sink, core, 'IUIAutomationStructureChangedEventHandler')
+            automation.AddStructureChangedEventHandler(element, TreeScope.Subtree, None, handler)
+            self._subscriptions[handle] = (element, handler)
+        except Exception:
+            # the window may be closed, the subscriber keeps polling
+            pass
+
+    def _RemoveSubscription(self, automation, handle: int) -> None:
+        subscription = self._subscriptions.pop(handle, None)
+        if subscription is None:
+            return
+        try:
+            automation.RemoveStructureChangedEventHandler(*subscription)
+        except Exception:
+            pass
+
+    def WatchControl(self, control: 'Control') -> None:
+        """Watch the window which control is searched from."""
+        if control is None or not self._available:
+            return
+        root = control.searchFromControl
+        element = root._element if root is not None and root._element else control._element
+        if not element:
+            return
+        try:
+            self.Watch(ElementPathCache._GetWindowHandle(element))
+        except COMError:
+            pass
+
+    def _Run(self, requests: 'queue.Queue', ready: threading.Event) -> None:
+        comtypes.CoInitializeEx(comtypes.COINIT_MULTITHREADED)
+        automation = sink = None
+        try:
+            core = comtypes.client.GetModule("UIAutomationCore.dll")
+            automation = comtypes.client.CreateObject("{ff48dba4-60ef-4201-aa87-54103eef594e}", interface=core.IUIAutomation)
+            sink = _CreateEventSink(self, core)
+            self._AddRootHandlers(automation, core, sink)
+            self._available = True
+        except Exception:
+            # events are not available, the waiters keep polling
+            pass
+        finally:
+            ready.set()
+        if self._available:
+            while True:
+                request = requests.get()
+                if request is None:
+                    break
+                if isinstance(request, tuple):
+                    action, handle = request
+                    if action == 'subscribe':
+                        self._AddSubscription(automation, core, handle)
+                    else:
+                        self._RemoveSubscription(automation, handle)
+                else:
+                    self._AddWindowHandlers(automation, core, sink, request)
+            self._subscriptions.clear()
+            try:
+                automation.RemoveAllEventHandlers()
+            except Exception:
+                pass
+        automation = sink = None
+        comtypes.CoUninitialize()
+
+    @staticmethod
+    def _Interface(sink: _UIEventSink, core, name: str):
+        return sink if core is None else sink.QueryInterface(getattr(core, name))
+
+    def _AddRootHandlers(self, automation, core, sink: _UIEventSink) -> None:
+        root = automation.GetRootElement()
+        handler = self._Interface(sink, core, 'IUIAutomationEventHandler')
+        for eventId in self.RootEvents:
+            automation.AddAutomationEventHandler(eventId, root, TreeScope.Subtree, None, handler)
+
+    def _AddWindowHandlers(self, automation, core, sink: _UIEventSink, handle: int) -> None:
+        try:
+            element = automation.ElementFromHandle(handle)
+            if not element:
+                return
+            automation.AddStructureChangedEventHandler(element, TreeScope.Subtree, None,
+                                                       self._Interface(sink, core, 'IUIAutomationStructureChangedEventHandler'))
+            automation.AddPropertyChangedEventHandler(element, TreeScope.Subtree, None,
+                                                      self._Interface(sink, core, 'IUIAutomationPropertyChangedEventHandler'),
+                                                      [PropertyId.NameProperty])
+        except Exception:
+            # the window may be closed, its waiters keep polling
+            pass
+
+
+UIEvents = UIEventHub()
+atexit.register(UIEvents.Stop)
+
+
+class _EventWaiter:
+    """
+    Adaptive sleep of a wait loop.
+    The interval starts from interval, doubles up to maxInterval while no event arrives,
+    and is reset when `UIEvents` wakes the waiter.
+    A wake never comes sooner than minGap seconds after the sleep starts, default interval,
+    so a burst of events (a list scrolling, messages streaming in) is coalesced into one wake
+    and the loop never searches more often than the fixed interval polling.
+    """
+    __slots__ = ('control', 'minInterval', 'interval', 'maxInterval', 'minGap', 'generation')
+
+    def __init__(self, control: 'Control' = None, interval: float = SEARCH_INTERVAL, maxInterval: float = None,
+                 minGap: float = None):
+        self.control = control
+        self.minInterval = self.interval = interval
+        self.maxInterval = max(interval, EVENT_WAIT_MAX_INTERVAL if maxInterval is None else maxInterval)
+        self.minGap = interval if minGap is None else minGap
+        self.generation = None
+
+    def Sleep(self, remain: float) -> bool:
+        """
+        Sleep at most remain seconds.
+        Return bool, True if woken by an event.
+        """
+        if not EVENT_WAIT:
+            time.sleep(min(remain, self.minInterval))
+            return False
+        if self.generation is None:
+            if UIEvents.Start():
+                UIEvents.WatchControl(self.control)
+            self.generation = UIEvents.Generation
+        start = ProcessTime()
+        self.generation, woken = UIEvents.Wait(self.generation, min(remain, self.interval))
+        if woken:
+            self.interval = self.minInterval
+            gap = min(remain, self.minGap) - (ProcessTime() - start)
+            if gap > 0:
+                time.sleep(gap)
+                # the events arrived during the gap are covered by the next search
+                self.generation = UIEvents.Generation
+        else:
+            self.interval = min(self.interval * 2 or SEARCH_INTERVAL, self.maxInterval)
+        return woken
+
+
+def WaitFor(predicate: Callable[[], Any], timeout: float, control: 'Control' = None,
+            interval: float = SEARCH_INTERVAL, maxInterval: float = None) -> Any:
+    """
+    Call predicate until it returns a true value or timeout seconds passed,
+    between the calls, wait for UIAutomation events with adaptive polling, see `UIEventHub`.
+    predicate: a function with no parameter.
+    timeout: float.
+    control: `Control` or its subclass, also wake on the changes in the window which control is searched from.
+    interval: float, min polling interval seconds.
+    maxInterval: float, max polling interval seconds, default EVENT_WAIT_MAX_INTERVAL.
+    Return the last value returned by predicate.
+    """
+    waiter = _EventWaiter(control, interval, maxInterval)
+    start = ProcessTime()
+    while True:
+        result = predicate()
+        if result:
+            return result
+        remain = start + timeout - ProcessTime()
+        if remain <= 0:
+            return result
+        waiter.Sleep(remain)
+
+
+def WaitForEvent(timeout: float, control: 'Control' = None) -> bool:
+    """
+    Sleep timeout seconds, return earlier if a UIAutomation event arrives.
+    Use it instead of time.sleep in the loops which do something and check the result.
+    control: `Control` or its subclass, also wake on the changes in the window which control is searched from.
+    Return bool, True if woken by an event.
+    """
+    waiter = _EventWaiter(control, timeout, timeout, min(timeout, SEARCH_INTERVAL))
+    return waiter.Sleep(timeout)
+
+
+class _ProfiledObject:
+    """
+    Proxy of a COM object used while `ComProfile` is enabled,
+    every property read and method call is timed and recorded by name,
+    the COM objects returned are wrapped too, the proxies passed as arguments are unwrapped.
+    """
+    __slots__ = ('_target',)
+
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name: str):
+        target = self._target
+        if not ComProfile.enabled:
+            return getattr(target, name)
+        start = ProcessTime()
+        value = getattr(target, name)
+        if callable(value):
+            return _ProfiledMethod(name, value)
+        ComProfile.Record(name, ProcessTime() - start)
+        return _WrapComObject(value)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._target, name, _UnwrapComObject(value))
+
+    def __bool__(self) -> bool:
+        return bool(self._target)
+
+    def __eq__(self, other) -> bool:
+        return self._target == _UnwrapComObject(other)
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+    def __hash__(self) -> int:
+        return hash(self._target)
+
+    def __repr__(self) -> str:
+        return '<Profiled {!r}>'.format(self._target)
+
+
+def _WrapComObject(value):
+    # comtypes interface pointers have QueryInterface, the objects of the simulated client have _client
+    if value and not isinstance(value, _ProfiledObject) and (hasattr(value, 'QueryInterface') or hasattr(value, '_client')):
+        return _ProfiledObject(value)
+    return value
+
+
+def _UnwrapComObject(value):
+    return value._target if isinstance(value, _ProfiledObject) else value
+
+
+def _ProfiledMethod(name: str, method: Callable) -> Callable:
+    def call(*args, **kwargs):
+        args = [_UnwrapComObject(arg) for arg in args]
+        start = ProcessTime()
+        try:
+            return _WrapComObject(method(*args, **kwargs))
+        finally:
+            ComProfile.Record(name, ProcessTime() - start)
+    return call
+
+
+class _ProfiledClient:
+    """Wrap IUIAutomation and ViewWalker of an automation client with `_ProfiledObject`."""
+
+    def __init__(self, client):
+        self.client = client
+        self.IUIAutomation = _ProfiledObject(client.IUIAutomation)
+        self.ViewWalker = _ProfiledObject(client.ViewWalker)
+        self.UIAutomationCore = getattr(client, 'UIAutomationCore', None)
+
+    def __getattr__(self, name: str):
+        return getattr(self.client, name)
+
+
+class _ApiFrame:
+    __slots__ = ('profiler', 'name', 'start', 'comCalls', 'comSeconds', 'methods')
+
+    def __init__(self, profiler: 'ComProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.comCalls = 0
+        self.comSeconds = 0.0
+        self.methods = {}
+
+    def __enter__(self) -> '_ApiFrame':
+        self.profiler._GetStack().append(self)
+        self.start = ProcessTime()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        seconds = ProcessTime() - self.start
+        stack = self.profiler._GetStack()
+        if stack and stack[-1] is self:
+            stack.pop()
+        self.profiler._RecordApi(self, seconds)
+
+
+class ComProfiler:
+    """
+    Count and time the COM calls (property reads, tree navigation, FindAll, patterns...) made by `Control`,
+    and attribute them to the enclosing API call marked by `ProfileApi`, nested APIs are counted inclusively.
+    It is disabled by default and costs nothing until `EnableComProfiling` is called.
+    """
+    DurationBuckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)  # seconds
+    CountBuckets = (0, 10, 50, 100, 500, 1000, 5000)  # COM calls per API call
+    Unattributed = '<unattributed>'
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._methods = {}  # {method name: [count, seconds]}
+        self._apis = {}  # {api name: stats dict}
+        self._dumpStop = None
+
+    def _GetStack(self) -> List[_ApiFrame]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def Enable(self, dumpInterval: float = 0, dumpPath: str = None) -> None:
+        """
+        Start profiling.
+        dumpInterval: float, if > 0, dump the report every dumpInterval seconds, see `Dump`.
+        dumpPath: str, the file to append the report to, if None, print the report.
+        """
+        client = _AutomationClient.instance()
+        if not isinstance(client, _ProfiledClient):
+            _AutomationClient._instance = _ProfiledClient(client)
+        self.enabled = True
+        self._StopDump()
+        if dumpInterval > 0:
+            self._dumpStop = threading.Event()
+            threading.Thread(target=self._DumpLoop, args=(self._dumpStop, dumpInterval, dumpPath),
+                             name='ComProfiler', daemon=True).start()
+
+    def Disable(self) -> None:
+        """Stop profiling, the stats are kept until `Reset`."""
+        self.enabled = False
+        self._StopDump()
+        client = _AutomationClient._instance
+        if isinstance(client, _ProfiledClient):
+            _AutomationClient._instance = client.client
+
+    def Reset(self) -> None:
+        with self._lock:
+            self._methods = {}
+            self._apis = {}
+
+    def Api(self, name: str) -> _ApiFrame:
+        """
+        Return a context manager, the COM calls inside it are attributed to name.
+        """
+        return _ApiFrame(self, name)
+
+    def Record(self, method: str, seconds: float) -> None:
+        """Record a COM call, called by the proxies."""
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+        stack = getattr(self._local, 'stack', None)
+        if not stack:
+            stack = [_ApiFrame(self, self.Unattributed)]
+            self._RecordApi(stack[0], 0, count=False)
+        for frame in stack:
+            frame.comCalls += 1
+            frame.comSeconds += seconds
+            stats = frame.methods.get(method)
+            if stats is None:
+                stats = frame.methods[method] = [0, 0.0]
+            stats[0] += 1
+            stats[1] += seconds
+        if stack[0].name == self.Unattributed:
+            self._RecordApi(stack[0], seconds, count=False)
+
+    def _RecordApi(self, frame: _ApiFrame, seconds: float, count: bool = True) -> None:
+        with self._lock:
+            stats = self._apis.get(frame.name)
+            if stats is None:
+                stats = self._apis[frame.name] = {
+                    'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'com_calls': 0, 'com_seconds': 0.0,
+                    'duration_histogram': [0] * (len(self.DurationBuckets) + 1),
+                    'com_calls_histogram': [0] * (len(self.CountBuckets) + 1),
+                    'methods': {},
+                }
+            stats['com_calls'] += frame.comCalls
+            stats['com_seconds'] += frame.comSeconds
+            for method, (n, s) in frame.methods.items():
+                methodStats = stats['methods'].get(method)
+                if methodStats is None:
+                    methodStats = stats['methods'][method] = [0, 0.0]
+                methodStats[0] += n
+                methodStats[1] += s
+            if count:
+                stats['calls'] += 1
+                stats['seconds'] += seconds
+                stats['max_seconds'] = max(stats['max_seconds'], seconds)
+                stats['duration_histogram'][_BucketIndex(self.DurationBuckets, seconds)] += 1
+                stats['com_calls_histogram'][_BucketIndex(self.CountBuckets, frame.comCalls)] += 1
+
+    def GetStats(self) -> Dict[str, Any]:
+        """
+        Return Dict[str, Any], {
+            'methods': {method name: (count, seconds)},
+            'apis': {api name: {'calls', 'seconds', 'max_seconds', 'com_calls', 'com_seconds',
+                                'duration_histogram': {bucket label: count}, 'com_calls_histogram': {bucket label: count},
+                                'methods': {method name: (count, seconds)}}},
+        }
+        """
+        durationLabels = ['<={}ms'.format(int(b * 1000)) for b in self.DurationBuckets] + ['>{}ms'.format(int(self.DurationBuckets[-1] * 1000))]
+        countLabels = ['<={}'.format(b) for b in self.CountBuckets] + ['>{}'.format(self.CountBuckets[-1])]
+        with self._lock:
+            apis = {}
+            for name, stats in self._apis.items():
+                apis[name] = dict(stats,
+                                  duration_histogram=dict(zip(durationLabels, stats['duration_histogram'])),
+                                  com_calls_histogram=dict(zip(countLabels, stats['com_calls_histogram'])),
+                                  methods={k: tuple(v) for k, v in stats['methods'].items()})
+            return {'methods': {k: tuple(v) for k, v in self._methods.items()}, 'apis': apis}
+
+    def Format(self, top: int = 5) -> str:
+        """
+        top: int, how many most expensive methods to show for each api.
+        Return str, a text report.
+        """
+        stats = self.GetStats()
+        lines = ['{:<36}{:>8}{:>12}{:>12}{:>14}{:>14}'.format('api', 'calls', 'avg ms', 'max ms', 'avg com', 'com ms')]
+        for name, api in sorted(stats['apis'].items(), key=lambda item: -item[1]['com_seconds']):
+            calls = api['calls'] or 1
+            lines.append('{:<36}{:>8}{:>12.2f}{:>12.2f}{:>14.1f}{:>14.2f}'.format(
+                name, api['calls'], api['seconds'] * 1000 / calls, api['max_seconds'] * 1000,
+                api['com_calls'] / calls, api['com_seconds'] * 1000))
+            methods = sorted(api['methods'].items(), key=lambda item: -item[1][1])[:top]
+            for method, (count, seconds) in methods:
+                lines.append('    {:<32}{:>8}{:>12.2f}'.format(method, count, seconds * 1000))
+        return '\n'.join(lines)
+
+    def Dump(self, path: str = None) -> None:
+        """
+        Append the report to path, or print it if path is None.
+        """
+        text = '{} COM profile\n{}\n'.format(datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), self.Format())
+        if path:
+            with open(path, 'a', encoding='utf-8') as fout:
+                fout.write(text + '\n')
+        else:
+            Logger.WriteLine(text, writeToFile=False)
+
+    def _DumpLoop(self, stop: threading.Event, interval: float, path: str) -> None:
+        while not stop.wait(interval):
+            self.Dump(path)
+
+    def _StopDump(self) -> None:
+        if self._dumpStop:
+            self._dumpStop.set()
+            self._dumpStop = None
+
+
+def _BucketIndex(buckets: Tuple, value: float) -> int:
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            return i
+    return len(buckets)
+
+
+ComProfile = ComProfiler()
+
+
+def EnableComProfiling(enable: bool = True, dumpInterval: float = 0, dumpPath: str = None) -> None:
+    """
+    Enable or disable COM call profiling, see `ComProfiler`.
+    dumpInterval: float, if > 0, dump the report every dumpInterval seconds.
+    dumpPath: str, the file to append the report to, if None, print the report.
+    """
+    if enable:
+        ComProfile.Enable(dumpInterval, dumpPath)
+    else:
+        ComProfile.Disable()
+
+
+def GetComProfile() -> Dict[str, Any]:
+    """Return Dict[str, Any], see `ComProfiler.GetStats`."""
+    return ComProfile.GetStats()
+
+
+def ProfileApi(name: str = None) -> Callable:
+    """
+    Decorator, attribute the COM calls made in the decorated function to name.
+    name: str, default is the function's __qualname__.
+    """
+    def decorator(func: Callable) -> Callable:
+        apiName = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ComProfile.enabled:
+                return func(*args, **kwargs)
+            with ComProfile.Api(apiName):
+                return func(*args, **kwargs)
+        wrapper._profileApiFunc = func
+        return wrapper
+    return decorator
+
+
+def NoProfileApi(func: Callable) -> Callable:
+    """
+    Decorator, exclude a long-running or blocking method, such as a keep-alive loop, from `ProfileApis`,
+    its wall time would swamp the report, the COM calls made inside it are attributed to the APIs it calls.
+    """
+    func._noProfileApi = True
+    return func
+
+
+def ProfileApis(cls: type) -> type:
+    """
+    Class decorator, apply `ProfileApi` to all public methods of cls, including the inherited ones,
+    they are named ClassName.MethodName, the methods decorated by `NoProfileApi` are skipped.
+    """
+    for name in dir(cls):
+        if name.startswith('_'):
+            continue
+        attr = inspect.getattr_static(cls, name)
+        if not isinstance(attr, types.FunctionType):
+            continue
+        func = getattr(attr, '_profileApiFunc', attr)
+        if getattr(func, '_noProfileApi', False):
+            setattr(cls, name, func)
+            continue
+        setattr(cls, name, ProfileApi('{}.{}'.format(cls.__name__, name))(func))
+    return cls
+
+
+def _CreateCacheRequest(properties: Iterable[str], treeScope: int = TreeScope.Element):
+    """
+    properties: Iterable[str], property names in `CACHED_PROPERTIES`.
+    treeScope: int, a value in class `TreeScope`, if it includes Children or Descendants,
+               the cached children can be read by IUIAutomationElement::GetCachedChildren in the raw view.
+    Return IUIAutomationCacheRequest.
+    """
+    client = _AutomationClient.instance()
+    cacheRequest = client.IUIAutomation.CreateCacheRequest()
+    for name in properties:
+        cacheRequest.AddProperty(CACHED_PROPERTIES[name])
+    if treeScope != TreeScope.Element:
+        cacheRequest.TreeScope = treeScope
+        cacheRequest.TreeFilter = client.IUIAutomation.CreateTrueCondition()  # raw view, same as GetChildren
+    return cacheRequest
+
+
+def _ReadCachedProperties(element, properties: Iterable[str]) -> Dict[str, Any]:
+    """
+    Read the cached properties of an element fetched with a cache request.
+    Return Dict[str, Any], {property name: value}, BoundingRectangle is a `Rect`, RuntimeId is a list.
+    """
+    cache = {}
+    for name in properties:
+        if name == 'Name':
+            cache[name] = element.CachedName or ''
+        elif name == 'ControlType':
+            cache[name] = element.CachedControlType
+        elif name == 'ClassName':
+            cache[name] = element.CachedClassName
+        elif name == 'AutomationId':
+            cache[name] = element.CachedAutomationId
+        elif name == 'BoundingRectangle':
+            rect = element.CachedBoundingRectangle
+            cache[name] = Rect(rect.left, rect.top, rect.right, rect.bottom)
+        elif name == 'RuntimeId':
+            cache[name] = list(element.GetCachedPropertyValue(PropertyId.RuntimeIdProperty))
+    return cache
+
+
+def _GetCachedChildren(element) -> list:
+    """Return list, the cached children elements of an element fetched with a cache request."""
+    children = element.GetCachedChildren()
+    if not children:
+        return []
+    return [children.GetElement(i) for i in range(children.Length)]
+
+
+def _GetCachedProgeny(element, properties: Tuple[str, ...]) -> List[Tuple['Control', int]]:
+    """Return List[Tuple[Control, int]], the cached progeny of an element in preorder with their depth."""
+    progeny = []
+    stack = [(e, 1) for e in reversed(_GetCachedChildren(element))]
+    while stack:
+        element, depth = stack.pop()
+        control = Control.CreateControlFromCachedElement(element, properties)
+        if control is not None:
+            progeny.append((control, depth))
+        stack.extend((e, depth + 1) for e in reversed(_GetCachedChildren(element)))
+    return progeny
+
+
+class ProgenySnapshot:
+    """
+    All progeny controls of a control captured by one `BuildUpdatedCache` call,
+    the tree is walked breadth first in the cache, so no more cross-process call is needed.
+    The controls are indexed by depth and by (depth, ControlType), see `Control.GetAllProgeny`.
+    """
+    __slots__ = ('levels', '_typed')
+
+    def __init__(self, levels: List[List['Control']]):
+        """
+        levels: List[List[Control]], levels[depth] is the list of controls in that depth, levels[0] is the top control.
+        """
+        self.levels = levels
+        self._typed = {}
+        for depth, controls in enumerate(levels):
+            for control in controls:
+                self._typed.setdefault((depth, control.ControlType), []).append(control)
+
+    @staticmethod
+    def Capture(control: 'Control', properties: Iterable[str] = None) -> 'ProgenySnapshot':
+        """
+        control: `Control` or its subclass.
+        properties: Iterable[str], property names in `CACHED_PROPERTIES` to prefetch, default is all of them.
+        Return `ProgenySnapshot`.
+        """
+        properties = tuple(properties) if properties else tuple(CACHED_PROPERTIES)
+        if 'ControlType' not in properties:
+            properties += ('ControlType',)
+        cacheRequest = _CreateCacheRequest(properties, TreeScope.Subtree)
+        elements = [control.Element.BuildUpdatedCache(cacheRequest)]
+        levels = [[control]]
+        while elements:
+            nextElements = []
+            controls = []
+            for element in elements:
+                for child in _GetCachedChildren(element):
+                    childControl = Control.CreateControlFromCachedElement(child, properties)
+                    if childControl:
+                        nextElements.append(child)
+                        controls.append(childControl)
+            if controls:
+                levels.append(controls)
+            elements = nextElements
+        return ProgenySnapshot(levels)
+
+    def GetLevel(self, depth: int) -> List['Control']:
+        """
+        depth: int, starts with 0, can be negative.
+        Return List[Control], empty if depth is out of range.
+        """
+        if -len(self.levels) <= depth < len(self.levels):
+            return self.levels[depth]
+        return []
+
+    def Get(self, depth: int, index: int = 0, controlType: int = None) -> 'Control':
+        """
+        depth: int, starts with 0, can be negative.
+        index: int, starts with 0, can be negative.
+        controlType: int, a value in class `ControlType`, if not None, only count the controls of this type.
+        Return `Control` subclass or None.
+        """
+        if depth < 0:
+            depth += len(self.levels)
+        if controlType is None:
+            controls = self.GetLevel(depth)
+        else:
+            controls = self._typed.get((depth, controlType), [])
+        if -len(controls) <= index < len(controls):
+            return controls[index]
+
+
 class Control():
     ValidKeys = set(['ControlType', 'ClassName', 'AutomationId', 'Name', 'SubName', 'RegexName', 'Depth', 'Compare'])
+    _cache = None  # properties prefetched by FindAllBuildCache, {property name: value}
     def __init__(self, searchFromControl: 'Control' = None, searchDepth: int = 0xFFFFFFFF, searchInterval: float = SEARCH_INTERVAL, foundIndex: int = 1, element=None, **searchProperties):
         """
         searchFromControl: `Control` or its subclass, if it is None, search from root control(Desktop).
@@ -5416,6 +6591,26 @@ class Control():
             else:
                 Logger.WriteLine("element.CurrentControlType returns {}, invalid ControlType!".format(controlType), ConsoleColor.Red)  #rarely happens
 
+    @staticmethod
+    def CreateControlFromCachedElement(element, properties: Iterable[str]) -> 'Control':
+        """
+        Create a concreate `Control` from a com type `IUIAutomationElement` fetched with a cache request.
+        element: `ctypes.POINTER(IUIAutomationElement)`.
+        properties: Iterable[str], cached property names in `CACHED_PROPERTIES`.
+        Return a subclass of `Control`, an instance of the control's real type.
+        """
+        if not element:
+            return
+        cache = _ReadCachedProperties(element, properties)
+        controlType = cache['ControlType'] if 'ControlType' in cache else element.CurrentControlType
+        if controlType not in ControlConstructors:
+            Logger.WriteLine("element.CachedControlType returns {}, invalid ControlType!".format(controlType), ConsoleColor.Red)
+            return
+        control = ControlConstructors[controlType](element=element)
+        control._controlType = controlType
+        control._cache = cache
+        return control
+
     @staticmethod
     def CreateControlFromControl(control: 'Control') -> 'Control':
         """
@@ -5448,11 +6643,15 @@ class Control():
         #     pass
 
     @property
-    def runtimeid(self):
-        content = self.Name
-        rect = self.BoundingRectangle
-        hash_text = f'({rect.height()},{rect.width()}){content}{self.GetRuntimeId()}'
-        return md5(hash_text.encode()).hexdigest()
+    def runtimeid(self) -> str:
+        """
+        Property runtimeid.
+        Return str, the interned RuntimeId, see `InternRuntimeId`,
+        or the md5 of size, Name and RuntimeId if RUNTIMEID_HASH is True.
+        """
+        if RUNTIMEID_HASH:
+            return _HashRuntimeId(self)
+        return InternRuntimeId(self.GetRuntimeId())
 
     def SetSearchFromControl(self, searchFromControl: 'Control') -> None:
         """searchFromControl: `Control` or its subclass"""
@@ -5498,7 +6697,6 @@ class Control():
     #CachedAriaProperties
     #CachedAriaRole
     #CachedAutomationId
-    #CachedBoundingRectangle
     #CachedClassName
     #CachedControlType
     #CachedControllerFor
@@ -5569,6 +6767,8 @@ class Control():
         Call IUIAutomationElement::get_CurrentAutomationId.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-get_currentautomationid
         """
+        if self._cache and 'AutomationId' in self._cache:
+            return self._cache['AutomationId']
         return self.Element.CurrentAutomationId
 
     @property
@@ -5584,6 +6784,18 @@ class Control():
         """
         rect = self.Element.CurrentBoundingRectangle
         return Rect(rect.left, rect.top, rect.right, rect.bottom)
+
+    @property
+    def CachedBoundingRectangle(self) -> Rect:
+        """
+        Property CachedBoundingRectangle.
+        Return `Rect` prefetched by `FindAllBuildCache`, or `BoundingRectangle` if it was not prefetched.
+        The position goes stale once the control is scrolled, use it for the size or the layout at fetch time,
+        and use `BoundingRectangle` before clicking.
+        """
+        if self._cache and 'BoundingRectangle' in self._cache:
+            return self._cache['BoundingRectangle']
+        return self.BoundingRectangle
     
     # def ScreenShot(self, savePath: str=None, return_img=False) -> str:
     #     """
@@ -5652,6 +6864,8 @@ class Control():
         Call IUIAutomationElement::get_CurrentClassName.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-get_currentclassname
         """
+        if self._cache and 'ClassName' in self._cache:
+            return self._cache['ClassName']
         return self.Element.CurrentClassName
 
     @property
@@ -5826,6 +7040,8 @@ class Control():
         Call IUIAutomationElement::get_CurrentName.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-get_currentname
         """
+        if self._cache and 'Name' in self._cache:
+            return self._cache['Name']
         return self.Element.CurrentName or ''   # CurrentName may be None
 
     @property
@@ -5897,10 +7113,153 @@ class Control():
             for i in range(result.Length)
         ]
         return sub_controls
-    #FindAllBuildCache
+
+    def FindAllBuildCache(
+            self,
+            find_mode: Literal['All', 'Ancestors', 'Descendants', 'Children', 'Subtree', 'Parent']='Children',
+            control_type: str=None,
+            properties: Iterable[str]=None,
+        ) -> List['Control']:
+        """
+        Call IUIAutomationElement::FindAllBuildCache.
+        Find controls and prefetch their properties in one cross-process call,
+        reading a prefetched property of the returned controls does not call COM again,
+        the prefetched BoundingRectangle is read by `CachedBoundingRectangle`.
+        properties: Iterable[str], property names in `CACHED_PROPERTIES`, default is all of them.
+        Return List[Control], the cached values are snapshots at the time of this call.
+        Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-findallbuildcache
+        """
+        client = _AutomationClient.instance()
+        tree_scope = getattr(TreeScope, find_mode)
+        if control_type:
+            condition = client.IUIAutomation.CreatePropertyCondition(
+                PropertyId.ControlTypeProperty,
+                getattr(ControlType, control_type)
+            )
+        else:
+            condition = client.IUIAutomation.CreateTrueCondition()
+        properties = tuple(properties) if properties else tuple(CACHED_PROPERTIES)
+        cache_request = _CreateCacheRequest(properties)
+        result = self.Element.FindAllBuildCache(tree_scope, condition, cache_request)
+        return [
+            Control.CreateControlFromCachedElement(result.GetElement(i), properties)
+            for i in range(result.Length)
+        ]
+
     #FindFirst
     #FindFirstBuildCache
-    #GetCachedChildren
+
+    def GetCachedChildren(self) -> List['Control']:
+        """
+        Same as `GetChildren`, but fetch all children with Name, ControlType, ClassName, BoundingRectangle
+        and RuntimeId prefetched in one call instead of walking siblings one by one.
+        Return List[Control], a list of `Control` subclasses.
+        """
+        return self.FindAllBuildCache('Children')
+
+    def GetChildrenRuntimeIds(self) -> Tuple[str, ...]:
+        """
+        Return Tuple[str, ...], `runtimeid` of all children computed from one `FindAllBuildCache` call.
+        """
+        properties = ('ControlType', 'RuntimeId')
+        if RUNTIMEID_HASH:
+            properties += ('Name', 'BoundingRectangle')
+        return tuple(child.runtimeid for child in self.FindAllBuildCache('Children', properties=properties))
+
+    def GetChildrenRuntimeIdsAndNames(self) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+        """
+        Return Tuple[Tuple[str, ...], Tuple[str, ...]], (`runtimeid` of all children, Name of all children)
+               computed from one `FindAllBuildCache` call.
+        A re-rendered child gets a new `runtimeid` but keeps its Name, comparing the names tells it from a new child.
+        """
+        properties = ('ControlType', 'RuntimeId', 'Name')
+        if RUNTIMEID_HASH:
+            properties += ('BoundingRectangle',)
+        children = self.FindAllBuildCache('Children', properties=properties)
+        return tuple(child.runtimeid for child in children), tuple(child.Name for child in children)
+
+    def GetChildrenSignature(self) -> Tuple[str, str, Any, Any]:
+        """
+        Return a cheap signature of the children with a constant number of calls however many children there are,
+        the children are very likely unchanged if the signature is unchanged.
+        There is no child count property in UIAutomation, counting costs as much as `GetChildrenRuntimeIds`,
+        so the first child and the vertical view size stand in for it,
+        a child inserted in the middle of a scrollable list grows the content and shrinks the view size.
+        Return Tuple[str, str, Any, Any], (`runtimeid` of the first child, `runtimeid` of the last child,
+               ScrollVerticalScrollPercentProperty and ScrollVerticalViewSizeProperty of this control),
+               the runtimeid is None if there is no child.
+        """
+        properties = ('ControlType', 'RuntimeId')
+        if RUNTIMEID_HASH:
+            properties += ('Name', 'BoundingRectangle')
+        cacheRequest = _CreateCacheRequest(properties)
+        walker = _AutomationClient.instance().ViewWalker
+        first = Control.CreateControlFromCachedElement(walker.GetFirstChildElementBuildCache(self.Element, cacheRequest), properties)
+        last = Control.CreateControlFromCachedElement(walker.GetLastChildElementBuildCache(self.Element, cacheRequest), properties)
+        scroll = self.Element.GetCurrentPropertyValue(PropertyId.ScrollVerticalScrollPercentProperty)
+        viewSize = self.Element.GetCurrentPropertyValue(PropertyId.ScrollVerticalViewSizeProperty)
+        return (first.runtimeid if first else None, last.runtimeid if last else None, scroll, viewSize)
+
+    def GetCachedChildrenWithProgeny(self, properties: Iterable[str] = None) -> List[Tuple['Control', List[Tuple['Control', int]]]]:
+        """
+        Fetch all progeny with properties prefetched in one `BuildUpdatedCache` call, and group them by child,
+        reading a prefetched property of the returned controls does not call COM again.
+        properties: Iterable[str], property names in `CACHED_PROPERTIES`, default is all of them.
+        Return List[Tuple[Control, List[Tuple[Control, int]]]], [(child, [(progeny, depth), ...]), ...],
+               the progeny of each child are in preorder and the child itself is in depth 0.
+        """
+        properties = tuple(properties) if properties else tuple(CACHED_PROPERTIES)
+        root = self.Element.BuildUpdatedCache(_CreateCacheRequest(properties, TreeScope.Subtree))
+        result = []
+        for element in _GetCachedChildren(root):
+            child = Control.CreateControlFromCachedElement(element, properties)
+            if child is None:
+                continue
+            result.append((child, _GetCachedProgeny(element, properties)))
+        return result
+
+    def GetCachedProgeny(self, properties: Iterable[str] = None) -> Tuple['Control', List[Tuple['Control', int]]]:
+        """
+        Same as one item of `GetCachedChildrenWithProgeny`, but only fetch the subtree of this control.
+        properties: Iterable[str], property names in `CACHED_PROPERTIES`, default is all of them.
+        Return Tuple[Control, List[Tuple[Control, int]]], (control, [(progeny, depth), ...]),
+               control is a new `Control` of this element with properties prefetched.
+        """
+        properties = tuple(properties) if properties else tuple(CACHED_PROPERTIES)
+        root = self.Element.BuildUpdatedCache(_CreateCacheRequest(properties, TreeScope.Subtree))
+        return Control.CreateControlFromCachedElement(root, properties), _GetCachedProgeny(root, properties)
+
+    def snapshot(self, max_depth: int = 0xFFFFFFFF, properties: Iterable[str] = None) -> ControlSnapshot:
+        """
+        Capture this control and its progeny in one `BuildUpdatedCache` call,
+        and convert them to a `ControlSnapshot` which holds no COM object.
+        The whole subtree is cached by UIAutomation, max_depth only limits the nodes kept in the snapshot.
+        max_depth: int, max depth of the snapshot, this control is in depth 0.
+        properties: Iterable[str], property names in `CACHED_PROPERTIES`, default is all of them,
+                    ControlType is always captured, the properties not captured are None in the snapshot.
+        Return `ControlSnapshot`.
+        """
+        properties = tuple(properties) if properties else tuple(CACHED_PROPERTIES)
+        if 'ControlType' not in properties:
+            properties += ('ControlType',)
+        scope = TreeScope.Element if max_depth <= 0 else TreeScope.Subtree
+        root = self.Element.BuildUpdatedCache(_CreateCacheRequest(properties, scope))
+
+        def getProperties(element) -> tuple:
+            cache = _ReadCachedProperties(element, properties)
+            rect = cache.get('BoundingRectangle')
+            runtimeId = cache.get('RuntimeId')
+            return (
+                ControlTypeNames.get(cache['ControlType'], 'Control'),
+                cache.get('ClassName'),
+                cache.get('Name'),
+                cache.get('AutomationId'),
+                (rect.left, rect.top, rect.right, rect.bottom) if rect is not None else None,
+                tuple(runtimeId) if runtimeId is not None else None,
+            )
+
+        return build_snapshot(root, _GetCachedChildren, getProperties, max_depth)
+
     #GetCachedParent
     #GetCachedPattern
     #GetCachedPatternAs
@@ -5929,7 +7288,7 @@ class Control():
                 subPattern = CreatePattern(patternId, pattern)
                 self._supportedPatterns[patternId] = subPattern
                 return subPattern
-        except comtypes.COMError as ex:
+        except COMError as ex:
             pass
 
     def GetPatternAs(self, patternId: int, riid):
@@ -5967,6 +7326,8 @@ class Control():
         Return List[int], a list of int.
         Refer https://docs.microsoft.com/en-us/windows/desktop/api/uiautomationclient/nf-uiautomationclient-iuiautomationelement-getruntimeid
         """
+        if self._cache and 'RuntimeId' in self._cache:
+            return self._cache['RuntimeId']
         return self.Element.GetRuntimeId()
 
     #QueryInterface
@@ -5979,7 +7340,7 @@ class Control():
         """
         try:
             return self.Element.SetFocus() == S_OK
-        except comtypes.COMError as ex:
+        except COMError as ex:
             return False
 
     @property
@@ -5990,6 +7351,8 @@ class Control():
         """
         if not self._element:
             self.Refind(maxSearchSeconds=TIME_OUT_SECOND, searchIntervalSeconds=self.searchInterval)
+        if ComProfile.enabled:
+            return _WrapComObject(self._element)
         return self._element
 
     @property
@@ -6124,26 +7487,23 @@ class Control():
         else:
             return None
         
+    def GetProgenySnapshot(self, refresh=False) -> ProgenySnapshot:
+        """
+        Get the `ProgenySnapshot` of this control, it is captured once and shared by
+        `GetAllProgeny` and `GetProgenyControl` until refresh is True.
+        Return `ProgenySnapshot`.
+        """
+        progeny = self.__dict__.get('_progeny')
+        if progeny is None or refresh:
+            progeny = self._progeny = ProgenySnapshot.Capture(self)
+        return progeny
+
     def GetAllProgeny(self, refresh=False) -> List[List['Control']]:
         """
         Get all progeny controls.
         Return List[List[Control]], a list of list of `Control` subclasses.
         """
-        if hasattr(self, '_progeny') and not refresh:
-            return self._progeny
-        all_elements = []
-
-        def find_all_elements(element, depth=0):
-            children = element.GetChildren()
-            if depth == len(all_elements):
-                all_elements.append([])
-            all_elements[depth].append(element)
-            for child in children:
-                find_all_elements(child, depth+1)
-            return all_elements
-        
-        self._progeny = find_all_elements(self)
-        return self._progeny
+        return self.GetProgenySnapshot(refresh).levels
     
     def GetProgenyControl(self, depth: int=1, index: int=0, control_type: str = None, refresh=False) -> 'Control':
         """
@@ -6153,15 +7513,8 @@ class Control():
         control_type: `Control` or its subclass, if not None, only return the nth control that matches the control_type.
         Return `Control` subclass or None.
         """
-        progeny = self.GetAllProgeny(refresh)
-        try:
-            controls = progeny[depth]
-            if control_type:
-                controls = [child for child in controls if child.ControlTypeName == control_type]
-            if index < len(controls):
-                return controls[index]
-        except IndexError:
-            return
+        progeny = self.GetProgenySnapshot(refresh)
+        return progeny.Get(depth, index, getattr(ControlType, control_type) if control_type else None)
 
     def GetChildren(self) -> List['Control']:
         """
@@ -6208,11 +7561,65 @@ class Control():
                     return False
         return True
 
+    def _GetSearchCondition(self):
+        """
+        Compile ControlType, ClassName, AutomationId and Name in searchProperties into a native condition.
+        Return `IUIAutomationCondition`, or None if the search must walk the tree in Python,
+        that is NATIVE_SEARCH is False, Compare is used, or only SubName/RegexName/Depth are given.
+        """
+        if not NATIVE_SEARCH or 'Compare' in self.searchProperties:
+            return None
+        automation = _AutomationClient.instance().IUIAutomation
+        condition = None
+        for key, value in self.searchProperties.items():
+            propertyId = _NativeSearchProperties.get(key)
+            if propertyId is None:
+                continue
+            subCondition = automation.CreatePropertyCondition(propertyId, value)
+            condition = subCondition if condition is None else automation.CreateAndCondition(condition, subCondition)
+        return condition
+
+    def _FindElement(self, condition) -> 'IUIAutomationElement':
+        """
+        Find the element with the native condition built by `_GetSearchCondition`,
+        SubName, RegexName, Depth, searchDepth and foundIndex are applied on the candidates in tree order.
+        Return `ctypes.POINTER(IUIAutomationElement)` or None.
+        """
+        if self.searchDepth <= 0:
+            return None
+        root = (self.searchFromControl or GetRootControl()).Element
+        scope = TreeScope.Children if self.searchDepth == 1 else TreeScope.Descendants
+        checkDepth = 1 < self.searchDepth < 0xFFFFFFFF or 'Depth' in self.searchProperties
+        checkName = 'SubName' in self.searchProperties or 'RegexName' in self.searchProperties
+        if self.foundIndex == 1 and not checkDepth and not checkName:
+            return root.FindFirst(scope, condition)
+        elements = root.FindAll(scope, condition)
+        foundCount = 0
+        for i in range(elements.Length):
+            element = elements.GetElement(i)
+            if checkName:
+                name = element.CurrentName or ''
+                if 'SubName' in self.searchProperties and self.searchProperties['SubName'] not in name:
+                    continue
+                if self.regexName and not self.regexName.match(name):
+                    continue
+            if checkDepth:
+                depth = _GetElementDepth(element, root, self.searchDepth)
+                if depth is None:
+                    continue
+                if 'Depth' in self.searchProperties and depth != self.searchProperties['Depth']:
+                    continue
+            foundCount += 1
+            if foundCount == self.foundIndex:
+                return element
+
     def Exists(self, maxSearchSeconds: float = 5, searchIntervalSeconds: float = SEARCH_INTERVAL, printIfNotExist: bool = False) -> bool:
         """
         maxSearchSeconds: float
         searchIntervalSeconds: float
         Find control every searchIntervalSeconds seconds in maxSearchSeconds seconds.
+        If EVENT_WAIT is True, find again as soon as a UIAutomation event arrives but not sooner than searchIntervalSeconds,
+        and the interval grows up to EVENT_WAIT_MAX_INTERVAL while no event arrives, see `UIEventHub`.
         Return bool, True if find
         """
         if self._element and self._elementDirectAssign:
@@ -6238,17 +7645,35 @@ class Control():
             if printIfNotExist or DEBUG_EXIST_DISAPPEAR:
                 Logger.ColorfullyLog(self.GetColorfulSearchPropertiesStr() + '<Color=Red> does not exist.</Color>')
             return False
+        if ELEMENT_CACHE:
+            element = ElementCache.Lookup(self)
+            if element:
+                self._element = element
+                return True
         startTime2 = ProcessTime()
         if DEBUG_SEARCH_TIME:
             startDateTime = datetime.datetime.now()
+        condition = self._GetSearchCondition()
+        waiter = _EventWaiter(self, searchIntervalSeconds)
         while True:
             try:
-                control = FindControl(self.searchFromControl, self._CompareFunction, self.searchDepth, False, self.foundIndex)
-            except _ctypes.COMError:
+                if condition is not None:
+                    element = self._FindElement(condition)
+                    if element:
+                        self._element = element
+                        if ELEMENT_CACHE:
+                            ElementCache.Store(self, element)
+                        return True
+                    control = None
+                else:
+                    control = FindControl(self.searchFromControl, self._CompareFunction, self.searchDepth, False, self.foundIndex)
+            except COMError:
                 return False
             if control:
                 self._element = control.Element
                 control._element = 0  # control will be destroyed, but the element needs to be stroed in self._element
+                if ELEMENT_CACHE:
+                    ElementCache.Store(self, self._element)
                 if DEBUG_SEARCH_TIME:
                     Logger.ColorfullyLog('{} TraverseControls: <Color=Cyan>{}</Color>, SearchTime: <Color=Cyan>{:.3f}</Color>s[{} - {}]'.format(
                         self.GetColorfulSearchPropertiesStr(), control.traverseCount, ProcessTime() - startTime2,
@@ -6257,7 +7682,7 @@ class Control():
             else:
                 remain = startTime + maxSearchSeconds - ProcessTime()
                 if remain > 0:
-                    time.sleep(min(remain, searchIntervalSeconds))
+                    waiter.Sleep(remain)
                 else:
                     if printIfNotExist or DEBUG_EXIST_DISAPPEAR:
                         Logger.ColorfullyLog(self.GetColorfulSearchPropertiesStr() + '<Color=Red> does not exist.</Color>')
@@ -6268,11 +7693,13 @@ class Control():
         """
         maxSearchSeconds: float
         searchIntervalSeconds: float
-        Check if control disappears every searchIntervalSeconds seconds in maxSearchSeconds seconds.
+        Check if control disappears every searchIntervalSeconds seconds in maxSearchSeconds seconds,
+        the interval adapts to UIAutomation events as `Exists` does.
         Return bool, True if control disappears.
         """
         global DEBUG_EXIST_DISAPPEAR
         start = ProcessTime()
+        waiter = _EventWaiter(self, searchIntervalSeconds)
         while True:
             temp = DEBUG_EXIST_DISAPPEAR
             DEBUG_EXIST_DISAPPEAR = False  # do not print for Exists
@@ -6282,7 +7709,7 @@ class Control():
             DEBUG_EXIST_DISAPPEAR = temp
             remain = start + maxSearchSeconds - ProcessTime()
             if remain > 0:
-                time.sleep(min(remain, searchIntervalSeconds))
+                waiter.Sleep(remain)
             else:
                 if printIfNotDisappear or DEBUG_EXIST_DISAPPEAR:
                     Logger.ColorfullyLog(self.GetColorfulSearchPropertiesStr() + '<Color=Red> does not disappear.</Color>')
@@ -6743,9 +8170,10 @@ class Control():
         If current control is root control, return None.
         Return `PaneControl` or `WindowControl` or None.
         """
+        client = _AutomationClient.instance()
         handle = self.NativeWindowHandle
         if handle:
-            topHandle = GetAncestor(handle, GAFlag.Root)
+            topHandle = client.GetAncestor(handle, GAFlag.Root)
             if topHandle:
                 if topHandle == handle:
                     return self
@@ -6760,7 +8188,7 @@ class Control():
                 control = control.GetParentControl()
                 handle = control.NativeWindowHandle
                 if handle:
-                    topHandle = GetAncestor(handle, GAFlag.Root)
+                    topHandle = client.GetAncestor(handle, GAFlag.Root)
                     return ControlFromHandle(topHandle)
 
     def Control(self, searchDepth=0xFFFFFFFF, searchInterval=SEARCH_INTERVAL, foundIndex=1, element=0, **searchProperties) -> 'Control':
@@ -8226,7 +9654,7 @@ def LogControl(control: Control, depth: int = 0, showAllName: bool = True, showP
             try:
                 Logger.Write('    TextPattern.Text: ')
                 Logger.Write(pt.DocumentRange.GetText(30), ConsoleColor.DarkGreen)
-            except comtypes.COMError as ex:
+            except COMError as ex:
                 pass
     Logger.Write('    SupportedPattern:')
     for pt, name in supportedPatterns:
@@ -8500,7 +9928,7 @@ if __name__ == '__main__':
         try:
             value = notepad.GetPropertyValue(k)
             print('GetPropertyValue, {} = {}, type: {}'.format(v, value, type(value)))
-        except (KeyError, comtypes.COMError) as ex:
+        except (KeyError, COMError) as ex:
             print('GetPropertyValue, {}, error'.format(v))
 
     children = notepad.GetChildren()
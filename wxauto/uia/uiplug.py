@@ -5,13 +5,14 @@ import os
 import random
 import ctypes
 import ctypes.wintypes
-import win32gui
-import win32api
-import win32con
-import win32ui
+import sys
+if sys.platform == 'win32':
+    import win32gui
+    import win32api
+    import win32con
+    import win32ui
 from PIL import Image
 from typing import Literal, Optional, Tuple, Callable
-import sys
 import tkinter as tk
 import threading
 import queue
@@ -19,7 +20,7 @@ import weakref
 
 # ===================================================================== 绘图专用 ===================================================================================
 # --- Windows 常量/函数 ---
-user32 = ctypes.windll.user32
+user32 = ctypes.windll.user32 if sys.platform == 'win32' else None
 GWL_EXSTYLE       = -20
 WS_EX_LAYERED     = 0x00080000
 WS_EX_TRANSPARENT = 0x00000020
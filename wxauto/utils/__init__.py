@@ -1,3 +1,4 @@
 from .win32 import *
 from .lock import uilock
+from .worker import get_ui_worker
 from . import tools
\ No newline at end of file
@@ -2,6 +2,8 @@ import threading
 import multiprocessing
 import asyncio
 import functools
+from wxauto.param import WxParam
+from .worker import get_ui_worker, in_ui_worker
 
 class LockManager:
     """全局锁管理器"""
@@ -9,12 +11,20 @@ class LockManager:
     thread_lock = threading.RLock()
     async_lock = asyncio.Lock()
 
+def _call_locked(func, *args, **kwargs):
+    with LockManager.thread_lock:
+        return func(*args, **kwargs)
+
 def uilock(func):
     """
     装饰器，确保 UI 自动化方法在多进程、多线程、异步环境下安全执行
+
+    开启 WxParam.UI_WORKER 后，方法会被提交到 UI 工作线程中执行，见 wxauto.utils.worker，
+    工作线程中同样持有锁，与没有经过工作线程的调用（例如切换 UI_WORKER 期间的调用）之间也是串行的
     """
     @functools.wraps(func)
     def lock_wrapper(*args, **kwargs):
-            with LockManager.thread_lock:
-                return func(*args, **kwargs)
-    return lock_wrapper
\ No newline at end of file
+            if WxParam.UI_WORKER and not in_ui_worker():
+                return get_ui_worker().call(_call_locked, func, *args, **kwargs)
+            return _call_locked(func, *args, **kwargs)
+    return lock_wrapper
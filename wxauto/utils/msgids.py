@@ -0,0 +1,227 @@
+"""
+已读消息id窗口
+
+每个聊天窗口记录上一次轮询时消息列表中最后的若干个消息id，用于判断新消息。
+id按加入顺序存放在定长的环形队列中，同时用字典记录每个id的序号，
+判断是否存在、比较先后都是O(1)，超过容量时丢弃最早的id，
+新消息通过与当前消息列表按锚点对齐得到，见 `wxauto.utils.seqdiff`，
+窗口同时记录每个id对应的key（例如消息内容），对齐时用来区分重新渲染的消息和新消息
+
+获取整个消息列表的id需要读取每一条消息，大多数轮询时消息列表并没有变化，
+因此窗口同时记录上一次比较时消息列表的特征（例如首尾消息的id和滚动位置），
+特征不变时可以直接跳过比较，见 `MessageIdWindow.unchanged`
+
+监听线程和用户线程可能同时操作同一个聊天窗口，所有操作都在锁内完成
+
+本模块只依赖标准库
+"""
+from collections import deque
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Sequence
+from .seqdiff import SequenceDiff, diff_sequences
+import threading
+import time
+
+DEFAULT_CAPACITY = 100
+
+
+class MessageIdWindow:
+    """单个聊天窗口最近处理过的消息id
+
+    Args:
+        capacity (int): 最多保存的id数量
+        ids (Iterable[str]): 初始id，按从旧到新排列
+        keys (Sequence[Hashable]): 与ids一一对应的key，见 `update`
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, ids: Iterable[str] = (), keys: Sequence[Hashable] = None):
+        self._lock = threading.RLock()
+        self._ids = deque(maxlen=max(int(capacity), 1))
+        self._index: Dict[str, int] = {}  # {id: 序号}，序号越大越新
+        self._keys: Dict[str, Hashable] = {}  # {id: key}，只包含加入时提供了key的id
+        self._next = 0
+        self._signature = None  # 上一次比较时消息列表的特征
+        self._signature_time = 0.0
+        self.extend(ids, keys)
+
+    def __repr__(self) -> str:
+        return f'<MessageIdWindow {len(self._ids)}/{self.capacity}>'
+
+    @property
+    def capacity(self) -> int:
+        return self._ids.maxlen
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __bool__(self) -> bool:
+        return bool(self._ids)
+
+    def __contains__(self, msg_id: str) -> bool:
+        return msg_id in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(tuple(self._ids))
+
+    @property
+    def last(self) -> Optional[str]:
+        """最新加入的id"""
+        with self._lock:
+            return self._ids[-1] if self._ids else None
+
+    def position(self, msg_id: str) -> Optional[int]:
+        """id的序号，越大越新，不存在时返回None"""
+        return self._index.get(msg_id)
+
+    def _append(self, msg_id: str):
+        if len(self._ids) == self._ids.maxlen:
+            oldest = self._ids[0]
+            # 同一个id只保留最新的序号
+            if self._index.get(oldest) == self._next - len(self._ids):
+                del self._index[oldest]
+                self._keys.pop(oldest, None)
+        self._ids.append(msg_id)
+        self._index[msg_id] = self._next
+        self._next += 1
+
+    def extend(self, ids: Iterable[str], keys: Sequence[Hashable] = None):
+        """按从旧到新的顺序加入id，keys与ids一一对应"""
+        with self._lock:
+            if keys is None:
+                for msg_id in ids:
+                    self._append(msg_id)
+                return
+            for msg_id, key in zip(ids, keys):
+                self._append(msg_id)
+                self._keys[msg_id] = key
+
+    def unchanged(self, signature: Hashable, max_age: float) -> bool:
+        """消息列表的特征与上一次比较时相同，并且距离上一次比较不超过max_age秒时返回True，此时可以跳过比较
+
+        Args:
+            signature (Hashable): 当前消息列表的特征
+            max_age (float): 特征相同时最多跳过多久，超过后仍需要比较一次，防止特征没有覆盖到的变化被一直忽略
+        """
+        with self._lock:
+            return (
+                self._signature is not None
+                and self._signature == signature
+                and time.monotonic() - self._signature_time <= max_age
+            )
+
+    def reset(self, ids: Iterable[str] = (), keys: Sequence[Hashable] = None) -> tuple:
+        """清空后重新加入id，返回清空前的id"""
+        with self._lock:
+            previous = tuple(self._ids)
+            self._signature = None
+            self._ids.clear()
+            self._index.clear()
+            self._keys.clear()
+            self.extend(ids, keys)
+            return previous
+
+    def diff(self, ids: Sequence[str], keys: Sequence[Hashable] = None) -> SequenceDiff:
+        """按锚点对齐窗口中的id和当前消息列表中的id，见 `wxauto.utils.seqdiff`，不修改窗口
+
+        Args:
+            ids (Sequence[str]): 当前消息列表中的id，按从上到下排列
+            keys (Sequence[Hashable]): 与ids一一对应的key，key与窗口中记录的相同的两个id视为重新渲染，
+                为None时只按id对齐，最后一条消息之后出现的id都视为新消息
+        """
+        with self._lock:
+            same = None
+            if keys is not None:
+                new_keys = dict(zip(ids, keys))
+                old_keys = self._keys
+                same = lambda old, new: old in old_keys and old_keys[old] == new_keys[new]
+            return diff_sequences(tuple(self._ids), ids, same)
+
+    def update(
+            self,
+            ids: Sequence[str],
+            from_empty: bool = False,
+            signature: Hashable = None,
+            keys: Sequence[Hashable] = None
+        ) -> List[str]:
+        """找出当前消息列表中的新消息id，并将窗口更新为当前消息列表
+
+        锚点之间插入和最后一个锚点之后追加的id为新消息，重新渲染和向上加载的消息不算新消息，
+        窗口为空或者与当前消息列表无法对齐时没有新消息
+
+        Args:
+            ids (Sequence[str]): 当前消息列表中的id，按从上到下排列
+            from_empty (bool): 窗口为空时是否将所有id视为新消息，用于原本没有聊天记录的窗口
+            signature (Hashable): 获取ids之前得到的消息列表特征，记录下来供 `unchanged` 使用
+            keys (Sequence[Hashable]): 与ids一一对应的key，例如消息内容，用于识别重新渲染的消息，见 `diff`
+        """
+        with self._lock:
+            new = self._update(ids, from_empty, keys)
+            if ids and signature is not None:
+                self._signature = signature
+                self._signature_time = time.monotonic()
+            return new
+
+    def _update(self, ids: Sequence[str], from_empty: bool, keys: Sequence[Hashable]) -> List[str]:
+        """`update` 的实现，调用时已经持有锁"""
+        if not ids:
+            return []
+        if not self._ids:
+            new = list(ids) if from_empty else []
+        else:
+            result = self.diff(ids, keys)
+            if not result.changed:
+                return []
+            new = result.new if result.anchors else []
+            if result.anchors and not (
+                result.inserted or result.removed or result.replaced
+                or (result.prepended and len(self._ids) < self.capacity)
+            ):
+                # 只在底部追加时不需要重建窗口，窗口已满时顶部新出现的消息比窗口中的都早，可以忽略
+                if keys is None:
+                    self.extend(result.appended)
+                else:
+                    new_keys = dict(zip(ids, keys))
+                    self.extend(result.appended, [new_keys[i] for i in result.appended])
+                return new
+        self.reset(ids, keys)
+        return new
+
+
+class MessageIdRegistry:
+    """按聊天窗口保存MessageIdWindow
+
+    Args:
+        capacity (int): 新建窗口的容量
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._windows: Dict[Hashable, MessageIdWindow] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, chat_id: Hashable) -> bool:
+        return chat_id in self._windows
+
+    def __len__(self) -> int:
+        return len(self._windows)
+
+    def get(self, chat_id: Hashable, capacity: int = None) -> MessageIdWindow:
+        """获取聊天窗口对应的MessageIdWindow，不存在时新建一个空的
+
+        Args:
+            chat_id (Hashable): 聊天窗口标识
+            capacity (int): 新建时的容量，默认为registry的capacity
+        """
+        with self._lock:
+            window = self._windows.get(chat_id)
+            if window is None:
+                window = self._windows[chat_id] = MessageIdWindow(capacity or self.capacity)
+            return window
+
+    def pop(self, chat_id: Hashable) -> Optional[MessageIdWindow]:
+        with self._lock:
+            return self._windows.pop(chat_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
@@ -0,0 +1,204 @@
+"""
+监听轮询调度
+
+每个聊天窗口有自己的下次检查时间，按时间先后放在优先队列中：
+- 检查到新消息时间隔恢复为最小间隔
+- 没有新消息时间隔按倍数增加，直到最大间隔
+- 单次检查很慢的聊天窗口间隔至少为检查耗时的若干倍，不会占满监听线程
+- 所有聊天窗口共享每秒检查次数的上限（令牌桶）
+
+每个聊天窗口的统计数据见 `PollScheduler.stats`
+
+本模块只依赖标准库
+"""
+from typing import Callable, Dict, Hashable, Optional, Set, Tuple
+import threading
+import heapq
+import time
+
+
+class PollStats:
+    """单个聊天窗口的轮询统计"""
+    __slots__ = ('interval', 'due', 'added', 'polls', 'hits', 'messages',
+                 'poll_time', 'latency', 'last_poll', 'serial')
+
+    def __init__(self, interval: float, now: float):
+        self.interval = interval
+        self.due = now
+        self.added = now
+        self.polls = 0
+        self.hits = 0  # 检查到新消息的次数
+        self.messages = 0
+        self.poll_time = 0.0  # 检查耗时之和
+        self.latency = 0.0  # 估计的消息延迟之和，按两次检查间隔的一半估计
+        self.last_poll = None
+        self.serial = 0  # 队列中有效条目的序号，用于忽略过期条目
+
+    def to_dict(self, now: float) -> dict:
+        elapsed = max(now - self.added, 1e-9)
+        return {
+            'interval': self.interval,
+            'polls': self.polls,
+            'hits': self.hits,
+            'messages': self.messages,
+            'poll_rate': self.polls / elapsed,
+            'hit_rate': self.hits / self.polls if self.polls else 0.0,
+            'poll_time': self.poll_time / self.polls if self.polls else 0.0,
+            'latency': self.latency / self.hits if self.hits else 0.0,
+        }
+
+
+class PollScheduler:
+    """按聊天窗口分别调度的轮询器
+
+    由监听线程调度，其他线程（例如 `GetListenStats`）可以同时读取统计，所有操作都在锁内完成
+
+    Args:
+        min_interval (float): 最小检查间隔，单位秒
+        max_interval (float): 最大检查间隔，单位秒
+        budget (float): 所有聊天窗口每秒最多检查的次数，0为不限制
+        backoff (float): 没有新消息时间隔增加的倍数
+        slow_factor (float): 间隔至少为单次检查耗时的倍数
+        clock (Callable[[], float]): 时钟函数
+    """
+
+    def __init__(
+            self,
+            min_interval: float = 1,
+            max_interval: float = 5,
+            budget: float = 0,
+            backoff: float = 2,
+            slow_factor: float = 10,
+            clock: Callable[[], float] = time.monotonic
+        ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget = budget
+        self.backoff = backoff
+        self.slow_factor = slow_factor
+        self.clock = clock
+        self._stats: Dict[Hashable, PollStats] = {}
+        self._queue = []  # [(due, serial, key), ...]
+        self._serial = 0
+        self._tokens = 0.0
+        self._token_time = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._stats
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def keys(self) -> Set[Hashable]:
+        with self._lock:
+            return set(self._stats)
+
+    def _push(self, key: Hashable, due: float):
+        stats = self._stats[key]
+        self._serial += 1
+        stats.due = due
+        stats.serial = self._serial
+        heapq.heappush(self._queue, (due, self._serial, key))
+
+    def add(self, key: Hashable, delay: float = 0):
+        """添加聊天窗口，delay秒后第一次检查"""
+        with self._lock:
+            if key in self._stats:
+                return
+            now = self.clock()
+            self._stats[key] = PollStats(self.min_interval, now)
+            self._push(key, now + delay)
+
+    def remove(self, key: Hashable):
+        """移除聊天窗口，队列中的条目在出队时忽略"""
+        with self._lock:
+            self._stats.pop(key, None)
+
+    def wake(self, key: Hashable):
+        """让聊天窗口立即到期，例如收到了UIAutomation事件"""
+        with self._lock:
+            if (stats := self._stats.get(key)) is None:
+                return
+            now = self.clock()
+            stats.interval = self.min_interval
+            if stats.due > now:
+                self._push(key, now)
+
+    def _take_token(self, now: float) -> float:
+        """消耗一次检查次数，返回0，不够时不消耗并返回需要等待的秒数"""
+        if not self.budget or self.budget <= 0:
+            return 0
+        if self._token_time is None:
+            self._tokens = self.budget
+        else:
+            self._tokens = min(self.budget, self._tokens + (now - self._token_time) * self.budget)
+        self._token_time = now
+        # 允许浮点误差，否则需要等待的时间可能小到时钟无法前进
+        if self._tokens >= 1 - 1e-9:
+            self._tokens = max(self._tokens - 1, 0.0)
+            return 0
+        return (1 - self._tokens) / self.budget
+
+    def next(self) -> Tuple[Optional[Hashable], float]:
+        """取出下一个需要检查的聊天窗口
+
+        Returns:
+            tuple: (聊天窗口, 0)，没有到期的聊天窗口或者超出每秒检查次数时为(None, 需要等待的秒数)，
+                取出的聊天窗口检查完后需要调用 `done`
+        """
+        with self._lock:
+            now = self.clock()
+            queue = self._queue
+            while queue:
+                due, serial, key = queue[0]
+                stats = self._stats.get(key)
+                if stats is None or stats.serial != serial:
+                    heapq.heappop(queue)
+                    continue
+                if due > now:
+                    return None, due - now
+                if (wait := self._take_token(now)) > 0:
+                    return None, wait
+                heapq.heappop(queue)
+                stats.serial = 0
+                return key, 0
+            return None, self.max_interval
+
+    def done(self, key: Hashable, messages: int = 0, duration: float = 0):
+        """记录一次检查的结果并安排下一次检查
+
+        Args:
+            key (Hashable): 聊天窗口
+            messages (int): 检查到的新消息数量
+            duration (float): 检查耗时，单位秒
+        """
+        with self._lock:
+            if (stats := self._stats.get(key)) is None:
+                return
+            now = self.clock()
+            stats.polls += 1
+            stats.poll_time += duration
+            if messages:
+                stats.hits += 1
+                stats.messages += messages
+                if stats.last_poll is not None:
+                    stats.latency += (now - stats.last_poll) / 2
+                stats.interval = self.min_interval
+            else:
+                stats.interval = min(max(stats.interval, self.min_interval) * self.backoff, self.max_interval)
+            stats.last_poll = now
+            if stats.serial == 0:
+                self._push(key, now + max(stats.interval, duration * self.slow_factor))
+
+    def stats(self) -> Dict[Hashable, dict]:
+        """每个聊天窗口的统计
+
+        Returns:
+            dict: {聊天窗口: {interval: 当前间隔, polls: 检查次数, hits: 检查到新消息的次数, messages: 新消息数量,
+                poll_rate: 每秒检查次数, hit_rate: 检查到新消息的比例, poll_time: 平均检查耗时,
+                latency: 估计的平均消息延迟}}，时间单位均为秒
+        """
+        with self._lock:
+            now = self.clock()
+            return {key: stats.to_dict(now) for key, stats in self._stats.items()}
@@ -0,0 +1,190 @@
+"""
+按锚点对齐的序列比较
+
+用于比较两次轮询得到的消息id序列。微信的消息列表在滚动、加载更多、图片加载完成等情况下会重新渲染部分消息，
+这些消息的控件会换成新的RuntimeId，只比较最后一条id或者集合交集会把它们误判为新消息，或者漏掉真正的新消息
+
+比较方法与patience diff相同：
+1. 在两个序列中都只出现一次的id作为候选锚点
+2. 按旧序列中的位置求新序列位置的最长递增子序列，得到两边顺序一致的锚点，O(n log n)
+3. 锚点之后的空隙中，旧序列独有的id和新序列独有的id按顺序配对视为重新渲染，
+   没有配对的新id在最后一个锚点之后为追加，在锚点之间为插入，在第一个锚点之前为向上加载的旧消息，
+   没有配对的旧id为移除
+
+只有id无法区分重新渲染和"撤回或删除一条消息的同时收到新消息"，配对需要依据：
+传入 `same` 时（例如比较两条消息的内容），按顺序配对 `same` 认为相同的元素，
+删除最后一条消息的同时收到内容相同的新消息时仍然无法区分，会被当作重新渲染；
+没有 `same` 时，只有两个锚点之间新旧id数量相同才整体配对，最后一个锚点之后不配对，新id都视为追加
+
+本模块只依赖标准库
+"""
+from bisect import bisect_left
+from typing import Callable, Hashable, List, NamedTuple, Sequence, Tuple
+
+
+class SequenceDiff(NamedTuple):
+    """序列比较结果，各列表中的元素都按在序列中的顺序排列"""
+    anchors: int  # 对齐的锚点数量，为0时两个序列无法对齐
+    prepended: list  # 第一个锚点之前新出现的元素
+    inserted: list  # 锚点之间新出现的元素
+    appended: list  # 最后一个锚点之后新出现的元素，没有锚点时为新序列独有的所有元素
+    removed: list  # 旧序列中不再出现的元素（不包括重新渲染的）
+    replaced: list  # 重新渲染的元素，[(旧元素, 新元素), ...]
+
+    @property
+    def new(self) -> list:
+        """新消息：锚点之间插入和最后一个锚点之后追加的元素"""
+        return self.inserted + self.appended
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.prepended or self.inserted or self.appended or self.removed or self.replaced)
+
+
+def _unique_positions(seq: Sequence[Hashable]) -> dict:
+    """{元素: 位置}，只包含只出现一次的元素"""
+    positions = {}
+    duplicated = set()
+    for i, item in enumerate(seq):
+        if item in positions:
+            duplicated.add(item)
+        else:
+            positions[item] = i
+    for item in duplicated:
+        del positions[item]
+    return positions
+
+
+def find_anchors(old: Sequence[Hashable], new: Sequence[Hashable]) -> List[Tuple[int, int]]:
+    """两个序列中顺序一致的锚点
+
+    Returns:
+        List[Tuple[int, int]]: [(旧序列位置, 新序列位置), ...]，两个位置都递增
+    """
+    old_positions = _unique_positions(old)
+    new_positions = _unique_positions(new)
+    # 按新序列位置排列的候选锚点
+    pairs = [(old_positions[item], j) for item, j in new_positions.items() if item in old_positions]
+    pairs.sort(key=lambda pair: pair[1])
+
+    # 按旧序列位置求最长递增子序列
+    tails = []  # tails[k]为长度k+1的递增子序列的最小结尾（旧序列位置）
+    tail_index = []  # tails中每一项对应pairs中的序号
+    previous = [-1] * len(pairs)
+    for k, (i, _) in enumerate(pairs):
+        n = bisect_left(tails, i)
+        if n == len(tails):
+            tails.append(i)
+            tail_index.append(k)
+        else:
+            tails[n] = i
+            tail_index[n] = k
+        previous[k] = tail_index[n - 1] if n else -1
+    anchors = []
+    k = tail_index[-1] if tail_index else -1
+    while k >= 0:
+        anchors.append(pairs[k])
+        k = previous[k]
+    anchors.reverse()
+    return anchors
+
+
+def _diff_shifted(old: Sequence[Hashable], new: Sequence[Hashable]) -> SequenceDiff:
+    """轮询时最常见的情况：旧序列的末尾部分原样出现在新序列中，只有顶部和底部变化，
+    用切片比较代替逐个元素对齐，无法这样比较或者有重复元素时返回None"""
+    if not old or not new or len(set(old)) != len(old) or len(set(new)) != len(new):
+        return None
+    try:
+        end = new.index(old[-1]) + 1
+    except ValueError:
+        return None
+    size = min(len(old), end)
+    if tuple(new[end - size:end]) != tuple(old[len(old) - size:]):
+        return None
+    prepended, appended, removed = list(new[:end - size]), list(new[end:]), list(old[:len(old) - size])
+    if (prepended or appended) and removed:
+        # 新增的元素与旧序列中被移除的部分重复时需要逐个对齐
+        removed_set = set(removed)
+        if not removed_set.isdisjoint(prepended) or not removed_set.isdisjoint(appended):
+            return None
+    return SequenceDiff(size, prepended, [], appended, removed, [])
+
+
+def _pair(old_only: list, new_only: list, same: Callable, tail: bool) -> Tuple[list, list, list]:
+    """配对同一个空隙中的旧序列独有元素和新序列独有元素
+
+    重新渲染的元素保持原来的顺序和位置，新消息只会出现在它们之后，撤回提示会占据被撤回消息的位置，
+    因此按顺序逐个比较：相同则配对；下一个旧元素与当前新元素相同时当前旧元素已被删除；
+    否则当前旧元素被替换（例如撤回），当前新元素不配对
+
+    Returns:
+        Tuple[list, list, list]: (配对的元素, 没有配对的旧元素, 没有配对的新元素)
+    """
+    if same is None:
+        if tail or len(old_only) != len(new_only):
+            return [], old_only, new_only
+        return list(zip(old_only, new_only)), [], []
+    pairs, removed, added = [], [], []
+    i = j = 0
+    while i < len(old_only) and j < len(new_only):
+        if same(old_only[i], new_only[j]):
+            pairs.append((old_only[i], new_only[j]))
+            j += 1
+        elif i + 1 < len(old_only) and same(old_only[i + 1], new_only[j]):
+            removed.append(old_only[i])
+        else:
+            removed.append(old_only[i])
+            added.append(new_only[j])
+            j += 1
+        i += 1
+    removed += old_only[i:]
+    added += new_only[j:]
+    return pairs, removed, added
+
+
+def diff_sequences(
+        old: Sequence[Hashable],
+        new: Sequence[Hashable],
+        same: Callable[[Hashable, Hashable], bool] = None
+    ) -> SequenceDiff:
+    """比较两个序列
+
+    Args:
+        old (Sequence[Hashable]): 上一次的序列
+        new (Sequence[Hashable]): 当前序列
+        same (Callable[[Hashable, Hashable], bool], optional): same(旧元素, 新元素)，
+            两个不同的元素是否为同一项重新渲染的结果，见模块说明
+
+    Returns:
+        SequenceDiff: 比较结果
+    """
+    if (result := _diff_shifted(old, new)) is not None:
+        return result
+    anchors = find_anchors(old, new)
+    old_set = set(old)
+    new_set = set(new)
+    if not anchors:
+        return SequenceDiff(
+            0, [], [],
+            [item for item in new if item not in old_set],
+            [item for item in old if item not in new_set],
+            [],
+        )
+
+    prepended, inserted, appended, removed, replaced = [], [], [], [], []
+    bounds = [(-1, -1)] + anchors + [(len(old), len(new))]
+    last = len(bounds) - 2
+    for n in range(len(bounds) - 1):
+        (i0, j0), (i1, j1) = bounds[n], bounds[n + 1]
+        old_only = [item for item in old[i0 + 1:i1] if item not in new_set]
+        new_only = [item for item in new[j0 + 1:j1] if item not in old_set]
+        if n == 0:
+            # 第一个锚点之前是向上加载或者滚出视野的消息，不参与配对
+            prepended += new_only
+            removed += old_only
+            continue
+        pairs, old_rest, new_rest = _pair(old_only, new_only, same, n == last)
+        replaced += pairs
+        removed += old_rest
+        (appended if n == last else inserted).extend(new_rest)
+    return SequenceDiff(len(anchors), prepended, inserted, appended, removed, replaced)
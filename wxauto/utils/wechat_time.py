@@ -0,0 +1,128 @@
+"""
+微信时间文字解析
+
+聊天窗口中的时间文字大多是相对于当天的，例如"10:21"、"昨天 10:21"、"星期一 10:21"，
+只有月日的时间（例如"12-30 10:21:00"）取不晚于参考日期的最近一天，年初时解析为去年，
+解析结果只取决于时间文字和参考日期，因此按(时间文字, 参考日期)缓存解析结果，
+聊天记录中大量重复的时间文字只解析一次
+
+批量解析消息时通过 `reference_time` 为同一批消息固定一个参考时间，
+不再每条消息调用一次 `datetime.now()`，同一批消息跨过零点时也不会得到不一致的日期
+
+本模块只依赖标准库
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Callable, Iterator, List, Optional, Pattern, Tuple
+import re
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+WEEKDAYS = '一二三四五六日'
+
+_reference: ContextVar[Optional[datetime]] = ContextVar('wechat_time_reference', default=None)
+
+
+def _period_hour(period: str, hour: int) -> int:
+    if period == '下午' and hour != 12:
+        return hour + 12
+    if period == '上午' and hour == 12:
+        return 0
+    return hour
+
+
+def _recent(today: date, month: int, day: int, *clock: int) -> datetime:
+    """只有月日的时间：不晚于参考日期的最近一个该月日，跨年时为去年"""
+    try:
+        value = datetime(today.year, month, day, *clock)
+        if value.date() <= today:
+            return value
+    except ValueError:
+        # 今年没有2月29日
+        pass
+    return datetime(today.year - 1, month, day, *clock)
+
+
+# (正则, 转换函数)，按顺序匹配，转换函数的参数为匹配结果和参考日期
+_RULES: List[Tuple[Pattern, Callable[[re.Match, date], datetime]]] = [
+    (
+        re.compile(r'^(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2})$'),
+        lambda m, today: _recent(today, *map(int, m.groups())),
+    ),
+    (
+        re.compile(r'^(\d{1,2}):(\d{1,2})$'),
+        lambda m, today: datetime(today.year, today.month, today.day, *map(int, m.groups())),
+    ),
+    (
+        re.compile(r'^昨天 (\d{1,2}):(\d{1,2})$'),
+        lambda m, today: datetime.combine(today - timedelta(days=1), datetime.min.time()).replace(
+            hour=int(m[1]), minute=int(m[2])),
+    ),
+    (
+        re.compile(r'^星期([一二三四五六日]) (\d{1,2}):(\d{1,2})$'),
+        lambda m, today: datetime.combine(
+            today - timedelta(days=(today.weekday() - WEEKDAYS.index(m[1])) % 7), datetime.min.time()
+        ).replace(hour=int(m[2]), minute=int(m[3])),
+    ),
+    (
+        re.compile(r'^(\d{4})年(\d{1,2})月(\d{1,2})日 (\d{1,2}):(\d{1,2})$'),
+        lambda m, today: datetime(*map(int, m.groups())),
+    ),
+    (
+        re.compile(r'^(\d{2})-(\d{2}) (上午|下午) (\d{1,2}):(\d{2})$'),
+        lambda m, today: _recent(today, int(m[1]), int(m[2]), _period_hour(m[3], int(m[4])), int(m[5])),
+    ),
+]
+
+
+@lru_cache(maxsize=4096)
+def _parse(time_str: str, today: date) -> str:
+    text = time_str.replace('星期天', '星期日')
+    for pattern, convert in _RULES:
+        if (match := pattern.match(text)) is not None:
+            try:
+                return convert(match, today).strftime(TIME_FORMAT)
+            except ValueError:
+                break
+    return time_str
+
+
+def get_reference_time() -> datetime:
+    """当前的参考时间，没有通过 `reference_time` 设置时为当前时间"""
+    return _reference.get() or datetime.now()
+
+
+@contextmanager
+def reference_time(now: datetime = None) -> Iterator[datetime]:
+    """在with块中使用固定的参考时间解析时间文字
+
+    Args:
+        now (datetime): 参考时间，默认为当前时间，已经处于另一个reference_time中时沿用外层的参考时间
+
+    Example:
+        >>> with reference_time():
+        ...     times = [parse_wechat_time(text) for text in texts]
+    """
+    if now is None:
+        now = _reference.get() or datetime.now()
+    token = _reference.set(now)
+    try:
+        yield now
+    finally:
+        _reference.reset(token)
+
+
+def parse_wechat_time(time_str: str, now: datetime = None) -> str:
+    """将微信中的时间文字转换为 %Y-%m-%d %H:%M:%S 格式，无法识别时原样返回
+
+    Args:
+        time_str (str): 时间文字
+        now (datetime): 参考时间，默认使用 `reference_time` 设置的参考时间或当前时间
+
+    Returns:
+        str: 转换后的时间字符串
+    """
+    if not time_str:
+        return time_str
+    return _parse(time_str, (now or get_reference_time()).date())
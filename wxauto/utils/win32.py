@@ -2,19 +2,21 @@ import os
 import time
 import struct
 import shutil
-import win32ui
-import win32gui
-import win32api
-import win32con
-import win32process
-import win32clipboard
+import sys
+if sys.platform == 'win32':
+    import win32ui
+    import win32gui
+    import win32api
+    import win32con
+    import win32process
+    import win32clipboard
+    import pywintypes
 import traceback
 import pyperclip
 import psutil
 import ctypes
 from PIL import Image
 from wxauto import uia
-import pywintypes
 import random
 
 def GetAllWindows():
@@ -133,15 +135,7 @@ def GetAllWindowExs(HWND):
     return handles
 
 def FindWindow(classname=None, name=None, timeout=0) -> int:
-    t0 = time.time()
-    while True:
-        HWND = win32gui.FindWindow(classname, name)
-        if HWND:
-            break
-        if time.time() - t0 > timeout:
-            break
-        time.sleep(0.01)
-    return HWND
+    return uia.WaitFor(lambda: win32gui.FindWindow(classname, name), timeout)
 
 def FindTopLevelControl(classname=None, name=None, timeout=3):
     hwnd = FindWindow(classname, name, timeout)
@@ -0,0 +1,149 @@
+"""
+UI自动化工作线程
+
+开启 `WxParam.UI_WORKER` 后，所有被 `uilock` 装饰的方法都会被提交到同一个STA线程中串行执行，
+调用线程通过 Future 等待结果，UI 操作中的 COM 调用都在该线程中完成，
+监听回调线程、其他业务线程以及协程都可以直接调用 UI 方法，而不需要关心 COM 套间。
+
+在工作线程内部再次调用 UI 方法时直接执行，不会重新排队，因此不会死锁。
+"""
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+import asyncio
+import threading
+import queue
+import sys
+if sys.platform == 'win32':
+    import pythoncom
+else:
+    # 非Windows环境下只有模拟的UIAutomation后端，不需要初始化COM
+    pythoncom = None
+
+_local = threading.local()
+
+
+class UIWorker:
+    """在独立的STA线程中串行执行UI自动化操作
+
+    Args:
+        name (str): 线程名
+        pump_interval (float): 空闲时处理Windows消息的间隔，单位秒
+    """
+
+    def __init__(self, name: str = 'wxauto-ui-worker', pump_interval: float = 0.05):
+        self.name = name
+        self.pump_interval = pump_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'<UIWorker "{self.name}" alive={self.is_alive()} pending={self._queue.qsize()}>'
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def in_worker(self) -> bool:
+        """当前线程是否为工作线程"""
+        return self._thread is threading.current_thread()
+
+    def start(self) -> 'UIWorker':
+        """启动工作线程，已启动时不做任何操作"""
+        with self._lock:
+            if not self.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        _local.worker = self
+        if pythoncom:
+            pythoncom.CoInitialize()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.pump_interval)
+                except queue.Empty:
+                    # STA线程需要处理消息，否则跨套间调用会被阻塞
+                    if pythoncom:
+                        pythoncom.PumpWaitingMessages()
+                    continue
+                if item is None:
+                    break
+                future, func, args, kwargs = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            if pythoncom:
+                pythoncom.CoUninitialize()
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """提交一个操作，返回Future
+
+        在工作线程中调用时直接执行，返回已完成的Future
+        """
+        future = Future()
+        if self.in_worker():
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+        self.start()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """在工作线程中执行并等待结果，异常会在调用线程中重新抛出"""
+        if self.in_worker():
+            return func(*args, **kwargs)
+        return self.submit(func, *args, **kwargs).result()
+
+    async def run_async(self, func: Callable, *args, **kwargs) -> Any:
+        """在协程中等待工作线程的执行结果，不阻塞事件循环"""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """停止工作线程，已提交的操作会先执行完"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            if wait and thread is not threading.current_thread():
+                thread.join()
+
+
+def in_ui_worker() -> bool:
+    """当前线程是否为任意一个UIWorker的工作线程"""
+    return getattr(_local, 'worker', None) is not None
+
+
+_workers: Dict[Hashable, UIWorker] = {}
+_workers_lock = threading.Lock()
+
+
+def get_ui_worker(key: Hashable = None) -> UIWorker:
+    """获取工作线程，不同的key对应不同的线程，例如按窗口句柄为每个微信窗口分配一个线程
+
+    `uilock` 使用key为None的默认工作线程
+    """
+    with _workers_lock:
+        worker = _workers.get(key)
+        if worker is None:
+            name = 'wxauto-ui-worker' if key is None else f'wxauto-ui-worker-{key}'
+            worker = _workers[key] = UIWorker(name)
+        return worker
+
+
+def shutdown_ui_workers(wait: bool = True):
+    """停止所有工作线程"""
+    with _workers_lock:
+        workers = list(_workers.values())
+        _workers.clear()
+    for worker in workers:
+        worker.shutdown(wait)
@@ -9,6 +9,9 @@ from .ui.component import (
     WeChatDialog
 )
 from .utils import GetAllWindows, uilock
+from .utils.scheduler import PollScheduler
+from .uia import NoProfileApi, ProfileApis, UIEvents
+from .msgs.store import flush_messages, get_message_store, store_messages
 from .param import (
     WxResponse, 
     WxParam, 
@@ -22,6 +25,7 @@ from typing import (
     Dict,
     Literal,
     Callable,
+    Set,
     TYPE_CHECKING
 )
 from concurrent.futures import ThreadPoolExecutor
@@ -35,6 +39,8 @@ import os
 
 if TYPE_CHECKING:
     from wxauto.msgs.base import Message
+    from wxauto.msgs.record import MessageRecord
+    from wxauto.ui.chatbox import ChatHistory
     from wxauto.ui.sessionbox import SessionElement
 
 class LoginWnd:
@@ -77,6 +83,17 @@ class Listener(ABC):
         self._listener_messages = {}
         self._lock = threading.RLock()
         self._listener_stop_event = threading.Event()
+        # 事件监听模式：收到结构变化事件的聊天窗口名，由UIAutomation事件线程写入
+        self._listener_dirty = set()
+        self._listener_dirty_lock = threading.Lock()
+        self._listener_wakeup = threading.Event()
+        self._listener_subscribed = {}  # {聊天窗口名: 窗口句柄}
+        # 每个聊天窗口单独安排检查时间，没有新消息时逐渐降低检查频率
+        self._listener_scheduler = PollScheduler(
+            WxParam.LISTEN_INTERVAL,
+            WxParam.LISTEN_MAX_INTERVAL,
+            WxParam.LISTEN_POLL_BUDGET,
+        )
         self._listener_thread = threading.Thread(target=self._listener_listen, daemon=True)
         self._listener_thread.start()
 
@@ -84,16 +101,80 @@ class Listener(ABC):
         self._excutor = ThreadPoolExecutor(max_workers=WxParam.LISTENER_EXCUTOR_WORKERS)
         if not hasattr(self, 'listen') or not self.listen:
             self.listen = {}
+        scheduler = self._listener_scheduler
         while not self._listener_stop_event.is_set():
             try:
-                self._get_listen_messages()
+                event_mode = WxParam.LISTEN_EVENT and self._listener_subscribe()
+                self._listener_schedule(event_mode)
+                who, wait = scheduler.next()
+                if who is None:
+                    if self._listener_wakeup.wait(wait) and event_mode:
+                        # 一条新消息会触发多个结构变化事件，稍等片刻合并，同时等待消息控件创建完成
+                        time.sleep(WxParam.LISTEN_EVENT_DELAY)
+                    self._listener_wakeup.clear()
+                    continue
+                count, start = 0, time.perf_counter()
+                try:
+                    if WxParam.UI_WORKER:
+                        # 在工作线程中持有uilock，与其他线程的UI操作串行
+                        result = uilock(self._get_listen_messages)({who})
+                    else:
+                        result = self._get_listen_messages({who})
+                    count = (result or {}).get(who, 0)
+                finally:
+                    scheduler.done(who, count, time.perf_counter() - start)
             except KeyboardInterrupt:
                 wxlog.debug("监听消息终止")
                 self._listener_stop()
                 break
             except:
                 wxlog.debug(f'监听消息失败：{traceback.format_exc()}')
-            time.sleep(WxParam.LISTEN_INTERVAL)
+                self._listener_stop_event.wait(WxParam.LISTEN_INTERVAL)
+
+    def _listener_subscribe(self) -> bool:
+        """为所有监听的聊天窗口订阅结构变化事件，事件不可用时返回False"""
+        listen = self.listen.copy()
+        for who in set(self._listener_subscribed) - set(listen):
+            UIEvents.Unsubscribe(self._listener_subscribed.pop(who))
+        for who, (chat, _) in listen.items():
+            handle = self._listener_subscribed.get(who)
+            if handle and UIEvents.IsSubscribed(handle):
+                continue
+            try:
+                handle = chat._api.control.NativeWindowHandle
+            except:
+                continue
+            if not UIEvents.Subscribe(handle, lambda change_type, who=who: self._listener_mark_dirty(who)):
+                return False
+            self._listener_subscribed[who] = handle
+            # 订阅之前可能已经有新消息
+            self._listener_mark_dirty(who)
+        return True
+
+    def _listener_mark_dirty(self, who: str):
+        with self._listener_dirty_lock:
+            self._listener_dirty.add(who)
+        self._listener_wakeup.set()
+
+    def _listener_schedule(self, event_mode: bool):
+        """同步调度器中的聊天窗口和参数，收到结构变化事件的聊天窗口立即到期"""
+        scheduler = self._listener_scheduler
+        if event_mode:
+            # 事件模式下由事件触发检查，定时检查只用于防止漏掉事件
+            scheduler.min_interval = scheduler.max_interval = WxParam.LISTEN_EVENT_POLL_INTERVAL
+        else:
+            scheduler.min_interval = WxParam.LISTEN_INTERVAL
+            scheduler.max_interval = max(WxParam.LISTEN_MAX_INTERVAL, WxParam.LISTEN_INTERVAL)
+        scheduler.budget = WxParam.LISTEN_POLL_BUDGET
+        listen = self.listen.copy()
+        for who in scheduler.keys() - set(listen):
+            scheduler.remove(who)
+        for who in listen:
+            scheduler.add(who)
+        with self._listener_dirty_lock:
+            dirty, self._listener_dirty = self._listener_dirty, set()
+        for who in dirty:
+            scheduler.wake(who)
 
     def _safe_callback(
             self, 
@@ -109,13 +190,20 @@ class Listener(ABC):
     def _listener_stop(self):
         self._listener_is_listening = False
         self._listener_stop_event.set()
+        self._listener_wakeup.set()
         self._listener_thread.join()
         self._excutor.shutdown(wait=True)
+        for handle in self._listener_subscribed.values():
+            UIEvents.Unsubscribe(handle)
+        self._listener_subscribed.clear()
 
     @abstractmethod
-    def _get_listen_messages(self):
+    def _get_listen_messages(self, chats: Set[str] = None) -> Dict[str, int]:
+        """获取监听的聊天窗口的新消息，chats为None时检查所有聊天窗口，否则只检查其中的聊天窗口，
+        返回{聊天窗口名: 新消息数量}"""
         ...
 
+@ProfileApis
 class Chat:
     """微信聊天窗口实例"""
 
@@ -308,13 +396,47 @@ class Chat:
         """
         return self._api.load_more_message(interval)
 
+    def IterHistory(
+            self,
+            until: str = None,
+            batch: int = 50,
+            checkpoint: str = None,
+            newest_first: bool = True,
+            interval: float = 0.3
+        ) -> 'ChatHistory':
+        """向上滚动逐批获取当前聊天窗口的聊天记录
+
+        每次滚动只解析新加载的消息，适合导出很长的聊天记录
+
+        Args:
+            until (str, optional): 获取到该时间为止，格式为 %Y-%m-%d %H:%M:%S，可以只写日期，默认获取到最早的消息
+            batch (int, optional): 每次至少加载多少条消息后再解析
+            checkpoint (str, optional): 上一次迭代中断时保存的checkpoint，从该位置继续获取
+            newest_first (bool, optional): 是否从新到旧返回，为False时会先获取全部消息再从旧到新返回
+            interval (float, optional): 滚动间隔，单位秒
+
+        Returns:
+            ChatHistory: 消息迭代器，迭代过程中可以随时读取其checkpoint属性
+        """
+        return self._api._chat_api.iter_history(until, batch, checkpoint, newest_first, interval)
+
+    def _current_chat(self) -> str:
+        """当前聊天窗口名"""
+        return self.who
+
+    def _store_messages(self, msgs: List['Message'], chat: str = None) -> List['Message']:
+        """启用本地消息库时保存消息，由后台线程写入，返回msgs"""
+        if msgs and WxParam.MESSAGE_STORE:
+            store_messages(msgs, chat or self._current_chat())
+        return msgs
+
     def GetAllMessage(self) -> List['Message']:
         """获取当前聊天窗口的所有消息
         
         Returns:
             List[Message]: 当前聊天窗口的所有消息
         """
-        return self._api.get_msgs()
+        return self._store_messages(self._api.get_msgs())
     
     def GetNewMessage(self) -> List['Message']:
         """获取当前聊天窗口的新消息
@@ -328,7 +450,7 @@ class Chat:
             self._last_chat = _last_chat
             self._api._chat_api._update_used_msg_ids()
             return []
-        return self._api.get_new_msgs()
+        return self._store_messages(self._api.get_new_msgs())
     
     def GetMessageById(self, msg_id: str) -> 'Message':
         """根据消息id获取消息
@@ -341,6 +463,38 @@ class Chat:
         """
         return self._api.get_msg_by_id(msg_id)
 
+    def QueryMessages(
+            self,
+            who: str = None,
+            sender: str = None,
+            since: str = None,
+            until: str = None,
+            msg_type: str = None,
+            keyword: str = None,
+            limit: int = 100
+        ) -> List['MessageRecord']:
+        """从本地消息库查询历史消息，需要先设置 WxParam.MESSAGE_STORE
+
+        Args:
+            who (str, optional): 聊天窗口名，默认为当前聊天窗口
+            sender (str, optional): 发送人
+            since (str, optional): 开始时间（包含），格式为 %Y-%m-%d %H:%M:%S，可以只写日期
+            until (str, optional): 结束时间（不包含），格式同上
+            msg_type (str, optional): 消息内容类型，例如'text'、'image'
+            keyword (str, optional): 消息内容包含的文字
+            limit (int, optional): 最多返回的数量，返回时间最新的limit条
+
+        Returns:
+            List[MessageRecord]: 按时间先后排序的消息记录
+        """
+        if (store := get_message_store()) is None:
+            wxlog.warning('未设置WxParam.MESSAGE_STORE，本地消息库未启用')
+            return []
+        if who is None:
+            who = self._current_chat()
+        flush_messages()
+        return store.query(who, sender, since, until, msg_type, keyword, limit)
+
     def AddGroupMembers(
             self, 
             group: str=None,
@@ -473,6 +627,7 @@ class Chat:
         self._api.close()
 
 
+@ProfileApis
 class WeChat(Chat, Listener):
     """微信主窗口实例"""
 
@@ -496,13 +651,16 @@ class WeChat(Chat, Listener):
             wxlog.debug('Debug mode is on')
         self._listener_start()
 
-    def _get_listen_messages(self):
+    def _get_listen_messages(self, chats: Set[str] = None) -> Dict[str, int]:
         try:
             sys.stdout.flush()
         except:
             pass
+        result = {}
         temp_listen = self.listen.copy()
         for who in temp_listen:
+            if chats is not None and who not in chats:
+                continue
             chat, callback = temp_listen.get(who, (None, None))
             try:
                 if chat is None or not chat._api.exists():
@@ -515,7 +673,10 @@ class WeChat(Chat, Listener):
                 for msg in msgs:
                     wxlog.debug(f"[{msg.attr} {msg.type}]获取到新消息：{who} - {msg.content}")
                     self._excutor.submit(self._safe_callback, callback, msg, chat)
+            result[who] = len(msgs)
+        return result
 
+    @NoProfileApi
     def KeepRunning(self):
         """保持运行"""
         while not self._listener_stop_event.is_set():
@@ -526,6 +687,10 @@ class WeChat(Chat, Listener):
                 self.StopListening(True)
                 break
 
+    def _current_chat(self) -> str:
+        # 主窗口会切换聊天，从输入框读取当前聊天窗口名
+        return self._api._chat_api.editbox.Name
+
     def IsOnline(self) -> bool:
         """判断是否在线"""
         return self._api.is_online()
@@ -622,8 +787,12 @@ class WeChat(Chat, Listener):
         name = subwin.nickname
         chat = Chat(subwin)
         self.listen[name] = (chat, callback)
+        # 让监听线程立即开始检查新的聊天窗口，事件监听模式下同时订阅事件
+        if hasattr(self, '_listener_wakeup'):
+            self._listener_wakeup.set()
         return chat
     
+    @NoProfileApi
     def StopListening(self, remove: bool = True) -> None:
         """停止监听
         
@@ -637,10 +806,22 @@ class WeChat(Chat, Listener):
             for who in listen:
                 self.RemoveListenChat(who)
 
+    @NoProfileApi
     def StartListening(self) -> None:
         if not self._listener_thread.is_alive():
             self._listener_start()
 
+    def GetListenStats(self) -> Dict[str, Dict[str, float]]:
+        """获取监听的聊天窗口的轮询统计
+
+        Returns:
+            Dict[str, Dict[str, float]]: {聊天窗口名: 统计}，统计包括：
+                interval: 当前检查间隔，polls: 检查次数，hits: 检查到新消息的次数，messages: 新消息数量，
+                poll_rate: 每秒检查次数，hit_rate: 检查到新消息的比例，poll_time: 平均检查耗时，
+                latency: 估计的平均消息延迟，时间单位均为秒
+        """
+        return self._listener_scheduler.stats()
+
     @uilock
     def RemoveListenChat(
             self, 
@@ -681,7 +862,36 @@ class WeChat(Chat, Listener):
         Returns:
             Dict[str, List['Message']]: 消息列表
         """
-        return self._api.get_next_new_message(filter_mute)
+        result = self._api.get_next_new_message(filter_mute)
+        if result:
+            self._store_messages(result['msg'], result['chat_name'])
+        return result
+
+    def SearchHistory(
+            self,
+            query: str,
+            chats: Union[str, List[str]] = None,
+            since: str = None,
+            limit: int = 100
+        ) -> List['MessageRecord']:
+        """在本地消息库中全文搜索历史消息，需要先设置 WxParam.MESSAGE_STORE
+
+        只能搜索到设置后解析过的消息，不操作微信界面
+
+        Args:
+            query (str): 查询文字，空格分隔的多个词需要同时出现
+            chats (Union[str, List[str]], optional): 限定的聊天窗口名，默认为所有聊天
+            since (str, optional): 开始时间（包含），格式为 %Y-%m-%d %H:%M:%S，可以只写日期
+            limit (int, optional): 最多返回的数量
+
+        Returns:
+            List[MessageRecord]: 按时间从新到旧排序的消息记录
+        """
+        if (store := get_message_store()) is None:
+            wxlog.warning('未设置WxParam.MESSAGE_STORE，本地消息库未启用')
+            return []
+        flush_messages()
+        return store.search(query, chats, since, limit)
 
     def GetNewFriends(
             self,
@@ -793,6 +1003,7 @@ class WeChat(Chat, Listener):
         """切换到联系人页面"""
         self._api._navigation_api.contact_icon.Click()
 
+    @NoProfileApi
     def ShutDown(self):
         os.system(f'taskkill /f /pid {self._api.pid}')
 